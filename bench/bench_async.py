@@ -0,0 +1,50 @@
+import asyncio
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+
+TICK = 0.001 # heartbeat interval in seconds
+
+async def heartbeat(lags, stop):
+    # Sleeps TICK at a time and records how late each wake-up is: a direct measure
+    # of how long the event loop was blocked.
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - start - TICK)
+
+async def measure(label, work):
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(0.05) # baseline ticks before the work starts
+    start = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    lags_ms = np.array(lags) * 1000
+    print(f"{label:<28} {elapsed:7.2f} s  loop lag p50 {np.percentile(lags_ms, 50):7.2f} ms  "
+          f"p99 {np.percentile(lags_ms, 99):8.2f} ms  max {lags_ms.max():8.2f} ms")
+
+async def main(size_mb):
+    proto = NFCPrototype(clevel=5)
+    n = size_mb * 1024 * 1024 // 4
+    data = (np.linspace(0, 1000, n) + np.random.rand(n) * 0.01).astype(np.float32)
+    print(f"Event-loop latency while compressing {size_mb} MB of float32 (heartbeat every {TICK * 1000:.0f} ms)")
+
+    async def blocking():
+        proto.compress(data) # what calling the sync API from a coroutine does
+
+    async def offloaded():
+        await proto.acompress(data)
+
+    await measure("compress() inside the loop", blocking)
+    await measure("await acompress()", offloaded)
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 512))
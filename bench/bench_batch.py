@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+
+def make_items(n, seed=0):
+    # Optimizer-state-like dump: many small float16/float32 tensors (biases, norms,
+    # per-head scales) with a few int64 step counters
+    rng = np.random.default_rng(seed)
+    items = {}
+    for i in range(n):
+        kind = i % 4
+        if kind == 3:
+            items[f"state.{i}.step"] = np.array([i], dtype=np.int64)
+        else:
+            size = int(rng.integers(16, 4096))
+            dtype = np.float16 if kind < 2 else np.float32
+            items[f"state.{i}.exp_avg"] = (rng.standard_normal(size) * 1e-3).astype(dtype)
+    return items
+
+def nbytes(items):
+    return sum(value.nbytes for value in items.values())
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    items = make_items(n)
+    print(f"{n} tensors, {nbytes(items) / 1024**2:.1f} MB total\n")
+    print("| Mode | clevel | Bytes | Bytes saved per entry vs. raw | Compress s | Decompress all s | Decompress 1 entry ms |")
+    print("|---|---|---|---|---|---|---|")
+    name = next(iter(items))
+    for clevel in (5, 9):
+        proto = NFCPrototype(hash_algo='crc32', clevel=clevel)
+        start = time.perf_counter()
+        records = {key: proto.compress(value)[0] for key, value in items.items()}
+        comp_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for record in records.values():
+            proto.decompress(record)
+        decomp_time = time.perf_counter() - start
+        start = time.perf_counter()
+        proto.decompress(records[name])
+        one_time = time.perf_counter() - start
+        size = sum(map(len, records.values()))
+        print(f"| NFC2 record per tensor | {clevel} | {size:,} | {(nbytes(items) - size) / n:.0f} | "
+              f"{comp_time:.2f} | {decomp_time:.2f} | {one_time * 1e3:.2f} |")
+
+        start = time.perf_counter()
+        blob = proto.compress_many(items)
+        comp_time = time.perf_counter() - start
+        start = time.perf_counter()
+        proto.decompress_many(blob)
+        decomp_time = time.perf_counter() - start
+        start = time.perf_counter()
+        proto.decompress_many(blob, names=[name])
+        one_time = time.perf_counter() - start
+        print(f"| compress_many | {clevel} | {len(blob):,} | {(nbytes(items) - len(blob)) / n:.0f} | "
+              f"{comp_time:.2f} | {decomp_time:.2f} | {one_time * 1e3:.2f} |")
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+
+def tensors(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "token ids (50k vocab)": rng.integers(0, 50257, n, dtype=np.int32),
+        "int4 in int32": rng.integers(-8, 8, n).astype(np.int32),
+        "int8 in int32": np.clip(np.round(rng.standard_normal(n) * 30), -128, 127).astype(np.int32),
+        "sorted indices (delta)": np.cumsum(rng.integers(0, 5, n)).astype(np.int32),
+    }
+
+def cold_read(path):
+    # Drops the file from the page cache, then reads it back
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    with open(path, 'rb') as f:
+        return f.read()
+
+def best(fn, runs=3):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 16 * 1024 * 1024
+    print(f"{n:,} int32 values per tensor, xxh3_64 checksums; reads drop the page cache first\n")
+    print("| Tensor | Path | Ratio | Compress MB/s | Decompress MB/s | Read + decompress MB/s |")
+    print("|---|---|---|---|---|---|")
+    paths = (("blosc zstd-5", dict(clevel=5), {}), ("bitpack + zstd-5", dict(clevel=5, bitpack=True), {}),
+             ("bitpack + lz4", dict(codec='lz4', bitpack=True), {}))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tensor")
+        for name, data in tensors(n).items():
+            kwargs = dict(predictor='modular_delta') if "delta" in name else {}
+            data.tofile(path)
+            read_time, _ = best(lambda: cold_read(path))
+            print(f"| {name} | raw int32 read | 1.00 | | | {data.nbytes / read_time / 1024**2:.1f} |")
+            for label, options, _ in paths:
+                proto = NFCPrototype(hash_algo='xxh3_64', **options)
+                compress_time, record = best(lambda: proto.compress(data, **kwargs)[0])
+                with open(path, 'wb') as f:
+                    f.write(record)
+                decompress_time, restored = best(lambda: proto.decompress(record))
+                assert np.array_equal(restored, data)
+                total_time, _ = best(lambda: proto.decompress(cold_read(path)))
+                print(f"| {name} | {label}{' + delta' if kwargs else ''} | {data.nbytes / len(record):.2f} | "
+                      f"{data.nbytes / compress_time / 1024**2:.1f} | {data.nbytes / decompress_time / 1024**2:.1f} | "
+                      f"{data.nbytes / total_time / 1024**2:.1f} |")
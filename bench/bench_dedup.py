@@ -0,0 +1,60 @@
+import os
+import sys
+import shutil
+import tempfile
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.dedup import ChunkStore
+
+def write_checkpoints(directory, steps, n_layers=16, layer_mb=4, trained=4, seed=0):
+    # Successive checkpoints of a partly frozen model: each step updates `trained`
+    # of the layers and rewrites a variable-length header in front of them.
+    rng = np.random.default_rng(seed)
+    layers = [(rng.standard_normal(layer_mb * 1024 * 1024 // 2) * 0.02).astype(np.float16) for _ in range(n_layers)]
+    paths = []
+    for step in range(steps):
+        for i in rng.choice(n_layers, trained, replace=False):
+            layers[i] = layers[i] + (rng.standard_normal(layers[i].shape) * 1e-3).astype(np.float16)
+        header = f'{{"step": {step * 997}, "lr": {1e-4 / (step + 1)}}}'.encode()
+        path = os.path.join(directory, f"ckpt-{step}.bin")
+        with open(path, 'wb') as f:
+            f.write(len(header).to_bytes(8, 'little') + header)
+            for layer in layers:
+                f.write(layer.tobytes())
+        paths.append(path)
+    return paths
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    proto = NFCPrototype(clevel=5)
+    workdir = tempfile.mkdtemp()
+    try:
+        paths = write_checkpoints(workdir, steps)
+        store = ChunkStore(os.path.join(workdir, "store"))
+        print(f"{steps} checkpoints of {os.path.getsize(paths[0]) / 1024**2:.0f} MB, 4 of 16 layers updated per step\n")
+        print("| Step | compress_stream MB | compress_stream s | dedup new chunks | dedup stored MB | dedup s |")
+        print("|---|---|---|---|---|---|")
+        stream_total = 0
+        for step, path in enumerate(paths):
+            start = time.perf_counter()
+            proto.compress_stream(path, path + ".nfc")
+            stream_time = time.perf_counter() - start
+            stream_size = os.path.getsize(path + ".nfc")
+            stream_total += stream_size
+            before = dir_size(store.root)
+            start = time.perf_counter()
+            summary = proto.compress_dedup(path, path + ".nfcm", store)
+            dedup_time = time.perf_counter() - start
+            stored = dir_size(store.root) - before + os.path.getsize(path + ".nfcm")
+            print(f"| {step} | {stream_size / 1024**2:.1f} | {stream_time:.2f} | "
+                  f"{summary['new_chunks']}/{summary['chunks']} | {stored / 1024**2:.1f} | {dedup_time:.2f} |")
+        dedup_total = dir_size(store.root) + sum(os.path.getsize(p + ".nfcm") for p in paths)
+        print(f"\nTotal on disk: compress_stream {stream_total / 1024**2:.1f} MB, dedup store + manifests {dedup_total / 1024**2:.1f} MB")
+    finally:
+        shutil.rmtree(workdir)
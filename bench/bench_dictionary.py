@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+
+def make_objects(n, seed=0):
+    # Many small objects (2-64 KB) like an inference service produces: request
+    # metadata, token-id arrays sharing system-prompt prefixes, and float16
+    # activation snippets drawn around a fixed set of per-layer patterns.
+    rng = np.random.default_rng(seed)
+    prompts = [rng.integers(0, 32000, int(rng.integers(300, 1500))).astype(np.int32) for _ in range(8)]
+    patterns = [rng.standard_normal(1024).astype(np.float16) for _ in range(16)]
+    objects = []
+    for i in range(n):
+        kind = i % 3
+        if kind == 0:
+            meta = {"request_id": f"req-{i:010d}", "model": "llama-2-7b-chat", "temperature": round(float(rng.random()), 2),
+                    "top_p": 0.9, "max_tokens": int(rng.integers(16, 2048)), "stop": ["</s>", "[INST]"],
+                    "user": f"tenant-{int(rng.integers(0, 50))}", "stream": bool(rng.random() < 0.5)}
+            objects.append(json.dumps(meta).encode('utf-8') * int(rng.integers(8, 64)))
+        elif kind == 1:
+            prompt = prompts[int(rng.integers(0, len(prompts)))]
+            tail = rng.integers(0, 32000, int(rng.integers(200, 8000))).astype(np.int32)
+            objects.append(np.concatenate([prompt, tail]))
+        else:
+            rows = int(rng.integers(1, 32))
+            picks = rng.integers(0, len(patterns), rows)
+            noise = (rng.standard_normal((rows, 1024)) * 0.01).astype(np.float16)
+            objects.append(np.stack([patterns[p] for p in picks]) + noise)
+    return objects
+
+def nbytes(obj):
+    return obj.nbytes if isinstance(obj, np.ndarray) else len(obj)
+
+def bench(label, proto, objects, **kwargs):
+    start = time.perf_counter()
+    records = [proto.compress(obj, **kwargs)[0] for obj in objects]
+    comp_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for record in records:
+        proto.decompress(record)
+    decomp_time = time.perf_counter() - start
+    orig = sum(map(nbytes, objects))
+    comp = sum(map(len, records))
+    print(f"| {label} | {orig / comp:.2f} | {comp / len(records):.0f} | "
+          f"{len(objects) / comp_time:,.0f} | {len(objects) / decomp_time:,.0f} |")
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    objects = make_objects(n)
+    sizes = [nbytes(obj) for obj in objects]
+    print(f"{n} objects, {min(sizes) / 1024:.1f}-{max(sizes) / 1024:.1f} KB, {sum(sizes) / 1024**2:.1f} MB total\n")
+    print("| Mode | Ratio | Bytes/record | Compress objects/s | Decompress objects/s |")
+    print("|---|---|---|---|---|")
+    bench("NFC2 record, sha256, blosc zstd clevel=9", NFCPrototype(), objects)
+    bench("NFC2 record, crc32, blosc zstd clevel=9", NFCPrototype(hash_algo='crc32'), objects)
+    proto = NFCPrototype(hash_algo='crc32')
+    start = time.perf_counter()
+    dictionary = proto.train_dictionary(objects[:2000])
+    print(f"| (dictionary training on 2000 samples: {time.perf_counter() - start:.2f} s, {len(dictionary.data) // 1024} KB) | | | | |")
+    bench("dictionary record, crc32, zstd level 9", proto, objects, dictionary=dictionary)
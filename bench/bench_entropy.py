@@ -0,0 +1,36 @@
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+from bench.run_bench import make_dataset
+
+DATASETS = ('smooth_floats', 'int8_quantized', 'token_ids', 'byte_blob')
+
+def best(fn, runs=3):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+if __name__ == "__main__":
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    nthreads = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    print(f"{size_mb} MB per dataset, {nthreads} thread(s), crc32 checksums, modular_delta on smooth_floats\n")
+    print("| Dataset | Stage | Ratio | Compress MB/s | Decompress MB/s |")
+    print("|---|---|---|---|---|")
+    for name in DATASETS:
+        data = make_dataset(name, size_mb)
+        predictor = 'modular_delta' if name == 'smooth_floats' else None
+        nbytes = memoryview(data).nbytes
+        for stage, kwargs in (("blosc zstd-9", {}), ("blosc lz4-9", dict(codec='lz4')), ("huffman", dict(entropy_coding=True))):
+            proto = NFCPrototype(hash_algo='crc32', nthreads=nthreads, **kwargs)
+            compress_time, record = best(lambda: proto.compress(data, predictor=predictor)[0])
+            decompress_time, restored = best(lambda: proto.decompress(record))
+            assert np.array_equal(restored, data) if isinstance(data, np.ndarray) else restored == data
+            print(f"| {name} | {stage} | {nbytes / len(record):.2f} | {nbytes / compress_time / 1024**2:.1f} | "
+                  f"{nbytes / decompress_time / 1024**2:.1f} |")
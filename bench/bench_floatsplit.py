@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+
+def make_weights(n, seed=0):
+    # LLM-style linear layer: normal weights with per-row scales and a few outliers
+    rng = np.random.default_rng(seed)
+    rows = n // 4096
+    weights = rng.standard_normal((rows, 4096)) * rng.uniform(0.005, 0.05, (rows, 1))
+    outliers = rng.random(weights.shape) < 1e-4
+    weights[outliers] *= 50
+    return weights
+
+def tensors(n):
+    weights = make_weights(n)
+    bf16_upcast = (weights.astype(np.float32).view(np.uint32) & 0xFFFF0000).view(np.float32) # bf16 checkpoint stored as fp32
+    return {"float32": weights.astype(np.float32), "float16": weights.astype(np.float16), "bf16 in float32": bf16_upcast}
+
+def best(fn, runs=3):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 4 * 1024 * 1024
+    print(f"{n:,} weights per tensor, crc32 checksums\n")
+    print("| Tensor | Path | Ratio | Compress MB/s | Decompress MB/s |")
+    print("|---|---|---|---|---|")
+    paths = (("shuffle + zstd-9", dict(clevel=9)), ("shuffle + zstd-1", dict(clevel=1)), ("float split", dict(float_split=True)))
+    for name, data in tensors(n).items():
+        for path, kwargs in paths:
+            proto = NFCPrototype(hash_algo='crc32', **kwargs)
+            compress_time, record = best(lambda: proto.compress(data)[0])
+            decompress_time, restored = best(lambda: proto.decompress(record))
+            assert restored.tobytes() == data.tobytes()
+            print(f"| {name} | {path} | {data.nbytes / len(record):.3f} | {data.nbytes / compress_time / 1024**2:.1f} | "
+                  f"{data.nbytes / decompress_time / 1024**2:.1f} |")
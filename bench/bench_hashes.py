@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+import numpy as np
+import blosc
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.hashing import available_hashes, digest_blocks, hash_block_size_for
+
+def best_time(fn, runs=3):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def bench_hashes(data, workers):
+    size_mb = data.nbytes / 1024**2
+    view = memoryview(data)
+    print(f"| Algorithm | Digest bytes/block | 1 thread MB/s | {workers} threads MB/s |")
+    print("|---|---|---|---|")
+    for algo in available_hashes():
+        block_size = hash_block_size_for(data.nbytes, algo)
+        digest_len = len(digest_blocks(algo, view[:1]))
+        serial = best_time(lambda: digest_blocks(algo, view, block_size))
+        parallel = best_time(lambda: digest_blocks(algo, view, block_size, workers))
+        print(f"| {algo} | {digest_len} | {size_mb / serial:.0f} | {size_mb / parallel:.0f} |")
+
+def bench_codecs(data):
+    # Reference point: the codec the hash runs next to
+    size_mb = data.nbytes / 1024**2
+    for cname, clevel in [('lz4', 1), ('zstd', 1)]:
+        elapsed = best_time(lambda: blosc.compress(data, typesize=4, cname=cname, clevel=clevel, shuffle=blosc.SHUFFLE), runs=1)
+        print(f"| blosc {cname} clevel={clevel} (compress) | - | {size_mb / elapsed:.0f} | - |")
+
+if __name__ == "__main__":
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    workers = os.cpu_count() or 1
+    # Smooth float32 data: compressible enough that the codec is not the bottleneck
+    n = size_mb * 1024 * 1024 // 4
+    data = np.sin(np.arange(n, dtype=np.float32) / 1000).view(np.uint8)
+    print(f"Hash throughput on {size_mb} MB, {workers} cores\n")
+    bench_hashes(data, workers)
+    bench_codecs(data)
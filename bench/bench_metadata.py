@@ -0,0 +1,30 @@
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+
+def make_blocks(n, size, seed=0):
+    # Small float32 tensors: the per-record header and metadata dominate their cost
+    rng = np.random.default_rng(seed)
+    return [np.cumsum(rng.standard_normal(size)).astype(np.float32).reshape(-1, 16) for _ in range(n)]
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    blocks = make_blocks(n, size)
+    print(f"{n} float32 tensors of {size} values, crc32 checksums\n")
+    print("| Metadata | Metadata bytes/record | Record bytes | Decompress records/s | Decompress MB/s |")
+    print("|---|---|---|---|---|")
+    for metadata_format in ('json', 'binary'):
+        proto = NFCPrototype(hash_algo='crc32', metadata_format=metadata_format)
+        records = [proto.compress(block, predictor='modular_delta')[0] for block in blocks]
+        meta_len = int.from_bytes(records[0][16:24], 'big')
+        start = time.perf_counter()
+        for record in records:
+            proto.decompress(record)
+        elapsed = time.perf_counter() - start
+        print(f"| {metadata_format} | {meta_len} | {sum(map(len, records)) / n:.0f} | {n / elapsed:,.0f} | "
+              f"{n * size * 4 / elapsed / 1024**2:.1f} |")
@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+
+WORKER_COUNTS = [1, 2, 4, 8, 16]
+
+def make_input(path, size_mb):
+    # Smooth float32 data mixed with noise so every chunk does real codec work
+    n = size_mb * 1024 * 1024 // 4
+    data = (np.linspace(0, 1000, n) + np.random.rand(n) * 0.01).astype(np.float32)
+    data.tofile(path)
+
+def bench_workers(proto, in_path, size_mb, chunk_size, runs=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        nfc_path = os.path.join(tmp, "out.nfc")
+        dec_path = os.path.join(tmp, "out.bin")
+        baseline = None
+        for workers in WORKER_COUNTS:
+            comp_times, decomp_times = [], []
+            for _ in range(runs):
+                start = time.perf_counter()
+                proto.compress_stream(in_path, nfc_path, chunk_size=chunk_size, workers=workers)
+                comp_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                proto.decompress_stream(nfc_path, dec_path, workers=workers)
+                decomp_times.append(time.perf_counter() - start)
+            comp_time, decomp_time = min(comp_times), min(decomp_times)
+            if baseline is None:
+                baseline = comp_time
+            print(f"workers={workers:>2}  compress {size_mb / comp_time:8.1f} MB/s  "
+                  f"decompress {size_mb / decomp_time:8.1f} MB/s  speedup {baseline / comp_time:5.2f}x")
+
+if __name__ == "__main__":
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    chunk_size = 1024 * 1024 * 16
+    print(f"Parallel streaming benchmark: {size_mb} MB input, {chunk_size // 1024**2} MB chunks, {os.cpu_count()} cores")
+    with tempfile.TemporaryDirectory() as tmp:
+        in_path = os.path.join(tmp, "input.bin")
+        make_input(in_path, size_mb)
+        bench_workers(NFCPrototype(), in_path, size_mb, chunk_size)
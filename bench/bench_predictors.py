@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+
+def make_datasets(rng):
+    # Image-like: smooth 2-D gradient plus sensor noise, 16-bit
+    y, x = np.mgrid[0:2048, 0:2048]
+    image = (20000 + 8000 * np.sin(x / 300) * np.cos(y / 200) + rng.normal(0, 20, x.shape)).astype(np.uint16)
+    # Time series: 8 interleaved channels of float32 random walks, shape (samples, channels)
+    series = np.cumsum(rng.normal(0, 0.01, size=(1_000_000, 8)), axis=0).astype(np.float32)
+    # Weights: float32 normal matrix with a per-row scale, like a linear layer
+    weights = (rng.normal(0, 0.02, size=(2048, 2048)) * rng.uniform(0.5, 2, size=(2048, 1))).astype(np.float32)
+    return {"image_uint16": image, "timeseries_float32": series, "weights_float32": weights}
+
+PREDICTOR_CONFIGS = [
+    ("none", None, None),
+    ("modular_delta", "modular_delta", None),
+    ("axis_delta(axis=0)", "axis_delta", {"axis": 0}),
+    ("axis_delta(axis=-1)", "axis_delta", {"axis": -1}),
+    ("lorenzo", "lorenzo", None),
+    ("stride_delta(stride=8)", "stride_delta", {"stride": 8}),
+    ("xor", "xor", None),
+]
+
+def bench(proto, data, predictor, params, runs=3):
+    comp_times, decomp_times = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        nfc_binary, orig_size, comp_size = proto.compress(data, predictor=predictor, predictor_params=params)
+        comp_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        proto.decompress(nfc_binary)
+        decomp_times.append(time.perf_counter() - start)
+    size_mb = orig_size / 1024**2
+    return orig_size / comp_size, size_mb / min(comp_times), size_mb / min(decomp_times)
+
+if __name__ == "__main__":
+    proto = NFCPrototype(clevel=5, codec='zstd')
+    datasets = make_datasets(np.random.default_rng(0))
+    print("| Dataset | Predictor | Ratio | Compress MB/s | Decompress MB/s |")
+    print("|---|---|---|---|---|")
+    for dataset_name, data in datasets.items():
+        for label, predictor, params in PREDICTOR_CONFIGS:
+            ratio, comp_mbs, decomp_mbs = bench(proto, data, predictor, params)
+            print(f"| {dataset_name} | {label} | {ratio:.3f} | {comp_mbs:.0f} | {decomp_mbs:.0f} |")
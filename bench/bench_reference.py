@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+import blosc
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.reference import Reference
+
+def lora_merge(base, rank, scale, rng):
+    # W + scale * B @ A, computed in float32 and cast back like a merged LoRA export
+    rows, cols = base.shape
+    a = rng.standard_normal((rank, cols)).astype(np.float32) / np.sqrt(cols)
+    b = rng.standard_normal((rows, rank)).astype(np.float32) / np.sqrt(rank)
+    return (base.astype(np.float32) + scale * (b @ a)).astype(base.dtype)
+
+def sparse_update(base, fraction, rng):
+    # Partial fine-tune: only a fraction of the weights move
+    tuned = base.copy()
+    mask = rng.random(base.shape) < fraction
+    tuned[mask] = (tuned[mask].astype(np.float32) * (1 + 1e-2 * rng.standard_normal(mask.sum()))).astype(base.dtype)
+    return tuned
+
+def bench(label, proto, tuned, **kwargs):
+    start = time.perf_counter()
+    record = proto.compress(tuned, **kwargs)[0]
+    comp_time = time.perf_counter() - start
+    reference = kwargs.get("reference")
+    start = time.perf_counter()
+    proto.decompress(record, reference=reference)
+    decomp_time = time.perf_counter() - start
+    mb = tuned.nbytes / 1024**2
+    print(f"| {label} | {tuned.nbytes / len(record):.2f} | {mb / comp_time:.0f} | {mb / decomp_time:.0f} |")
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    rng = np.random.default_rng(0)
+    base = (rng.standard_normal((rows, 4096)) * 0.02).astype(np.float16)
+    cases = [
+        ("LoRA r=16 merged, scale 1e-3", lora_merge(base, 16, 1e-3, rng)),
+        ("LoRA r=16 merged, scale 1e-2", lora_merge(base, 16, 1e-2, rng)),
+        ("5% of weights updated", sparse_update(base, 0.05, rng)),
+    ]
+    print(f"float16 tensor {base.shape}, {base.nbytes / 1024**2:.0f} MB, clevel=9 zstd + byte shuffle\n")
+    print("| Case | Ratio | Compress MB/s | Decompress MB/s |")
+    print("|---|---|---|---|")
+    proto = NFCPrototype()
+    reference = Reference(base)
+    reference.id # hash the base once, outside the timings
+    for name, tuned in cases:
+        bench(f"{name}: standalone", proto, tuned)
+        bench(f"{name}: reference xor", proto, tuned, reference=reference)
+        bench(f"{name}: reference sub", proto, tuned, reference=reference, reference_mode='sub')
+        bench(f"{name}: reference xor, bitshuffle", NFCPrototype(shuffle=blosc.BITSHUFFLE), tuned, reference=reference)
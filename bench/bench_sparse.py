@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.core import NFCPrototype
+
+def make_pruned(n, sparsity, seed=0):
+    # Magnitude-pruned linear layer: the smallest |w| are zeroed
+    rng = np.random.default_rng(seed)
+    weights = (rng.standard_normal((n // 4096, 4096)) * 0.02).astype(np.float32)
+    if sparsity:
+        weights[np.abs(weights) < np.quantile(np.abs(weights), sparsity)] = 0
+    return weights
+
+def best(fn, runs=3):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 4 * 1024 * 1024
+    print(f"{n:,} float32 weights per tensor, shuffle + zstd-1, crc32 checksums\n")
+    print("| Sparsity | Path | Ratio | Compress MB/s | Decompress MB/s | Sparse decode MB/s |")
+    print("|---|---|---|---|---|---|")
+    for sparsity in (0.0, 0.5, 0.9, 0.99):
+        data = make_pruned(n, sparsity)
+        for path, kwargs in (("dense", {}), ("sparse", dict(sparse=True))):
+            proto = NFCPrototype(hash_algo='crc32', clevel=1, **kwargs)
+            compress_time, record = best(lambda: proto.compress(data)[0])
+            decompress_time, restored = best(lambda: proto.decompress(record))
+            assert restored.tobytes() == data.tobytes()
+            sparse_time, tensor = best(lambda: proto.decompress(record, sparse=True))
+            assert tensor.nnz == np.count_nonzero(data)
+            print(f"| {sparsity:.0%} | {path} | {data.nbytes / len(record):.2f} | {data.nbytes / compress_time / 1024**2:.1f} | "
+                  f"{data.nbytes / decompress_time / 1024**2:.1f} | {data.nbytes / sparse_time / 1024**2:.1f} |")
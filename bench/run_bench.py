@@ -1,26 +1,308 @@
+"""Benchmark suite for NFC-Prototype.
+
+    python bench/run_bench.py run --out results.json
+    python bench/run_bench.py run --quick --baseline results.json
+    python bench/run_bench.py compare baseline.json results.json --tolerance 0.10
+    python bench/run_bench.py run --backends blosc blosc2 zstd lz4 --codecs zstd
+
+`run` sweeps backend x codec x clevel x shuffle x prediction x block size x workers
+over a synthetic corpus generated locally from fixed seeds (nothing is downloaded) and
+reports compress/decompress MB/s, ratio and peak RSS per case. Each case runs in a
+fresh child process so peak RSS is per case rather than a process-wide high-water
+mark. `compare` flags cases that got slower, compress worse or use more memory than
+a saved baseline, and exits with status 1 if any did.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import blosc
 import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nfc_prototype.backends import available_backends
 from nfc_prototype.core import NFCPrototype
-import snappy  # Baseline
-import time
 
-def bench_compress(proto, data, runs=3):
-    times = []
+try:
+    import snappy
+except ImportError:
+    snappy = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SHUFFLES = {'none': blosc.NOSHUFFLE, 'byte': blosc.SHUFFLE, 'bit': blosc.BITSHUFFLE}
+MB = 1024 * 1024
+
+
+# --- Synthetic corpus -------------------------------------------------------
+
+def random_floats(n_bytes, rng):
+    return rng.random(n_bytes // 4, dtype=np.float32)
+
+def smooth_floats(n_bytes, rng):
+    # Slowly varying signal plus low-amplitude noise (activations, sensor data)
+    n = n_bytes // 4
+    t = np.linspace(0, 200, n)
+    return (np.sin(t) * 100 + t + rng.standard_normal(n) * 0.01).astype(np.float32)
+
+def sparse_weights(n_bytes, rng):
+    # Pruned layer: 90% exact zeros, the rest normally distributed
+    n = n_bytes // 4
+    weights = rng.standard_normal(n).astype(np.float32) * 0.02
+    weights[rng.random(n) < 0.9] = 0
+    return weights.reshape(-1, 1024) if n % 1024 == 0 else weights
+
+def int8_quantized_weights(n_bytes, rng):
+    return np.clip(np.round(rng.standard_normal(n_bytes) * 20), -127, 127).astype(np.int8)
+
+def token_ids(n_bytes, rng):
+    # Zipf-distributed ids over a 32k vocabulary, like a tokenized text corpus
+    return np.minimum(rng.zipf(1.2, n_bytes // 4), 32000).astype(np.int32)
+
+def byte_blob(n_bytes, rng):
+    # JSON-lines style records: repetitive keys, varying values
+    words = [b'model', b'layer', b'weight', b'bias', b'token', b'score', b'step', b'loss']
+    lines = []
+    size = 0
+    while size < n_bytes:
+        pick = rng.integers(0, len(words), 3)
+        line = b'{"%s": %d, "%s": %.6f, "tag": "%s"}\n' % (
+            words[pick[0]], rng.integers(0, 1 << 20), words[pick[1]], rng.random(), words[pick[2]])
+        lines.append(line)
+        size += len(line)
+    return b''.join(lines)[:n_bytes]
+
+DATASETS = {
+    'random_floats': random_floats,
+    'smooth_floats': smooth_floats,
+    'sparse_weights': sparse_weights,
+    'int8_quantized': int8_quantized_weights,
+    'token_ids': token_ids,
+    'byte_blob': byte_blob,
+}
+
+def make_dataset(name, size_mb, seed=0):
+    return DATASETS[name](size_mb * MB, np.random.default_rng(seed))
+
+
+# --- Measurement ------------------------------------------------------------
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MB if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, KiB on Linux
+
+def split_blocks(data, block_size):
+    # Splits along flat elements so numpy blocks keep their dtype (typesize, prediction)
+    if isinstance(data, np.ndarray):
+        flat = data.reshape(-1)
+        step = max(block_size // data.dtype.itemsize, 1)
+        return [flat[i:i + step] for i in range(0, flat.size, step)]
+    view = memoryview(data)
+    return [view[i:i + block_size] for i in range(0, len(view), block_size)]
+
+def best_time(fn, runs):
+    best, result = float('inf'), None
     for _ in range(runs):
-        start = time.time()
-        nfc_binary, orig_size, comp_size = proto.compress(data)
-        times.append(time.time() - start)
-    ratio = orig_size / comp_size
-    print(f"NFC Ratio: {ratio:.2f}x, Avg Time: {sum(times)/runs:.4f}s")
-
-def bench_snappy(data):
-    data_bytes = data.tobytes()
-    compressed = snappy.compress(data_bytes)
-    ratio = len(data_bytes) / len(compressed)
-    print(f"Snappy Ratio: {ratio:.2f}x")
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def run_nfc_case(case):
+    data = make_dataset(case['dataset'], case['size_mb'], case['seed'])
+    orig_bytes = data.nbytes if isinstance(data, np.ndarray) else len(data)
+    proto = NFCPrototype(clevel=case['clevel'], shuffle=SHUFFLES[case['shuffle']], codec=case['codec'],
+                         backend=case.get('backend', 'blosc'))
+    predictor = None if case['predictor'] == 'none' else case['predictor']
+    blocks = split_blocks(data, case['block_size'] * 1024)
+    workers = case['workers']
+
+    def run(fn, items):
+        return list(proto._ordered_map(fn, items, workers) if workers > 1 else map(fn, items))
+
+    compress_block = lambda block: proto.compress(block, predictor=predictor)[0]
+    compress_time, records = best_time(lambda: run(compress_block, blocks), case['runs'])
+    decompress_time, restored = best_time(lambda: run(proto.decompress, records), case['runs'])
+    if isinstance(data, np.ndarray):
+        assert all(np.array_equal(a, b) for a, b in zip(restored, blocks)), "round-trip mismatch"
+    else:
+        assert b''.join(restored) == data, "round-trip mismatch"
+    return measurements(case, orig_bytes, sum(map(len, records)), compress_time, decompress_time)
+
+def run_baseline_case(case):
+    data = make_dataset(case['dataset'], case['size_mb'], case['seed'])
+    raw = data.tobytes() if isinstance(data, np.ndarray) else data
+    if case['codec'] == 'snappy':
+        compress, decompress = snappy.compress, snappy.decompress
+    else:
+        cctx = zstandard.ZstdCompressor(level=case['clevel'])
+        dctx = zstandard.ZstdDecompressor()
+        compress, decompress = cctx.compress, dctx.decompress
+    compress_time, compressed = best_time(lambda: compress(raw), case['runs'])
+    decompress_time, restored = best_time(lambda: decompress(compressed), case['runs'])
+    assert restored == raw, "round-trip mismatch"
+    return measurements(case, len(raw), len(compressed), compress_time, decompress_time)
+
+def measurements(case, orig_bytes, comp_bytes, compress_time, decompress_time):
+    return dict(case,
+                orig_bytes=orig_bytes,
+                comp_bytes=comp_bytes,
+                ratio=round(orig_bytes / max(comp_bytes, 1), 4),
+                compress_mb_s=round(orig_bytes / MB / compress_time, 2),
+                decompress_mb_s=round(orig_bytes / MB / decompress_time, 2),
+                peak_rss_mb=round(peak_rss_mb(), 1))
+
+def run_case(case):
+    if case['codec'] in ('snappy', 'zstandard'):
+        return run_baseline_case(case)
+    return run_nfc_case(case)
+
+
+# --- Sweep ------------------------------------------------------------------
+
+CASE_KEY = ('dataset', 'backend', 'codec', 'clevel', 'shuffle', 'predictor', 'block_size', 'workers')
+CASE_DEFAULTS = {'backend': 'blosc'} # results saved before the key existed
+CODEC_BACKENDS = ('blosc', 'blosc2') # backends that take a blosc codec name
+
+def build_cases(args):
+    common = {'size_mb': args.size_mb, 'seed': args.seed, 'runs': args.runs}
+    cases = []
+    for dataset, backend, codec, clevel, shuffle, predictor, block_size, workers in itertools.product(
+            args.datasets, args.backends, args.codecs, args.clevels, args.shuffles, args.predictors,
+            args.block_sizes, args.workers):
+        if predictor != 'none' and dataset == 'byte_blob':
+            continue # predictors only apply to numeric tensors
+        if backend not in CODEC_BACKENDS and codec != args.codecs[0]:
+            continue # raw zstd/lz4 ignore the codec name
+        cases.append(dict(common, dataset=dataset, backend=backend, codec=codec, clevel=clevel, shuffle=shuffle,
+                          predictor=predictor, block_size=block_size, workers=workers))
+    # Reference points outside NFC, when the libraries are installed
+    for dataset in args.datasets:
+        if snappy is not None:
+            cases.append(dict(common, dataset=dataset, backend='-', codec='snappy', clevel=0, shuffle='none',
+                              predictor='none', block_size=0, workers=1))
+        if zstandard is not None:
+            cases.append(dict(common, dataset=dataset, backend='-', codec='zstandard', clevel=3, shuffle='none',
+                              predictor='none', block_size=0, workers=1))
+    return cases
+
+def run_suite(args):
+    cases = build_cases(args)
+    results = []
+    print(f"{len(cases)} cases, {args.size_mb} MB per dataset, best of {args.runs} runs")
+    # One child per case: ru_maxrss is a high-water mark, so sharing a process would
+    # report the largest case for every case after it.
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes=1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_case, cases):
+            results.append(result)
+            print(format_row(result), flush=True)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "blosc": blosc.__version__,
+            "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        "results": results,
+    }
+
+def format_row(r):
+    label = f"{r['dataset']:<15} {r.get('backend', 'blosc'):<6} {r['codec']:<9} c{r['clevel']} {r['shuffle']:<4} " \
+            f"{r['predictor']:<13} {r['block_size']:>6}K w{r['workers']:<2}"
+    return (f"{label} ratio {r['ratio']:7.2f}  comp {r['compress_mb_s']:8.1f} MB/s  "
+            f"decomp {r['decompress_mb_s']:8.1f} MB/s  rss {r['peak_rss_mb']:7.1f} MB")
+
+
+# --- Compare ----------------------------------------------------------------
+
+def compare(baseline, current, tolerance=0.10, ratio_tolerance=0.01):
+    # Returns a list of regression messages for cases present in both result sets.
+    # Throughput may drop by `tolerance`, ratio by `ratio_tolerance` and peak RSS may
+    # grow by `tolerance` before a case is flagged.
+    key = lambda r: tuple(r.get(k, CASE_DEFAULTS.get(k)) for k in CASE_KEY)
+    base = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        b = base.get(key(r))
+        if b is None:
+            continue
+        label = " ".join(f"{k}={r.get(k, CASE_DEFAULTS.get(k))}" for k in CASE_KEY)
+        for metric in ('compress_mb_s', 'decompress_mb_s'):
+            if r[metric] < b[metric] * (1 - tolerance):
+                regressions.append(f"{label}: {metric} {b[metric]} -> {r[metric]}")
+        if r['ratio'] < b['ratio'] * (1 - ratio_tolerance):
+            regressions.append(f"{label}: ratio {b['ratio']} -> {r['ratio']}")
+        if r['peak_rss_mb'] > b['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{label}: peak_rss_mb {b['peak_rss_mb']} -> {r['peak_rss_mb']}")
+    return regressions
+
+def report_regressions(baseline_path, current, tolerance):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, current, tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"{len(regressions)} regression(s) against {baseline_path}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command')
+
+    run = sub.add_parser('run', help='run the benchmark sweep')
+    run.add_argument('--datasets', nargs='+', default=list(DATASETS), choices=list(DATASETS))
+    run.add_argument('--backends', nargs='+', default=['blosc'], choices=available_backends())
+    run.add_argument('--codecs', nargs='+', default=['lz4', 'zstd'])
+    run.add_argument('--clevels', nargs='+', type=int, default=[1, 5, 9])
+    run.add_argument('--shuffles', nargs='+', default=['byte', 'bit'], choices=list(SHUFFLES))
+    run.add_argument('--predictors', nargs='+', default=['none', 'modular_delta'])
+    run.add_argument('--block-sizes', nargs='+', type=int, default=[1024, 16384], help='block size in KiB')
+    run.add_argument('--workers', nargs='+', type=int, default=[1, 4])
+    run.add_argument('--size-mb', type=int, default=64, help='size of each dataset')
+    run.add_argument('--runs', type=int, default=3)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--quick', action='store_true', help='small smoke-test sweep (8 MB, one setting per axis)')
+    run.add_argument('--out', help='write results as JSON')
+    run.add_argument('--baseline', help='compare against a saved results JSON after the run')
+    run.add_argument('--tolerance', type=float, default=0.10)
+
+    cmp = sub.add_parser('compare', help='compare two results files')
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+    cmp.add_argument('--tolerance', type=float, default=0.10)
+
+    args = parser.parse_args(argv)
+    if args.command == 'compare':
+        with open(args.current) as f:
+            return report_regressions(args.baseline, json.load(f), args.tolerance)
+    if args.command is None:
+        args = parser.parse_args(['run'] + (argv if argv is not None else sys.argv[1:]))
+    if args.quick:
+        args.size_mb, args.runs = 8, 1
+        args.codecs, args.clevels, args.shuffles = args.codecs[:1], [5], ['byte']
+        args.block_sizes, args.workers = [1024], [1]
+
+    results = run_suite(args)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {len(results['results'])} results to {args.out}")
+    if args.baseline:
+        return report_regressions(args.baseline, results, args.tolerance)
+    return 0
 
 if __name__ == "__main__":
-    data = np.random.rand(10000, 10000).astype(np.float32)  # ~400MB
-    proto = NFCPrototype()
-    bench_compress(proto, data)
-    bench_snappy(data)
-    # Add zstd if installed: import zstd; ...
\ No newline at end of file
+    sys.exit(main())
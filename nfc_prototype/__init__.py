@@ -1 +1,8 @@
 from .core import NFCPrototype
+from .tensor import ChunkedTensorReader
+from .fileio import NFCReader, NFCWriter
+from .dictionary import NFCDictionary
+from .dedup import ChunkStore
+from .reference import Reference
+from .sparse import SparseTensor
+from .adapters import SafetensorsArchive
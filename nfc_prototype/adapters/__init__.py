@@ -0,0 +1 @@
+from .safetensors import SafetensorsArchive, read_safetensors_header
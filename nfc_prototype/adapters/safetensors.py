@@ -0,0 +1,269 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager, nullcontext
+import numpy as np
+
+# safetensors file: [u64 little-endian header length][header JSON][tensor data]
+# The header maps tensor name -> {"dtype", "shape", "data_offsets": [begin, end]}
+# (offsets relative to the end of the header) plus an optional "__metadata__" dict.
+#
+# Archive layout:
+#   [NFC2 tensor record]*n [index JSON] [ARCHIVE_TRAILER]
+# Each tensor is an ordinary NFC2 record compressed with its own dtype, so shuffle
+# typesize and prediction match the tensor. The index maps name -> (offset, length)
+# and keeps the original safetensors header so the file can be rebuilt bit-exact.
+# With a reference (base model) file, each tensor record holds only its residual
+# against the same-named base tensor (see reference.py).
+ARCHIVE_MAGIC = b'NFCS'
+ARCHIVE_VERSION = 1
+ARCHIVE_TRAILER = struct.Struct('!QQB3x4s') # index offset, index length, version, reserved, magic
+HEADER_LEN = struct.Struct('<Q')
+MAX_HEADER_BYTES = 100 * 1024 * 1024
+
+# Types numpy has no native dtype for (BF16, FP8) are compressed and returned as
+# same-width unsigned integers holding the raw bits.
+SAFETENSORS_DTYPES = {
+    'F64': '<f8', 'F32': '<f4', 'F16': '<f2', 'BF16': '<u2',
+    'I64': '<i8', 'I32': '<i4', 'I16': '<i2', 'I8': 'i1',
+    'U64': '<u8', 'U32': '<u4', 'U16': '<u2', 'U8': 'u1',
+    'BOOL': '?', 'F8_E4M3': 'u1', 'F8_E5M2': 'u1',
+}
+
+
+def numpy_dtype(st_dtype):
+    if st_dtype not in SAFETENSORS_DTYPES:
+        raise ValueError(f"Unsupported safetensors dtype '{st_dtype}'. Expected one of {list(SAFETENSORS_DTYPES)}")
+    return np.dtype(SAFETENSORS_DTYPES[st_dtype])
+
+
+def read_safetensors_header(buffer):
+    # Returns (header dict, raw header bytes, data start) for a safetensors buffer,
+    # checking every tensor's byte range against the buffer size.
+    if len(buffer) < HEADER_LEN.size:
+        raise ValueError("File is too small to be a safetensors file")
+    header_len, = HEADER_LEN.unpack(buffer[:HEADER_LEN.size])
+    data_start = HEADER_LEN.size + header_len
+    if header_len > MAX_HEADER_BYTES or data_start > len(buffer):
+        raise ValueError(f"Invalid safetensors header length {header_len}")
+    header_bytes = bytes(buffer[HEADER_LEN.size:data_start])
+    try:
+        header = json.loads(header_bytes)
+    except ValueError as e:
+        raise ValueError(f"Invalid safetensors header JSON: {e}") from None
+
+    data_len = len(buffer) - data_start
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        begin, end = info["data_offsets"]
+        dtype = numpy_dtype(info["dtype"])
+        expected = int(np.prod(info["shape"], dtype=np.int64)) * dtype.itemsize
+        if not 0 <= begin <= end <= data_len or end - begin != expected:
+            raise ValueError(f"Tensor '{name}' has invalid data_offsets {info['data_offsets']}")
+    return header, header_bytes, data_start
+
+
+def _tensor_names(header):
+    return [name for name in header if name != "__metadata__"]
+
+
+@contextmanager
+def _mapped(source):
+    # memoryview over a safetensors path (memory-mapped) or buffer
+    if not isinstance(source, (str, os.PathLike)):
+        yield memoryview(source)
+        return
+    with open(source, 'rb') as fin, mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+
+
+class _BaseTensors:
+    # Raw bytes of the tensors of a reference (base) safetensors buffer, by name
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.header, _, self.data_start = read_safetensors_header(buffer)
+
+    def get(self, name, nbytes):
+        # The base tensor's bytes, or None if it is missing or differs in size
+        info = self.header.get(name)
+        if name == "__metadata__" or info is None:
+            return None
+        begin, end = info["data_offsets"]
+        if end - begin != nbytes:
+            return None
+        return self.buffer[self.data_start + begin:self.data_start + end]
+
+
+def write_archive(proto, source, fout, workers=1, use_prediction=False, reference=None, reference_mode='xor'):
+    # Compresses every tensor of a safetensors file (path or buffer) into one archive.
+    # Tensors are viewed straight out of the mapped file and compressed on `workers`
+    # threads; returns the number of bytes written.
+    if isinstance(source, (str, os.PathLike)) or isinstance(reference, (str, os.PathLike)):
+        with _mapped(source) as view, (_mapped(reference) if reference is not None else nullcontext()) as base:
+            return write_archive(proto, view, fout, workers, use_prediction, base, reference_mode)
+
+    buffer = memoryview(source)
+    header, header_bytes, data_start = read_safetensors_header(buffer)
+    names = _tensor_names(header)
+    base = _BaseTensors(memoryview(reference)) if reference is not None else None
+
+    def compress_tensor(name):
+        info = header[name]
+        begin, end = info["data_offsets"]
+        tensor = np.frombuffer(buffer[data_start + begin:data_start + end], dtype=numpy_dtype(info["dtype"]))
+        base_tensor = base.get(name, end - begin) if base is not None else None
+        return proto.compress(tensor.reshape(info["shape"]), use_prediction=use_prediction,
+                              reference=base_tensor, reference_mode=reference_mode)[0]
+
+    if workers > 1:
+        records = proto._ordered_map(compress_tensor, names, workers)
+    else:
+        records = map(compress_tensor, names)
+
+    tensors = {}
+    offset = 0
+    for name, record in zip(names, records):
+        fout.write(record)
+        tensors[name] = [offset, len(record)]
+        offset += len(record)
+
+    index = {
+        "schema_version": "nfc-0.2",
+        "format_hint": "safetensors_archive",
+        "safetensors_header": header_bytes.decode('utf-8'),
+        "tensors": tensors,
+    }
+    index_json = json.dumps(index).encode('utf-8')
+    fout.write(index_json)
+    fout.write(ARCHIVE_TRAILER.pack(offset, len(index_json), ARCHIVE_VERSION, ARCHIVE_MAGIC))
+    return offset + len(index_json) + ARCHIVE_TRAILER.size
+
+
+class SafetensorsArchive(Mapping):
+    """Lazy name -> tensor mapping over a safetensors archive.
+
+    ``source`` is a path or any bytes-like buffer. Opening reads only the trailer and
+    the index; each lookup reads and decompresses that one tensor's record.
+    ``reference`` is the base safetensors file (path or buffer) the archive was
+    delta-encoded against, if any.
+    """
+
+    def __init__(self, source, proto, workers=1, reference=None):
+        self.proto = proto
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._reference = None
+        if reference is not None:
+            self._reference = _mapped(reference)
+            self._base = _BaseTensors(self._reference.__enter__())
+        if isinstance(source, (str, os.PathLike)):
+            self._file = open(source, 'rb')
+            self._buffer = None
+        else:
+            self._file = None
+            self._buffer = memoryview(source)
+
+        size = self._size()
+        if size < ARCHIVE_TRAILER.size:
+            raise ValueError("Archive is too small to hold a trailer")
+        index_offset, index_len, version, magic = ARCHIVE_TRAILER.unpack(
+            bytes(self._read(size - ARCHIVE_TRAILER.size, ARCHIVE_TRAILER.size)))
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(f"Invalid safetensors archive magic. Expected {ARCHIVE_MAGIC}, got {magic}")
+        if version != ARCHIVE_VERSION:
+            raise ValueError(f"Safetensors archive version mismatch. Expected {ARCHIVE_VERSION}, got {version}")
+        if index_offset + index_len + ARCHIVE_TRAILER.size != size:
+            raise ValueError("Archive index does not match file size. The archive is truncated or corrupt.")
+
+        index = json.loads(bytes(self._read(index_offset, index_len)))
+        self._header_bytes = index["safetensors_header"].encode('utf-8')
+        self.header = json.loads(self._header_bytes)
+        self.metadata = self.header.get("__metadata__", {})
+        self._entries = {name: tuple(entry) for name, entry in index["tensors"].items()}
+
+    def _size(self):
+        if self._file is not None:
+            return self._file.seek(0, 2)
+        return len(self._buffer)
+
+    def _read(self, offset, length):
+        if self._file is not None:
+            with self._lock:
+                self._file.seek(offset)
+                return self._file.read(length)
+        return self._buffer[offset:offset + length]
+
+    def __getitem__(self, name):
+        if name not in self._entries:
+            raise KeyError(name)
+        offset, length = self._entries[name]
+        base_tensor = None
+        if self._reference is not None:
+            info = self.header[name]
+            base_tensor = self._base.get(name, info["data_offsets"][1] - info["data_offsets"][0])
+        return self.proto.decompress(self._read(offset, length), reference=base_tensor)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def dtype(self, name):
+        # The safetensors dtype string ('BF16', 'F32', ...) of a tensor
+        return self.header[name]["dtype"]
+
+    def load(self, names=None):
+        # Decompresses several tensors (all by default) on `workers` threads.
+        names = list(self._entries) if names is None else list(names)
+        if self.workers > 1:
+            tensors = self.proto._ordered_map(self.__getitem__, names, self.workers)
+        else:
+            tensors = map(self.__getitem__, names)
+        return dict(zip(names, tensors))
+
+    def to_safetensors(self, out):
+        # Rebuilds the original safetensors file, byte for byte. `out` is a path or a
+        # writable, seekable binary file object.
+        if not hasattr(out, 'write'):
+            with open(out, 'wb') as fout:
+                return self.to_safetensors(fout)
+        start = out.tell()
+        out.write(HEADER_LEN.pack(len(self._header_bytes)))
+        out.write(self._header_bytes)
+        data_start = start + HEADER_LEN.size + len(self._header_bytes)
+        data_end = data_start
+        names = sorted(self._entries, key=lambda name: self.header[name]["data_offsets"][0])
+        for name, tensor in zip(names, map(self.__getitem__, names)):
+            begin, end = self.header[name]["data_offsets"]
+            out.seek(data_start + begin)
+            out.write(memoryview(np.ascontiguousarray(tensor).reshape(-1).view(np.uint8)))
+            data_end = max(data_end, data_start + end)
+        out.seek(data_end)
+        return data_end - start
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._reference is not None:
+            self._base = None
+            self._reference.__exit__(None, None, None)
+            self._reference = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
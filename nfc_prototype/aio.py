@@ -0,0 +1,155 @@
+import asyncio
+import functools
+import inspect
+import io
+
+from .backends import on_worker
+from .container import INDEX_MAGIC, check_index_tail, write_block_index
+from .stats import span
+
+# asyncio front end for NFCPrototype. Every codec call runs on an executor (the
+# loop's default ThreadPoolExecutor unless one is passed), so the event loop only
+# schedules I/O. blosc, hashlib and numpy release the GIL on large buffers, which
+# keeps the loop responsive while a big compress runs.
+#
+# Readers are objects with a coroutine read(n) (asyncio.StreamReader, aiofiles, ...);
+# writers have write(data), either a coroutine or a plain method followed by an
+# optional drain() coroutine (asyncio.StreamWriter).
+
+
+async def run_in_executor(executor, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+async def read_full(reader, n):
+    # Reads up to n bytes, short only at EOF. StreamReader.read(n) may return less
+    # than n even mid-stream, which would make block boundaries timing-dependent.
+    parts = []
+    remaining = n
+    while remaining > 0:
+        part = await reader.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+
+async def write_all(writer, data):
+    result = writer.write(data)
+    if inspect.isawaitable(result):
+        await result
+    drain = getattr(writer, 'drain', None)
+    if drain is not None:
+        await drain()
+
+
+async def _pipeline(items, fn, consume, workers, executor):
+    # Overlaps the three stages: the caller's async iterator reads item N+1 while
+    # fn(item N) runs on the executor and consume() writes result N-1. At most
+    # 2 * workers items are in flight; results are consumed in input order.
+    # Parallel items get one codec thread each, as in the blocking streams.
+    if workers > 1:
+        fn = on_worker(fn)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=2 * max(workers, 1))
+    failure = []
+
+    async def consumer():
+        while True:
+            future = await queue.get()
+            if future is None:
+                return
+            if failure:
+                # Keep draining so the producer never blocks on a full queue
+                future.cancel()
+                continue
+            try:
+                await consume(await future)
+            except BaseException as e:
+                failure.append(e)
+
+    consumer_task = asyncio.create_task(consumer())
+    try:
+        async for item in items:
+            if failure:
+                break
+            await queue.put(loop.run_in_executor(executor, fn, item))
+        await queue.put(None)
+        await consumer_task
+    except BaseException:
+        consumer_task.cancel()
+        raise
+    if failure:
+        raise failure[0]
+
+
+async def compress_stream(proto, reader, writer, chunk_size=1024 * 1024 * 64, workers=1, executor=None, index=True):
+    # Async counterpart of NFCPrototype.compress_stream; the output is byte-identical.
+    async def chunks():
+        while True:
+            with span(proto.stats, "compress.read") as stage:
+                chunk = await read_full(reader, chunk_size)
+                stage.bytes_out = len(chunk)
+            if not chunk:
+                return
+            yield chunk
+
+    # (compressed offset, compressed length, uncompressed offset, uncompressed length) per block
+    index_entries = []
+    offsets = [0, 0]
+
+    async def write_block(result):
+        nfc_chunk, orig_size = result
+        with span(proto.stats, "compress.write", len(nfc_chunk)):
+            await write_all(writer, nfc_chunk)
+        index_entries.append((offsets[0], len(nfc_chunk), offsets[1], orig_size))
+        offsets[0] += len(nfc_chunk)
+        offsets[1] += orig_size
+
+    await _pipeline(chunks(), proto._compress_chunk, write_block, workers, executor)
+    if index:
+        footer = io.BytesIO()
+        write_block_index(footer, index_entries, offsets[0])
+        await write_all(writer, footer.getvalue())
+
+
+async def iter_stream_blocks(proto, reader):
+    # Async counterpart of NFCPrototype._iter_stream_blocks
+    while True:
+        initial_bytes = await read_full(reader, 34)
+        if not initial_bytes:
+            return
+        if initial_bytes[:4] == INDEX_MAGIC:
+            tail = [initial_bytes]
+            while True:
+                part = await reader.read(1024 * 1024)
+                if not part:
+                    break
+                tail.append(part)
+            check_index_tail(b''.join(tail))
+            return
+        remaining_to_read = proto._stream_block_size(initial_bytes) - len(initial_bytes)
+        remaining_block_bytes = await read_full(reader, remaining_to_read)
+        if len(remaining_block_bytes) != remaining_to_read:
+            raise ValueError("Incomplete NFC block in stream")
+        yield initial_bytes + remaining_block_bytes
+
+
+async def decompress_stream(proto, reader, writer, workers=1, executor=None):
+    async def write_block(data):
+        with span(proto.stats, "decompress.write", len(data)):
+            await write_all(writer, data)
+
+    async def blocks():
+        nfc_blocks = iter_stream_blocks(proto, reader)
+        while True:
+            with span(proto.stats, "decompress.read") as stage:
+                block = await anext(nfc_blocks, None)
+                stage.bytes_out = len(block or b'')
+            if block is None:
+                return
+            yield block
+
+    await _pipeline(blocks(), proto.decompress, write_block, workers, executor)
@@ -0,0 +1,231 @@
+import json
+import struct
+import blosc
+import numpy as np
+
+from .backends import get_backend
+from .blocks import compress_blocks, decompress_blocks, normalize_block_size
+from .hashing import HASH_ALGORITHMS, digest_blocks, hash_name
+from .stats import count, span
+from .tuner import tune
+
+# Multi-entry batch container for many tensors (or byte strings) in one object:
+#   [BATCH_HEADER][table][digest]*n [frame]*m
+# The table is a blosc-compressed JSON object of columns, so thousands of entries
+# cost a few bytes each instead of an NFC2 header + metadata JSON + hash apiece:
+#   {"names": [...], "dtypes": [dtype.str | null for bytes], "shapes": [...],
+#    "entries": [[frame, offset], ...], "frames": [[comp_len, raw_len, flags], ...]}
+# Consecutive small entries with the same itemsize share a frame (up to PACK_BYTES),
+# so they also compress against each other; larger entries get frames of their own.
+# Frames are compressed in parallel, and decompress_many(names=...) decodes only the
+# frames holding the requested entries. Each entry has its own digest. Frames use the
+# proto's compression backend; the table is always blosc.
+BATCH_MAGIC = b'NFCB'
+BATCH_VERSION = 1
+BATCH_HEADER = struct.Struct('!4sBBBBIQ') # magic, version, flags (reserved), hash id, backend id, entry count, table length
+PACK_BYTES = 1024 * 64
+TABLE_CLEVEL = 5
+
+
+def is_batch(blob):
+    return bytes(blob[:4]) == BATCH_MAGIC
+
+
+def _entry(name, value):
+    # (name, dtype string or None for bytes, shape, flat byte view)
+    if not isinstance(name, str):
+        raise TypeError(f"Entry names must be strings, got {type(name).__name__}")
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject or value.dtype.fields is not None:
+            raise ValueError(f"Entry '{name}' has dtype {value.dtype}; only plain numeric dtypes can be batched")
+        view = memoryview(np.ascontiguousarray(value).reshape(-1).view(np.uint8))
+        return name, value.dtype.str, list(value.shape), view
+    view = memoryview(value)
+    if not view.c_contiguous:
+        view = memoryview(view.tobytes())
+    view = view.cast('B') if view.format != 'B' or view.ndim != 1 else view
+    return name, None, [view.nbytes], view
+
+
+def _itemsize(dtype):
+    return np.dtype(dtype).itemsize if dtype is not None else 1
+
+
+def _packs(entries):
+    # Groups consecutive entry indices into frames: small entries of one itemsize
+    # share a frame up to PACK_BYTES; larger entries are framed alone.
+    packs = []
+    current, current_bytes, current_itemsize = [], 0, None
+    for i, (_, dtype, _, view) in enumerate(entries):
+        itemsize = _itemsize(dtype)
+        if view.nbytes >= PACK_BYTES:
+            packs.append([i])
+            continue
+        if current and (itemsize != current_itemsize or current_bytes + view.nbytes > PACK_BYTES):
+            packs.append(current)
+            current, current_bytes = [], 0
+        current.append(i)
+        current_bytes += view.nbytes
+        current_itemsize = itemsize
+    if current:
+        packs.append(current)
+    return packs
+
+
+def compress_many(proto, items, workers=1):
+    # Packs a {name: ndarray | bytes-like} mapping into one batch blob.
+    entries = [_entry(name, value) for name, value in items.items()]
+    packs = _packs(entries)
+    codec, clevel, shuffle = proto.codec, proto.clevel, proto.shuffle
+    if codec == 'auto' and entries:
+        # One tuning pass on the largest entry sets the codec for the whole batch
+        largest = max(entries, key=lambda entry: entry[3].nbytes)
+        sample = np.frombuffer(largest[3], dtype=np.dtype(largest[1]) if largest[1] else np.uint8)
+        with span(proto.stats, "compress.tune", sample.nbytes):
+            settings = tune(sample, proto.objective, proto.min_ratio, candidate_predictors=(None,))
+        codec, clevel, shuffle = settings["codec"], settings["clevel"], settings["shuffle"]
+    backend = proto.backend
+    nthreads = 1 if workers > 1 else proto.codec_threads
+
+    def compress_pack(pack):
+        views = [entries[i][3] for i in pack]
+        with span(proto.stats, "compress.hash", sum(view.nbytes for view in views)):
+            digests = [digest_blocks(proto.hash_algo, view) for view in views]
+        payload = views[0] if len(views) == 1 else b''.join(views)
+        raw_len = len(payload)
+        args = dict(cname=codec, clevel=clevel, shuffle=shuffle, typesize=_itemsize(entries[pack[0]][1]))
+        flags = 0
+        with span(proto.stats, f"compress.{backend.name}", raw_len) as stage:
+            if raw_len > proto.block_size:
+                flags |= proto.BLOCKED_FLAG
+                block_size = normalize_block_size(proto.block_size, args["typesize"])
+                parts = compress_blocks(proto, payload, block_size, backend, **args)
+            else:
+                parts = [backend.compress(payload, nthreads=nthreads, **args)]
+            stage.bytes_out = sum(map(len, parts))
+        if proto.store_threshold is not None and sum(map(len, parts)) * proto.store_threshold > raw_len:
+            flags = proto.STORED_FLAG
+            parts = [payload]
+            count(proto.stats, "compress.stored_blocks")
+        return digests, parts, raw_len, flags
+
+    if workers > 1:
+        results = list(proto._ordered_map(compress_pack, packs, workers))
+    else:
+        results = list(map(compress_pack, packs))
+
+    locations = [None] * len(entries)
+    digests = [None] * len(entries)
+    frames = []
+    for frame, (pack, (pack_digests, parts, raw_len, flags)) in enumerate(zip(packs, results)):
+        offset = 0
+        for i, digest in zip(pack, pack_digests):
+            locations[i] = [frame, offset]
+            digests[i] = digest
+            offset += entries[i][3].nbytes
+        frames.append([sum(map(len, parts)), raw_len, flags])
+
+    with span(proto.stats, "compress.header", len(entries)) as stage:
+        table = {
+            "names": [entry[0] for entry in entries],
+            "dtypes": [entry[1] for entry in entries],
+            "shapes": [entry[2] for entry in entries],
+            "entries": locations,
+            "frames": frames,
+        }
+        table_json = json.dumps(table, separators=(',', ':')).encode('utf-8')
+        table_bytes = blosc.compress(table_json, typesize=1, cname='zstd', clevel=TABLE_CLEVEL)
+        header = BATCH_HEADER.pack(BATCH_MAGIC, BATCH_VERSION, 0, proto.hash_id, backend.backend_id, len(entries),
+                                   len(table_bytes))
+        blob = b''.join([header, table_bytes, *digests, *(part for _, parts, _, _ in results for part in parts)])
+        stage.bytes_out = len(blob)
+    count(proto.stats, "compress.blocks", len(frames))
+    return blob
+
+
+def read_batch_table(blob):
+    # Returns (table dict, hash algorithm name, digest block, frames start, backend) of
+    # a batch blob; entry i's digest is digest block slice i of the algorithm's digest size
+    blob = memoryview(blob).cast('B')
+    if len(blob) < BATCH_HEADER.size:
+        raise ValueError("Batch is too short to hold a header")
+    magic, version, _, algo_id, backend_id, n_entries, table_len = BATCH_HEADER.unpack_from(blob)
+    if magic != BATCH_MAGIC:
+        raise ValueError(f"Invalid batch magic. Expected {BATCH_MAGIC}, got {magic}")
+    if version != BATCH_VERSION:
+        raise ValueError(f"Batch version mismatch. Expected {BATCH_VERSION}, got {version}")
+    algo = hash_name(algo_id)
+    digest_size = HASH_ALGORITHMS[algo][1]
+    digests_start = BATCH_HEADER.size + table_len
+    frames_start = digests_start + n_entries * digest_size
+    if frames_start > len(blob):
+        raise ValueError("Batch table exceeds blob length")
+    table = json.loads(blosc.decompress(blob[BATCH_HEADER.size:digests_start]))
+    if len(table["names"]) != n_entries:
+        raise ValueError("Batch table does not match its entry count")
+    digests = blob[digests_start:frames_start]
+    if frames_start + sum(frame[0] for frame in table["frames"]) != len(blob):
+        raise ValueError("Batch frame lengths do not match blob length")
+    return table, algo, digests, frames_start, get_backend(backend_id)
+
+
+def decompress_many(proto, blob, names=None, workers=1):
+    # Returns {name: ndarray | bytes} for `names` (all entries by default), decoding
+    # only the frames that hold them.
+    blob = proto._as_byte_view(blob)
+    with span(proto.stats, "decompress.parse", len(blob)):
+        table, algo, digests, frames_start, backend = read_batch_table(blob)
+    digest_size = HASH_ALGORITHMS[algo][1]
+    index = {name: i for i, name in enumerate(table["names"])}
+    if names is None:
+        wanted = list(range(len(index)))
+    else:
+        missing = [name for name in names if name not in index]
+        if missing:
+            raise KeyError(f"Batch has no entries named {missing}")
+        wanted = [index[name] for name in names]
+
+    frame_offsets = np.cumsum([frames_start] + [frame[0] for frame in table["frames"]]).tolist()
+    needed = sorted({table["entries"][i][0] for i in wanted})
+    nthreads = 1 if workers > 1 else proto.codec_threads
+
+    def decode_frame(frame):
+        comp_len, raw_len, flags = table["frames"][frame]
+        payload = blob[frame_offsets[frame]:frame_offsets[frame] + comp_len]
+        if flags & proto.STORED_FLAG:
+            return np.frombuffer(payload, dtype=np.uint8).copy() # entries are returned writeable
+        with span(proto.stats, f"decompress.{backend.name}", comp_len) as stage:
+            if flags & proto.BLOCKED_FLAG:
+                out = decompress_blocks(proto, payload, codec=backend)
+            else:
+                out = np.empty(raw_len, dtype=np.uint8)
+                if raw_len:
+                    if backend.decoded_size(payload) != raw_len:
+                        raise ValueError(f"Batch frame {frame} decodes to {backend.decoded_size(payload)} bytes, expected {raw_len}")
+                    backend.decompress_into(payload, out, nthreads)
+            stage.bytes_out = out.nbytes
+        if out.nbytes != raw_len:
+            raise ValueError(f"Batch frame {frame} decodes to {out.nbytes} bytes, expected {raw_len}")
+        return out
+
+    if workers > 1:
+        decoded = dict(zip(needed, proto._ordered_map(decode_frame, needed, workers)))
+    else:
+        decoded = {frame: decode_frame(frame) for frame in needed}
+
+    result = {}
+    for i in wanted:
+        frame, offset = table["entries"][i]
+        dtype, shape = table["dtypes"][i], table["shapes"][i]
+        nbytes = int(np.prod(shape, dtype=np.int64)) * _itemsize(dtype)
+        raw = decoded[frame][offset:offset + nbytes]
+        with span(proto.stats, "decompress.hash", nbytes):
+            if digest_blocks(algo, memoryview(raw)) != digests[i * digest_size:(i + 1) * digest_size]:
+                raise ValueError(f"Corruption detected in entry '{table['names'][i]}'! Hash mismatch.")
+        if dtype is None:
+            result[table["names"][i]] = raw.tobytes()
+        else:
+            # Entries of one frame share its buffer; offsets are multiples of their itemsize
+            result[table["names"][i]] = raw.view(np.dtype(dtype)).reshape(shape)
+    count(proto.stats, "decompress.blocks", len(needed))
+    return result
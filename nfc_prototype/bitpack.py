@@ -0,0 +1,211 @@
+import math
+import struct
+import numpy as np
+
+from .tuner import sample_blocks
+
+# Frame-of-reference bit-packing (header flag BITPACK_FLAG, compression_stack
+# ["bitpack", "<backend>_<codec>"]). Token ids, int4/int8 values kept in wider
+# dtypes and index tensors use far fewer bits than their dtype. Each block of
+# BITPACK_BLOCK_VALUES values stores a base (its minimum, read as signed or unsigned,
+# whichever gives the narrower range) and the offsets from it in the fewest bits.
+# Offsets are modular, so prediction residuals (uint views, see predictors.py) pack
+# as their signed magnitude. The packed words then go through the backend.
+#   [BITPACK_HEADER][BLOCK_ENTRY]*blocks [packed block]*blocks
+# A block of n values at width w is split into P = W / gcd(w, W) contiguous rows of
+# m = ceil(n / P) values (W: dtype bits). Row j lands at bit offset j * w of each
+# of m columns of w / gcd(w, W) words, so packing and unpacking are P shift/or
+# passes over contiguous rows rather than per-value work.
+BITPACK_VERSION = 1
+BITPACK_HEADER = struct.Struct('!BBBIQ') # version, itemsize, big-endian, block values, values
+BLOCK_ENTRY = struct.Struct('!BQ') # bit width, base
+BITPACK_BLOCK_VALUES = 256 * 1024
+BITPACK_MAX_FILL = 0.75 # bitpack='auto' packs tensors whose sampled width is at most this fraction of the dtype
+BITPACK_KINDS = 'biu'
+
+
+def supports(dtype):
+    return np.dtype(dtype).kind in BITPACK_KINDS
+
+
+def _uint_dtype(itemsize, big_endian=False):
+    return np.dtype(f"{'>' if big_endian else '<'}u{itemsize}")
+
+
+def frame(values):
+    # (bit width, base) of a block of unsigned values: the narrower of the unsigned
+    # and the signed (two's complement) range
+    if not values.size:
+        return 0, 0
+    signed = values.view(values.dtype.str.replace('u', 'i'))
+    unsigned_range = int(values.max()) - int(values.min())
+    signed_range = int(signed.max()) - int(signed.min())
+    if signed_range < unsigned_range:
+        return signed_range.bit_length(), int(signed.min()) % (1 << values.dtype.itemsize * 8)
+    return unsigned_range.bit_length(), int(values.min())
+
+
+def sampled_width(data):
+    # Widest block frame over a few sampled slices of an ndarray (or uint view)
+    return max((frame(sample)[0] for sample in sample_blocks(data)), default=0)
+
+
+def _layout(n, width, bits):
+    # -> (rows P, columns m, packed words per column)
+    step = math.gcd(width, bits)
+    rows = bits // step
+    return rows, -(-n // rows), width // step
+
+
+def pack(offsets, width):
+    # offsets: native uint array of values below 2**width -> packed native words
+    bits = offsets.dtype.itemsize * 8
+    if width == 0 or not offsets.size:
+        return offsets[:0]
+    if width == bits:
+        return offsets
+    rows, columns, words = _layout(offsets.size, width, bits)
+    if offsets.size != rows * columns:
+        offsets = np.concatenate([offsets, np.zeros(rows * columns - offsets.size, dtype=offsets.dtype)])
+    offsets = offsets.reshape(rows, columns)
+    packed = np.zeros((words, columns), dtype=offsets.dtype)
+    scratch = np.empty(columns, dtype=offsets.dtype)
+    for row in range(rows):
+        word, shift = divmod(row * width, bits)
+        np.left_shift(offsets[row], shift, out=scratch)
+        packed[word] |= scratch
+        if shift + width > bits:
+            np.right_shift(offsets[row], bits - shift, out=scratch)
+            packed[word + 1] |= scratch
+    return packed.reshape(-1)
+
+
+def unpack(packed, width, base, out):
+    # Inverse of pack plus the base, written into the native uint array out
+    bits = out.dtype.itemsize * 8
+    if not out.size:
+        return out
+    if width == 0:
+        out[:] = base
+        return out
+    if width == bits:
+        np.add(packed, out.dtype.type(base), out=out)
+        return out
+    rows, columns, words = _layout(out.size, width, bits)
+    packed = packed.reshape(words, columns)
+    mask, base = out.dtype.type((1 << width) - 1), out.dtype.type(base)
+    scratch = np.empty(columns, dtype=out.dtype)
+    for row in range(rows):
+        start = row * columns
+        target = out[start:start + columns]
+        if not target.size:
+            break
+        word, shift = divmod(row * width, bits)
+        if shift == 0:
+            np.bitwise_and(packed[word, :target.size], mask, out=target)
+            # (a row starting at bit 0 never spills, as width < bits)
+        else:
+            np.right_shift(packed[word, :target.size], shift, out=target)
+            if shift + width > bits:
+                np.left_shift(packed[word + 1, :target.size], bits - shift, out=scratch[:target.size])
+                target |= scratch[:target.size]
+            if shift + width != bits:
+                target &= mask # a row ending at the word's top bit is already clear above it
+        if base:
+            target += base
+    return out
+
+
+def packed_size(n, width, itemsize):
+    if width == 0 or not n:
+        return 0
+    rows, columns, words = _layout(n, width, itemsize * 8)
+    return words * columns * itemsize
+
+
+def encode(proto, payload, dtype, block_values=BITPACK_BLOCK_VALUES):
+    # Packs a flat byte view of `dtype` integers; returns the payload as a list of parts
+    dtype = np.dtype(dtype)
+    big_endian = dtype.byteorder == '>' or (dtype.byteorder == '=' and not np.little_endian)
+    values = np.frombuffer(payload, dtype=_uint_dtype(dtype.itemsize, big_endian))
+    native = values.dtype.newbyteorder('=')
+
+    def pack_block(start):
+        block = values[start:start + block_values].astype(native, copy=False)
+        width, base = frame(block)
+        offsets = block - native.type(base) if width else block
+        packed = pack(offsets, width).astype(_uint_dtype(dtype.itemsize), copy=False)
+        return BLOCK_ENTRY.pack(width, base), memoryview(packed.view(np.uint8))
+
+    starts = range(0, values.size, block_values)
+    workers = min(proto.nthreads, len(starts))
+    blocks = list(proto._ordered_map(pack_block, starts, workers) if workers > 1 else map(pack_block, starts))
+    header = BITPACK_HEADER.pack(BITPACK_VERSION, dtype.itemsize, big_endian, block_values, values.size)
+    return [header, *(entry for entry, _ in blocks), *(packed for _, packed in blocks)]
+
+
+def block_frames(payload):
+    # [(bit width, base)] per block, for inspection
+    _, _, _, block_values, n = BITPACK_HEADER.unpack_from(payload)
+    table = payload[BITPACK_HEADER.size:BITPACK_HEADER.size + -(-n // block_values) * BLOCK_ENTRY.size]
+    return list(BLOCK_ENTRY.iter_unpack(table))
+
+
+def decoded_size(payload):
+    _, itemsize, _, _, n = BITPACK_HEADER.unpack_from(payload)
+    return n * itemsize
+
+
+def decode(proto, payload, out_bytes=None, nbytes=None):
+    # Unpacks a bitpack payload into out_bytes (allocated if None). nbytes is the
+    # decoded size the record's metadata expects; the header must agree with it.
+    if len(payload) < BITPACK_HEADER.size:
+        raise ValueError("Bitpack payload is too short to hold a header")
+    version, itemsize, big_endian, block_values, n = BITPACK_HEADER.unpack_from(payload)
+    if version != BITPACK_VERSION:
+        raise ValueError(f"Bitpack version mismatch. Expected {BITPACK_VERSION}, got {version}")
+    if itemsize not in (1, 2, 4, 8) or not block_values:
+        raise ValueError("Invalid bitpack header")
+    if out_bytes is not None:
+        proto._check_out_size(out_bytes, n * itemsize)
+    elif nbytes is not None and nbytes != n * itemsize:
+        raise ValueError(f"Bitpack header declares {n * itemsize} bytes, but the record decodes to {nbytes} bytes")
+    offset = BITPACK_HEADER.size + -(-n // block_values) * BLOCK_ENTRY.size
+    if offset > len(payload):
+        raise ValueError("Bitpack block table exceeds the payload length")
+
+    frames = block_frames(payload)
+    blocks = []
+    for index, (width, base) in enumerate(frames):
+        count = min(block_values, n - index * block_values)
+        if width > itemsize * 8:
+            raise ValueError(f"Bitpack block width {width} exceeds the {itemsize * 8}-bit dtype")
+        length = packed_size(count, width, itemsize)
+        blocks.append((index * block_values, count, width, base, offset, length))
+        offset += length
+    if offset != len(payload):
+        raise ValueError("Bitpack block lengths do not match the payload length")
+    if out_bytes is None:
+        out_bytes = np.empty(n * itemsize, dtype=np.uint8)
+
+    native = _uint_dtype(itemsize, not np.little_endian)
+    values = out_bytes.view(_uint_dtype(itemsize, big_endian))
+    in_place = values.dtype == native
+
+    def unpack_block(block):
+        start, count, width, base, offset, length = block
+        packed = np.frombuffer(payload, dtype=_uint_dtype(itemsize), count=length // itemsize, offset=offset)
+        target = values[start:start + count]
+        if in_place:
+            unpack(packed.astype(native, copy=False), width, base, target)
+        else:
+            target[:] = unpack(packed.astype(native, copy=False), width, base, np.empty(count, dtype=native))
+
+    workers = min(proto.nthreads, len(blocks))
+    if workers > 1:
+        for _ in proto._ordered_map(unpack_block, blocks, workers):
+            pass
+    else:
+        for block in blocks:
+            unpack_block(block)
+    return out_bytes
@@ -0,0 +1,84 @@
+import math
+import struct
+import blosc
+import numpy as np
+
+from .backends import BLOSC
+
+# Block layer for large in-memory payloads. A single blosc call is capped at
+# blosc.MAX_BUFFERSIZE (~2 GB) and allocates a worst-case output buffer as large as
+# its input, so payloads above the block size are split into independent frames of
+# the record's backend (header flag BLOCKED_FLAG):
+#   [FRAME_COUNT][FRAME_LENGTH]*n [frame]*n
+# Frame i decodes to payload bytes [i * block_size, (i + 1) * block_size), so frames
+# are compressed and decoded on separate threads straight into the output buffer.
+DEFAULT_BLOCK_SIZE = 1024 * 1024 * 64
+FRAME_COUNT = struct.Struct('!Q')
+FRAME_LENGTH = struct.Struct('!Q')
+
+
+def normalize_block_size(block_size, itemsize=1):
+    # Largest multiple of itemsize not above block_size or blosc's buffer limit
+    block_size = min(int(block_size), blosc.MAX_BUFFERSIZE)
+    block_size -= block_size % itemsize
+    if block_size <= 0:
+        raise ValueError(f"Block size must hold at least one item of {itemsize} bytes")
+    return block_size
+
+
+def compress_blocks(proto, payload, block_size, codec=BLOSC, **codec_args):
+    # Compresses a flat byte view as independent frames and returns the payload as a
+    # list of parts (frame table, then frames) for the caller to join once.
+    n_frames = math.ceil(len(payload) / block_size)
+    blocks = (payload[i:i + block_size] for i in range(0, len(payload), block_size))
+    workers = min(proto.nthreads, n_frames)
+    # Parallel across frames; one codec thread per call keeps the total at nthreads
+    nthreads = 1 if workers > 1 else proto.codec_threads
+    compress = lambda block: codec.compress(block, nthreads=nthreads, **codec_args)
+    if workers > 1:
+        frames = list(proto._ordered_map(compress, blocks, workers))
+    else:
+        frames = list(map(compress, blocks))
+    table = FRAME_COUNT.pack(n_frames) + b''.join(FRAME_LENGTH.pack(len(frame)) for frame in frames)
+    return [table] + frames
+
+
+def split_frames(payload, codec=BLOSC):
+    if len(payload) < FRAME_COUNT.size:
+        raise ValueError("Blocked payload is too short to hold a frame table")
+    n_frames, = FRAME_COUNT.unpack_from(payload)
+    table_end = FRAME_COUNT.size + n_frames * FRAME_LENGTH.size
+    if table_end > len(payload):
+        raise ValueError("Blocked payload frame table exceeds payload length")
+    frames = []
+    offset = table_end
+    for length, in FRAME_LENGTH.iter_unpack(payload[FRAME_COUNT.size:table_end]):
+        if length < codec.header_bytes or offset + length > len(payload):
+            raise ValueError("Blocked payload frame exceeds payload length")
+        frames.append(payload[offset:offset + length])
+        offset += length
+    if offset != len(payload):
+        raise ValueError("Blocked payload has trailing bytes after its last frame")
+    return frames
+
+
+def decompress_blocks(proto, payload, out_bytes=None, codec=BLOSC):
+    # Decodes every frame straight into its slice of out_bytes (allocated if None).
+    frames = split_frames(payload, codec)
+    sizes = [codec.decoded_size(frame) for frame in frames]
+    nbytes = sum(sizes)
+    if out_bytes is None:
+        out_bytes = np.empty(nbytes, dtype=np.uint8)
+    else:
+        proto._check_out_size(out_bytes, nbytes)
+    starts = np.cumsum([0] + sizes).tolist()
+    workers = min(proto.nthreads, len(frames))
+    nthreads = 1 if workers > 1 else proto.codec_threads
+    decode = lambda i: codec.decompress_into(frames[i], out_bytes[starts[i]:starts[i + 1]], nthreads)
+    if workers > 1:
+        for _ in proto._ordered_map(decode, range(len(frames)), workers):
+            pass
+    else:
+        for i in range(len(frames)):
+            decode(i)
+    return out_bytes
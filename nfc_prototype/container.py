@@ -0,0 +1,62 @@
+import struct
+from bisect import bisect_right
+
+# Container v3 layout (as written by compress_stream):
+#   [NFC2 block 0][NFC2 block 1]...[NFC2 block n-1][index][trailer]
+# index:   INDEX_MAGIC followed by one INDEX_ENTRY per block
+# trailer: fixed-size, always the last TRAILER.size bytes of the file
+CONTAINER_VERSION = 3
+INDEX_MAGIC = b'NFCX'
+TRAILER_MAGIC = b'NFC3'
+INDEX_ENTRY = struct.Struct('!QQQQ') # compressed offset, compressed length, uncompressed offset, uncompressed length
+TRAILER = struct.Struct('!QQB3x4s')  # index offset, block count, container version, reserved, magic
+
+
+def write_block_index(fout, entries, index_offset):
+    fout.write(INDEX_MAGIC)
+    for entry in entries:
+        fout.write(INDEX_ENTRY.pack(*entry))
+    fout.write(TRAILER.pack(index_offset, len(entries), CONTAINER_VERSION, TRAILER_MAGIC))
+
+
+def read_block_index(fin):
+    # Returns the list of index entries, or None if the file has no trailer (pre-v3 stream).
+    file_size = fin.seek(0, 2)
+    if file_size < TRAILER.size:
+        return None
+    fin.seek(file_size - TRAILER.size)
+    index_offset, block_count, version, magic = TRAILER.unpack(fin.read(TRAILER.size))
+    if magic != TRAILER_MAGIC:
+        return None
+    if version != CONTAINER_VERSION:
+        raise ValueError(f"Container version mismatch. Expected {CONTAINER_VERSION}, got {version}")
+
+    index_len = len(INDEX_MAGIC) + block_count * INDEX_ENTRY.size
+    if index_offset + index_len + TRAILER.size != file_size:
+        raise ValueError("Block index does not match file size. The container is truncated or corrupt.")
+    fin.seek(index_offset)
+    index_bytes = fin.read(index_len)
+    if index_bytes[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+        raise ValueError(f"Invalid index magic. Expected {INDEX_MAGIC}, got {index_bytes[:len(INDEX_MAGIC)]}")
+    return list(INDEX_ENTRY.iter_unpack(index_bytes[len(INDEX_MAGIC):]))
+
+
+def check_index_tail(tail):
+    # Validates the index + trailer bytes that end a v3 stream read front to back.
+    if len(tail) < len(INDEX_MAGIC) + TRAILER.size:
+        raise ValueError("Incomplete block index in stream")
+    _, block_count, version, magic = TRAILER.unpack(tail[-TRAILER.size:])
+    if magic != TRAILER_MAGIC or version != CONTAINER_VERSION:
+        raise ValueError("Invalid container trailer in stream")
+    if len(tail) != len(INDEX_MAGIC) + block_count * INDEX_ENTRY.size + TRAILER.size:
+        raise ValueError("Incomplete block index in stream")
+
+
+def blocks_for_range(entries, offset, length):
+    # Index entries whose uncompressed span overlaps [offset, offset + length).
+    if length <= 0 or not entries:
+        return []
+    starts = [entry[2] for entry in entries]
+    first = max(bisect_right(starts, offset) - 1, 0)
+    last = bisect_right(starts, offset + length - 1)
+    return entries[first:last]
@@ -1,29 +1,110 @@
+import os
 import numpy as np
 import json
-import hashlib
 import struct
 import blosc
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .tensor import ChunkedTensorReader, write_chunked
+from .adapters.safetensors import SafetensorsArchive, write_archive
+from . import aio
+from .fileio import NFCReader, NFCWriter
+from .batch import compress_many, decompress_many
+from .dedup import DEFAULT_AVG_CHUNK_SIZE, ChunkStore, compress_dedup, decompress_dedup
+from .dictionary import DEFAULT_DICT_LEVEL, DEFAULT_DICT_SIZE, NFCDictionary, compress_record, decode_record, is_dictionary_record
+from .metadata import decode_metadata, encode_metadata, tensor_dtype
+from .reference import Reference, as_reference, check_mode, decode_residual, encode_residual, resolve
+from .stats import Stats, count, span, timed_iter
+from .backends import get_backend, on_worker, worker_threads
+from .blocks import DEFAULT_BLOCK_SIZE, compress_blocks, decompress_blocks, normalize_block_size
+from . import bitpack as bitpacking, entropy, floatsplit, predictors, sparse as sparse_coding
+from .tuner import DEFAULT_PREDICTORS, looks_incompressible, tune
+from .hashing import available_hashes, digest_blocks, hash_block_size_for, hash_id, hash_name
+from .container import INDEX_MAGIC, blocks_for_range, check_index_tail, read_block_index, write_block_index
 
 try:
     from neuralcompression.coders import ArithmeticCoder
 except ImportError:
     ArithmeticCoder = None
 
+STORED_MIN_BYTES = 4096
+
 class NFCPrototype:
-    def __init__(self, clevel=9, shuffle=blosc.SHUFFLE, codec='zstd'):
+    def __init__(self, clevel=9, shuffle=blosc.SHUFFLE, codec='zstd', hash_algo='sha256', nthreads=None,
+                 objective='size', min_ratio=1.0, store_threshold=1.05, stats=None, block_size=DEFAULT_BLOCK_SIZE,
+                 dictionaries=None, references=None, metadata_format='binary', backend='blosc',
+                 entropy_coding=False, float_split=False, sparse=False, bitpack=False):
         self.magic = b'NFC2'
         self.version = 2
-        self.hash_algo = 'sha256'
+        self.hash_algo = hash_algo # sha256 is the strict-mode default; see hashing.HASH_ALGORITHMS
+        self.hash_id = hash_id(hash_algo)
+        # Threads used inside a single compress/decompress call (hashing, blocks and the
+        # codec). None keeps one thread for our own work and leaves the codec at its
+        # default, so blosc's process-wide thread count is never touched.
+        self.nthreads = 1 if nthreads is None else nthreads
+        self._codec_threads = nthreads
+        # Payloads larger than this are split into independent frames (see blocks.py)
+        self.block_size = normalize_block_size(block_size)
+        # Trained zstd dictionaries by id, used to decode small dictionary records
+        self.dictionaries = {}
+        for dictionary in dictionaries or ():
+            self.add_dictionary(dictionary)
+        # Default resolver for records delta-encoded against a reference: a Reference,
+        # a mapping from reference id to buffer, or a callable (see reference.resolve)
+        self.references = references
+        # 'binary' packs record metadata into a few bytes (see metadata.py); 'json'
+        # writes the pre-v0.5 JSON form for older readers. Both are always readable.
+        if metadata_format not in ('binary', 'json'):
+            raise ValueError(f"Unknown metadata format '{metadata_format}'. Expected 'binary' or 'json'")
+        self.metadata_format = metadata_format
+        if hash_algo not in available_hashes():
+            raise RuntimeError(f"Hash algorithm '{hash_algo}' is not available. Installed options: {available_hashes()}")
+        # Compression engine (see backends.BACKENDS): 'blosc', 'blosc2', 'zstd' or 'lz4'.
+        # Its id goes in header byte 7; records decode with whichever backend wrote them.
+        self.backend = get_backend(backend)
+        # Native entropy stage (see entropy.py) for every record, including stream
+        # chunks; compress(force_arithmetic=True) enables it for a single call.
+        self.entropy_coding = entropy_coding
+        # Float tensors without a predictor are split into exponent and sign/mantissa
+        # streams, each with its own coder (see floatsplit.py)
+        self.float_split = float_split
+        # Mostly-zero tensors store nonzero positions + values (see sparse.py): True
+        # for every numeric tensor without a predictor, 'auto' when sampling finds at
+        # least SPARSE_MIN_ZERO zeros
+        if sparse not in (False, True, 'auto'):
+            raise ValueError(f"Unknown sparse mode {sparse!r}. Expected False, True or 'auto'")
+        self.sparse = sparse
+        # Narrow-range integer tensors are frame-of-reference bit-packed ahead of the
+        # backend (see bitpack.py): True for every integer tensor, 'auto' when the
+        # sampled blocks need at most BITPACK_MAX_FILL of the dtype's bits
+        if bitpack not in (False, True, 'auto'):
+            raise ValueError(f"Unknown bitpack mode {bitpack!r}. Expected False, True or 'auto'")
+        self.bitpack = bitpack
         self.clevel = clevel
         self.shuffle = shuffle
-        self.codec = codec
+        self.codec = codec # 'auto' tunes codec/clevel/shuffle/predictor per compress call
+        self.objective = objective # auto mode: 'size', or 'speed' subject to min_ratio
+        self.min_ratio = min_ratio
+        # Blocks expected to compress worse than this ratio are stored raw (None disables)
+        self.store_threshold = store_threshold
+        # Per-stage timings and counters (see stats.py). A plain callable is wrapped as
+        # Stats(callback=fn); None disables instrumentation.
+        self.stats = stats if stats is None or isinstance(stats, Stats) else Stats(callback=stats)
         self.ARITHMETIC_CODING_FLAG = 0x01
+        self.STORED_FLAG = 0x02 # payload is the original bytes, uncompressed
+        self.BLOCKED_FLAG = 0x04 # payload is a frame table followed by backend frames
+        self.BINARY_METADATA_FLAG = 0x08 # metadata is binary-packed instead of JSON
+        self.SPLIT_FLAG = 0x10 # payload is a float split: exponent and sign/mantissa streams
+        self.SPARSE_FLAG = 0x20 # payload is nonzero positions + values of a mostly-zero tensor
+        self.BITPACK_FLAG = 0x40 # backend payload holds frame-of-reference bit-packed integers
 
         self.calculated_header_len = (
             len(self.magic) +
             struct.calcsize('!B') + # version (1 byte)
             struct.calcsize('!B') + # flags (1 byte)
-            2 +                     # Reserved (2 bytes)
+            1 +                     # hash algorithm id (1 byte)
+            1 +                     # compression backend id (1 byte)
             struct.calcsize('!Q') + # header_len (8 bytes)
             struct.calcsize('!Q') + # meta_len (8 bytes)
             struct.calcsize('!Q') + # payload_len (8 bytes)
@@ -45,107 +126,237 @@ class NFCPrototype:
             }
         return {"format_hint": "bytes"}
 
-    def compress(self, data, force_arithmetic=False, use_prediction=False):
+    def _as_byte_view(self, data):
+        # Flat byte view over any buffer-protocol object (ndarray, np.memmap, memoryview,
+        # bytearray, mmap.mmap, bytes). Only non-contiguous inputs are copied.
+        if isinstance(data, np.ndarray):
+            return memoryview(np.ascontiguousarray(data).reshape(-1).view(np.uint8))
+        view = memoryview(data)
+        if not view.c_contiguous:
+            view = memoryview(view.tobytes())
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        return view
+
+    def add_dictionary(self, dictionary):
+        self.dictionaries[dictionary.dict_id] = dictionary
+        return dictionary
+
+    def train_dictionary(self, samples, dict_size=DEFAULT_DICT_SIZE, level=DEFAULT_DICT_LEVEL):
+        # Trains a zstd dictionary on sample objects (ndarrays or bytes) and registers
+        # it. Store it once with dictionary.save(path); records only carry its id.
+        return self.add_dictionary(NFCDictionary.train(samples, dict_size, level))
+
+    def compress(self, data, force_arithmetic=False, use_prediction=False, predictor=None, predictor_params=None,
+                 dictionary=None, reference=None, reference_mode='xor'):
+        # dictionary=<NFCDictionary> writes a compact dictionary record for small
+        # objects instead of an NFC2 record (see dictionary.py).
+        # reference=<base tensor, buffer or Reference> stores only the XOR ('xor') or
+        # same-width difference ('sub') against the base (see reference.py).
+        if reference is not None:
+            if dictionary is not None:
+                raise ValueError("compress accepts a dictionary or a reference, not both")
+            check_mode(reference_mode, data.dtype if isinstance(data, np.ndarray) else None)
+            reference = as_reference(reference)
+        with span(self.stats, "compress.total") as total:
+            if dictionary is not None:
+                result = compress_record(self, data, dictionary)
+            else:
+                result = self._compress(data, force_arithmetic, use_prediction, predictor, predictor_params,
+                                        reference, reference_mode)
+            total.bytes_in, total.bytes_out = result[1], result[2]
+        count(self.stats, "compress.blocks")
+        return result
+
+    def _compress(self, data, force_arithmetic, use_prediction, predictor, predictor_params,
+                  reference=None, reference_mode='xor'):
+        stats = self.stats
         is_numpy = isinstance(data, np.ndarray)
-        original_data_bytes = data.tobytes() if is_numpy else data # Renamed for clarity
-        original_hash = hashlib.sha256(original_data_bytes).digest() # Use original_data_bytes for hash
+        with span(stats, "compress.to_bytes"):
+            original_data_bytes = self._as_byte_view(data) # Zero-copy view of the input
+        nbytes = original_data_bytes.nbytes
+        # Per-block checksums of the original bytes, computed across nthreads
+        hash_block_size = hash_block_size_for(nbytes, self.hash_algo)
+        with span(stats, "compress.hash", nbytes):
+            original_hash = digest_blocks(self.hash_algo, original_data_bytes, hash_block_size, self.nthreads)
         # print(f"DEBUG: compress - Calculated original_hash: {original_hash.hex()}")
 
         metadata = self._get_metadata(data)
-        
+        metadata["hash_block_size"] = hash_block_size
+
+        # Reference delta: every stage below (probe, tune, prediction, blosc, stored)
+        # sees only the residual against the reference; the checksum covers the original.
+        if reference is not None:
+            if reference.nbytes != nbytes:
+                raise ValueError(f"Reference holds {reference.nbytes} bytes, but the data holds {nbytes} bytes")
+            itemsize = data.dtype.itemsize if is_numpy else 1
+            with span(stats, "compress.reference", nbytes):
+                residual = encode_residual(original_data_bytes, reference.view, reference_mode, itemsize)
+            metadata["reference"] = reference.info(reference_mode)
+            original_data_bytes = memoryview(residual)
+            if is_numpy:
+                data = residual.view(data.dtype).reshape(data.shape)
+
         flags = 0
         payload = original_data_bytes # Default payload
+        codec, clevel, shuffle = self.codec, self.clevel, self.shuffle
+
+        # Incompressible fast path: if a cheap probe on sampled bytes says this block
+        # won't beat store_threshold, skip prediction and compression entirely.
+        # Tiny blocks are left to blosc, which already memcpys what it cannot compress.
+        probe_stored = self.store_threshold is not None and nbytes >= STORED_MIN_BYTES
+        stored = False
+        if probe_stored:
+            with span(stats, "compress.probe", nbytes):
+                stored = looks_incompressible(data if is_numpy else original_data_bytes, self.store_threshold)
+
+        # Auto mode: trial sampled blocks of this input and keep the best settings.
+        # They are recorded in the metadata; decoding needs none of them.
+        if codec == 'auto' and not stored:
+            fixed_predictor = predictor is not None or use_prediction
+            with span(stats, "compress.tune", nbytes):
+                settings = tune(data if is_numpy else original_data_bytes, self.objective, self.min_ratio,
+                                candidate_predictors=(None,) if fixed_predictor else DEFAULT_PREDICTORS)
+            codec, clevel, shuffle = settings["codec"], settings["clevel"], settings["shuffle"]
+            if not fixed_predictor:
+                predictor = settings["predictor"]
+            metadata["auto_tuned"] = settings
         
         # --- NEW: Prediction Step ---
-        if is_numpy and use_prediction:
-            metadata["prediction_model"] = "delta_encoding"
-            metadata["original_dtype"] = data.dtype.name
-            metadata["original_shape"] = list(data.shape)
-
-            # Determine residuals_dtype to handle potential negative differences and store it
-            if np.issubdtype(data.dtype, np.unsignedinteger):
-                info = np.iinfo(data.dtype)
-                if info.bits <= 8:
-                    residuals_dtype = np.int16
-                elif info.bits <= 16:
-                    residuals_dtype = np.int32
-                else: # info.bits <= 32 or 64
-                    residuals_dtype = np.int64
-            elif np.issubdtype(data.dtype, np.floating):
-                residuals_dtype = np.float64 # Use float64 for residuals to maintain precision
-            else:
-                residuals_dtype = data.dtype
-
-            metadata["residuals_dtype"] = np.dtype(residuals_dtype).name # Store the name of the residuals dtype
-
-            residuals = np.empty(data.shape, dtype=residuals_dtype)
-            # Handle first element
-            if data.size > 0:
-                # Cast to residuals_dtype before operations to prevent overflow/underflow
-                data_as_residuals_type = data.astype(residuals_dtype)
-                residuals.ravel()[0] = data_as_residuals_type.ravel()[0]
-                # Calculate differences for the rest
-                if data.size > 1:
-                    residuals.ravel()[1:] = np.diff(data_as_residuals_type.ravel())
-            
-            payload = residuals.tobytes() # residuals are now the payload
+        # Predictors (see predictors.PREDICTORS) run on same-width unsigned views, so
+        # residuals keep the input's itemsize and the round-trip is bit-exact for ints
+        # and floats alike. use_prediction=True selects the flat modular delta.
+        if predictor is None and use_prediction:
+            predictor = "modular_delta"
+        if not stored and is_numpy and predictor is not None and predictors.supports(data.dtype):
+            predictor_params = predictors.normalize_params(predictor, data.shape, predictor_params)
+            metadata["prediction_model"] = predictor
+            if predictor_params:
+                metadata["prediction_params"] = predictor_params
+            with span(stats, "compress.predict", nbytes) as stage:
+                residuals = predictors.predict(predictor, data, predictor_params)
+                payload = memoryview(residuals.reshape(-1).view(np.uint8)) # residuals are now the payload
+                stage.bytes_out = payload.nbytes
         # --- END NEW: Prediction Step ---
 
-        # Optional Step 1: Arithmetic Coding
-        use_arithmetic = force_arithmetic and ArithmeticCoder is not None
-        if use_arithmetic:
-            coder = ArithmeticCoder()
-            payload = coder.compress(payload)
+        # Step 1: entropy coding (native Huffman over byte planes, see entropy.py), or
+        # Step 2: backend compression (blosc unless NFCPrototype(backend=...) says otherwise)
+        # compressed_parts are joined once into the record, so large blocked payloads
+        # are never copied into an intermediate buffer
+        use_sparse = (not stored and self.sparse and is_numpy and "prediction_model" not in metadata
+                      and sparse_coding.supports(data.dtype)
+                      and (self.sparse is True or sparse_coding.zero_fraction(data) >= sparse_coding.SPARSE_MIN_ZERO))
+        use_split = (not stored and not use_sparse and self.float_split and is_numpy and "prediction_model" not in metadata
+                     and floatsplit.supports(data.dtype))
+        use_entropy = not stored and not use_sparse and not use_split and (force_arithmetic or self.entropy_coding)
+        use_bitpack = (not stored and not use_sparse and not use_entropy and self.bitpack and is_numpy
+                       and bitpacking.supports(data.dtype) and (self.bitpack is True or bitpacking.sampled_width(
+                           np.frombuffer(payload, dtype=data.dtype)) <= bitpacking.BITPACK_MAX_FILL * data.dtype.itemsize * 8))
+        backend = self.backend
+        if stored:
+            compressed_parts = [original_data_bytes]
+        elif use_sparse:
+            # Positions and values each go through the backend with this call's settings
+            with span(stats, "compress.sparse", len(payload)) as stage:
+                compressed_parts = sparse_coding.encode(self, payload, data.dtype.itemsize, backend, cname=codec,
+                                                        clevel=clevel, shuffle=shuffle)
+                stage.bytes_out = sum(map(len, compressed_parts))
+            flags |= self.SPARSE_FLAG
+        elif use_split:
+            # Every stream is coded (or stored raw) on its own, so no outer stage follows
+            with span(stats, "compress.split", len(payload)) as stage:
+                compressed_parts = floatsplit.encode(self, payload, data.dtype, backend)
+                stage.bytes_out = sum(map(len, compressed_parts))
+            flags |= self.SPLIT_FLAG
+        elif use_entropy:
+            # The stage blocks and threads on its own, and its planes are already
+            # entropy-coded, so no backend pass follows
+            with span(stats, "compress.huffman", len(payload)) as stage:
+                compressed_parts = entropy.encode(self, payload, data.dtype.itemsize if is_numpy else 1,
+                                                  min(self.block_size, entropy.DEFAULT_ENTROPY_BLOCK_SIZE))
+                stage.bytes_out = sum(map(len, compressed_parts))
             flags |= self.ARITHMETIC_CODING_FLAG
-
-        # Step 2: Blosc Compression
-        if is_numpy:
-            itemsize = data.dtype.itemsize # Default itemsize
-            if use_prediction:
-                # If prediction is used, the payload is the residuals array, so use its itemsize.
-                itemsize = np.dtype(metadata["residuals_dtype"]).itemsize
-            compressed = blosc.compress(payload, cname=self.codec, typesize=itemsize, clevel=self.clevel, shuffle=self.shuffle)
         else:
-            compressed = blosc.compress(payload, cname=self.codec, clevel=self.clevel, shuffle=self.shuffle)
-
-        metadata["compression_stack"] = ["arithmetic", f"blosc_{self.codec}"] if use_arithmetic else [f"blosc_{self.codec}"]
-        metadata_json = json.dumps(metadata).encode('utf-8')
-        header = (
-            self.magic +
-            self.version.to_bytes(1, 'big') +
-            flags.to_bytes(1, 'big') +
-            b'\x00' * 2 +  # Reserved
-            struct.pack('!Q', self.calculated_header_len) +
-            struct.pack('!Q', len(metadata_json)) +
-            struct.pack('!Q', len(compressed)) +
-            struct.pack('!H', len(original_hash))
-        )
-        
-        nfc_binary = header + metadata_json + compressed + original_hash
-        return nfc_binary, len(original_data_bytes), len(nfc_binary)
-
-    def decompress(self, nfc_binary):
+            codec_args = dict(cname=codec, clevel=clevel, shuffle=shuffle)
+            codec_args["typesize"] = data.dtype.itemsize if is_numpy else 1 # Residuals share the input's itemsize
+            if use_bitpack:
+                # Packed words keep the input's width, so the backend sees them as usual
+                with span(stats, "compress.bitpack", len(payload)) as stage:
+                    payload = b''.join(bitpacking.encode(self, payload, data.dtype))
+                    stage.bytes_out = len(payload)
+                flags |= self.BITPACK_FLAG
+            with span(stats, f"compress.{backend.name}", len(payload)) as stage:
+                if len(payload) > self.block_size:
+                    flags |= self.BLOCKED_FLAG
+                    block_size = normalize_block_size(self.block_size, codec_args["typesize"])
+                    metadata["block_size"] = block_size
+                    compressed_parts = compress_blocks(self, memoryview(payload), block_size, backend, **codec_args)
+                else:
+                    compressed_parts = [backend.compress(payload, nthreads=self.codec_threads, **codec_args)]
+                stage.bytes_out = sum(map(len, compressed_parts))
+        compressed_len = sum(map(len, compressed_parts))
+
+        # The probe only samples, so also store raw when the real output falls short
+        if not stored and probe_stored and compressed_len * self.store_threshold > nbytes:
+            stored = True
+            compressed_parts = [original_data_bytes]
+            compressed_len = nbytes
+            flags = 0
+            for key in ("prediction_model", "prediction_params", "auto_tuned", "block_size"):
+                metadata.pop(key, None)
+
+        if stored:
+            flags |= self.STORED_FLAG
+            metadata["compression_stack"] = ["stored"]
+            count(stats, "compress.stored_blocks")
+        elif use_sparse:
+            metadata["compression_stack"] = ["sparse", backend.stack_name(codec)]
+        elif use_split:
+            metadata["compression_stack"] = ["float_split"]
+        else:
+            metadata["compression_stack"] = ["huffman"] if use_entropy else [backend.stack_name(codec)]
+            if use_bitpack:
+                metadata["compression_stack"].insert(0, "bitpack")
+        with span(stats, "compress.header", compressed_len) as stage:
+            metadata_json = encode_metadata(metadata) if self.metadata_format == 'binary' else None
+            if metadata_json is not None:
+                flags |= self.BINARY_METADATA_FLAG
+            else:
+                metadata_json = json.dumps(metadata).encode('utf-8')
+            header = (
+                self.magic +
+                self.version.to_bytes(1, 'big') +
+                flags.to_bytes(1, 'big') +
+                bytes([self.hash_id, 0 if stored or use_entropy else backend.backend_id]) + # hash algorithm id + backend id
+                struct.pack('!Q', self.calculated_header_len) +
+                struct.pack('!Q', len(metadata_json)) +
+                struct.pack('!Q', compressed_len) +
+                struct.pack('!H', len(original_hash))
+            )
+            
+            nfc_binary = b''.join([header, metadata_json, *compressed_parts, original_hash])
+            stage.bytes_out = len(nfc_binary)
+        return nfc_binary, nbytes, len(nfc_binary)
+
+    def _parse_record(self, nfc_binary):
+        # Splits an NFC2 record into its parts. All slices are memoryviews over the
+        # caller's buffer (bytes, bytearray, mmap.mmap, ...), so nothing is copied.
+        nfc_binary = self._as_byte_view(nfc_binary)
         if nfc_binary[:4] != self.magic:
-            raise ValueError(f"Invalid magic. Expected {self.magic}, got {nfc_binary[:4]}")
+            raise ValueError(f"Invalid magic. Expected {self.magic}, got {bytes(nfc_binary[:4])}")
         
         version = nfc_binary[4]
         if version != self.version:
             raise ValueError(f"Version mismatch. Expected {self.version}, got {version}")
         
         flags = nfc_binary[5]
-        was_arithmetic_coded = (flags & self.ARITHMETIC_CODING_FLAG) != 0
 
         # Read header fields
-        header_len = struct.unpack('!Q', nfc_binary[8:16])[0]
-        meta_len = struct.unpack('!Q', nfc_binary[16:24])[0]
-        payload_len = struct.unpack('!Q', nfc_binary[24:32])[0]
-        hash_len = struct.unpack('!H', nfc_binary[32:34])[0]
+        header_len, meta_len, payload_len = struct.unpack_from('!QQQ', nfc_binary, 8)
+        hash_len = struct.unpack_from('!H', nfc_binary, 32)[0]
 
-
-        
         current_offset = 34
         
-        
         # Add explicit boundary checks for each slice
         if (current_offset + meta_len) > len(nfc_binary):
             raise ValueError(f"Metadata slice exceeds binary length. Expected to read {meta_len} bytes from offset {current_offset}, but total binary length is {len(nfc_binary)}.")
@@ -161,112 +372,436 @@ class NFCPrototype:
             raise ValueError(f"Hash slice exceeds binary length. Expected to read {hash_len} bytes from offset {current_offset}, but total binary length is {len(nfc_binary)}.")
         original_hash = nfc_binary[current_offset : current_offset + hash_len]
 
-        
-
-
-        metadata = json.loads(metadata_json) if meta_len > 0 else {}        
-        # Step 1: Blosc Decompression
-        decompressed_payload = blosc.decompress(compressed_payload)
-        
-        # Optional Step 2: Arithmetic De-coding
-        if was_arithmetic_coded:
+        if flags & self.BINARY_METADATA_FLAG:
+            metadata = decode_metadata(bytes(metadata_json))
+        else:
+            metadata = json.loads(bytes(metadata_json)) if meta_len > 0 else {}
+        return flags, hash_name(nfc_binary[6]), metadata, compressed_payload, original_hash, get_backend(nfc_binary[7])
+
+    def _check_out_size(self, out_bytes, nbytes):
+        if nbytes != out_bytes.nbytes:
+            raise ValueError(f"Output buffer holds {out_bytes.nbytes} bytes, but the record decodes to {nbytes} bytes.")
+
+    def _decode_payload(self, flags, compressed_payload, backend, out_bytes=None, stack=None, nbytes=None):
+        # Undoes the backend (or entropy) stage into a writable uint8 array, decoding
+        # straight into out_bytes when the caller supplies one. nbytes is the size the
+        # record's metadata promises, when it gives one.
+        if flags & self.STORED_FLAG:
+            # Stored blocks hold the original bytes: decoding is a single copy
+            with span(self.stats, "decompress.stored", len(compressed_payload)) as stage:
+                stored = np.frombuffer(compressed_payload, dtype=np.uint8)
+                stage.bytes_out = stored.nbytes
+                if out_bytes is None:
+                    return stored.copy()
+                self._check_out_size(out_bytes, stored.nbytes)
+                out_bytes[:] = stored
+                return out_bytes
+
+        if flags & self.ARITHMETIC_CODING_FLAG and stack and stack[0] == "arithmetic":
+            # Pre-v0.5 records: neuralcompression's coder ahead of the backend
             if ArithmeticCoder is None:
                 raise RuntimeError("File was compressed with arithmetic coding, but 'neuralcompression' is not installed.")
-            coder = ArithmeticCoder()
-            final_bytes = coder.decompress(decompressed_payload)
-        else:
-            final_bytes = decompressed_payload
-
-        # --- NEW: Reconstruction Step ---
-        if metadata.get("prediction_model") == "delta_encoding":
-            original_dtype_name = metadata["original_dtype"]
-            original_shape = tuple(metadata["original_shape"])
-            residuals_dtype = np.dtype(metadata["residuals_dtype"]) # Use the stored residuals_dtype
-            
-            # print(f"DEBUG: decompress - original_dtype_name: {original_dtype_name}, original_shape: {original_shape}, residuals_dtype: {residuals_dtype}")
-
-            # Convert final_bytes (decompressed residuals) back to numpy array with its stored dtype
-            residuals_array = np.frombuffer(final_bytes, dtype=residuals_dtype)
-            # print(f"DEBUG: decompress - residuals_array (first 5): {residuals_array.flatten()[:5]}")
-            
-            # Perform cumulative sum to reconstruct the original data
-            # Use original floating point precision for float types to prevent precision issues from float64 intermediates,
-            # int64 for integers to prevent overflow.
-            if np.issubdtype(residuals_dtype, np.floating):
-                cumsum_dtype = residuals_dtype # Use the residuals_dtype directly
+            coded = self._backend_decode(flags, compressed_payload, backend)
+            with span(self.stats, "decompress.arithmetic", len(coded)) as stage:
+                coder = ArithmeticCoder()
+                decoded = np.frombuffer(coder.decompress(coded.tobytes()), dtype=np.uint8)
+                stage.bytes_out = decoded.nbytes
+            if out_bytes is None:
+                return decoded.copy()
+            self._check_out_size(out_bytes, decoded.nbytes)
+            out_bytes[:] = decoded
+            return out_bytes
+
+        if flags & self.SPARSE_FLAG:
+            with span(self.stats, "decompress.sparse", len(compressed_payload)) as stage:
+                out_bytes = sparse_coding.decode(self, compressed_payload, backend, out_bytes)
+                stage.bytes_out = out_bytes.nbytes
+            return out_bytes
+
+        if flags & self.SPLIT_FLAG:
+            with span(self.stats, "decompress.split", len(compressed_payload)) as stage:
+                out_bytes = floatsplit.decode(self, compressed_payload, backend, out_bytes, nbytes)
+                stage.bytes_out = out_bytes.nbytes
+            return out_bytes
+
+        if flags & self.ARITHMETIC_CODING_FLAG:
+            with span(self.stats, "decompress.huffman", len(compressed_payload)) as stage:
+                out_bytes = entropy.decode(self, compressed_payload, out_bytes, nbytes)
+                stage.bytes_out = out_bytes.nbytes
+            return out_bytes
+
+        if flags & self.BITPACK_FLAG:
+            packed = self._backend_decode(flags, compressed_payload, backend)
+            with span(self.stats, "decompress.bitpack", packed.nbytes) as stage:
+                out_bytes = bitpacking.decode(self, packed, out_bytes, nbytes)
+                stage.bytes_out = out_bytes.nbytes
+            return out_bytes
+
+        return self._backend_decode(flags, compressed_payload, backend, out_bytes, nbytes)
+
+    def _backend_decode(self, flags, compressed_payload, backend, out_bytes=None, expected=None):
+        with span(self.stats, f"decompress.{backend.name}", len(compressed_payload)) as stage:
+            if flags & self.BLOCKED_FLAG:
+                out_bytes = decompress_blocks(self, compressed_payload, out_bytes, backend)
             else:
-                cumsum_dtype = np.int64 # For integers, still promote to int64 to prevent overflow
-            reconstructed_data = np.cumsum(residuals_array.astype(cumsum_dtype), dtype=cumsum_dtype).reshape(original_shape)
-            # print(f"DEBUG: decompress - reconstructed_data (first 5): {reconstructed_data.flatten()[:5]}")
-            
-            # Ensure the reconstructed data has the original dtype
-            # This handles both dtype promotions during cumsum and restores the original type
-            final_bytes = reconstructed_data.astype(original_dtype_name, copy=True).tobytes()
-        # --- END NEW: Reconstruction Step ---
-
-        decompressed_hash = hashlib.sha256(final_bytes).digest()
-        # print(f"DEBUG: decompress - Extracted original_hash: {original_hash.hex()}")
-        # print(f"DEBUG: decompress - Calculated decompressed_hash: {decompressed_hash.hex()}")
-        # print(f"DEBUG: decompress - original_hash length: {len(original_hash)}, decompressed_hash length: {len(decompressed_hash)}")
+                nbytes = backend.decoded_size(compressed_payload) # from the frame's own header
+                if out_bytes is None:
+                    if expected is not None and nbytes != expected:
+                        raise ValueError(f"{backend.name} frame decodes to {nbytes} bytes, but the record decodes to {expected} bytes.")
+                    out_bytes = np.empty(nbytes, dtype=np.uint8)
+                else:
+                    self._check_out_size(out_bytes, nbytes)
+                if nbytes:
+                    backend.decompress_into(compressed_payload, out_bytes, self.codec_threads)
+            stage.bytes_out = out_bytes.nbytes
+        return out_bytes
+
+    def _reconstruct_delta_encoding(self, metadata, residual_bytes):
+        # Records written by v0.4 widened residuals (uint8 -> int16, float -> float64, ...)
+        original_dtype_name = metadata["original_dtype"]
+        residuals_dtype = np.dtype(metadata["residuals_dtype"]) # Use the stored residuals_dtype
+        residuals_array = residual_bytes.view(residuals_dtype)
+        # Use original floating point precision for float types, int64 for integers to prevent overflow.
+        if np.issubdtype(residuals_dtype, np.floating):
+            cumsum_dtype = residuals_dtype
+        else:
+            cumsum_dtype = np.int64
+        reconstructed_data = np.cumsum(residuals_array, dtype=cumsum_dtype)
+        return reconstructed_data.astype(original_dtype_name, copy=False).view(np.uint8)
+
+    def _decode_record(self, nfc_binary, out_bytes=None, reference=None):
+        with span(self.stats, "decompress.total", len(nfc_binary)) as total:
+            metadata, final_bytes = self._decode_record_stages(nfc_binary, out_bytes, reference)
+            total.bytes_out = memoryview(final_bytes).nbytes
+        count(self.stats, "decompress.blocks")
+        return metadata, final_bytes
+
+    def _decode_record_stages(self, nfc_binary, out_bytes=None, reference=None):
+        stats = self.stats
+        if is_dictionary_record(nfc_binary):
+            return decode_record(self, nfc_binary, out_bytes)
+        with span(stats, "decompress.parse", len(nfc_binary)):
+            flags, record_hash_algo, metadata, compressed_payload, original_hash, backend = self._parse_record(nfc_binary)
+        prediction_model = metadata.get("prediction_model")
+        stack = metadata.get("compression_stack")
+
+        # Step 1: backend (or entropy) decompression
+        if out_bytes is None and prediction_model is None and not (flags & (self.ARITHMETIC_CODING_FLAG | self.BLOCKED_FLAG | self.SPLIT_FLAG | self.SPARSE_FLAG | self.BITPACK_FLAG)) \
+                and metadata.get("format_hint") != "numpy_tensor" and "reference" not in metadata:
+            # Plain byte records are returned as bytes, so let the backend allocate them directly
+            stage_name = "decompress.stored" if flags & self.STORED_FLAG else f"decompress.{backend.name}"
+            with span(stats, stage_name, len(compressed_payload)) as stage:
+                if flags & self.STORED_FLAG:
+                    final_bytes = bytes(compressed_payload)
+                else:
+                    final_bytes = backend.decompress(compressed_payload, self.codec_threads)
+                stage.bytes_out = len(final_bytes)
+        elif prediction_model == "delta_encoding":
+            residual_bytes = self._decode_payload(flags, compressed_payload, backend, stack=stack)
+            with span(stats, "decompress.reconstruct", residual_bytes.nbytes):
+                final_bytes = self._reconstruct_delta_encoding(metadata, residual_bytes)
+            if out_bytes is not None:
+                self._check_out_size(out_bytes, final_bytes.nbytes)
+                out_bytes[:] = final_bytes
+                final_bytes = out_bytes
+        else:
+            nbytes = None
+            if metadata.get("format_hint") == "numpy_tensor":
+                nbytes = int(np.prod(metadata["shape"], dtype=np.int64)) * tensor_dtype(metadata["dtype"]).itemsize
+            final_bytes = self._decode_payload(flags, compressed_payload, backend, out_bytes, stack, nbytes)
+            # Step 2: Reconstruction, in place over the decoded residuals
+            if prediction_model is not None:
+                with span(stats, "decompress.reconstruct", final_bytes.nbytes):
+                    predictors.reconstruct(prediction_model, final_bytes, tensor_dtype(metadata["dtype"]).itemsize,
+                                           metadata["shape"], metadata.get("prediction_params"))
+            # Step 3: add the reference back (resolved per call, else via self.references)
+            if "reference" in metadata:
+                info = metadata["reference"]
+                itemsize = tensor_dtype(metadata["dtype"]).itemsize if metadata.get("format_hint") == "numpy_tensor" else 1
+                with span(stats, "decompress.reference", final_bytes.nbytes):
+                    base = resolve(self.references if reference is None else reference, info, final_bytes.nbytes)
+                    decode_residual(final_bytes, base, info["mode"], itemsize)
+
+        # Records without hash_block_size predate per-block checksums and hold one digest
+        final_view = memoryview(final_bytes).cast('B')
+        with span(stats, "decompress.hash", final_view.nbytes):
+            decompressed_hash = digest_blocks(record_hash_algo, final_view, metadata.get("hash_block_size"), self.nthreads)
         if decompressed_hash != original_hash:
             raise ValueError("Corruption detected! Hash mismatch.")
-            
+        return metadata, final_bytes
+
+    def decompress(self, nfc_binary, reference=None, sparse=False):
+        # reference resolves records written with compress(..., reference=...): the
+        # base itself, a Reference, a mapping from id to buffer, or a callable.
+        # sparse=True returns tensors as a sparse.SparseTensor; sparse-encoded records
+        # are then never expanded to their dense size.
+        if sparse:
+            return self._decompress_sparse(nfc_binary, reference)
+        metadata, final_bytes = self._decode_record(nfc_binary, reference=reference)
         if metadata.get("format_hint") == "numpy_tensor":
-            np_dtype = np.dtype(metadata["dtype"])
-            if metadata.get("endianness") and np_dtype.byteorder != metadata["endianness"]:
-                np_dtype = np_dtype.newbyteorder(metadata["endianness"])
-            return np.frombuffer(final_bytes, dtype=np_dtype).reshape(metadata["shape"])
-            
+            np_dtype = tensor_dtype(metadata["dtype"], metadata.get("endianness"))
+            return final_bytes.view(np_dtype).reshape(metadata["shape"])
+        if isinstance(final_bytes, np.ndarray):
+            return final_bytes.tobytes()
         return final_bytes
 
-    def compress_stream(self, in_path, out_path, chunk_size=1024 * 1024 * 64):
+    def _decompress_sparse(self, nfc_binary, reference=None):
+        if not is_dictionary_record(nfc_binary):
+            with span(self.stats, "decompress.total", len(nfc_binary)) as total:
+                with span(self.stats, "decompress.parse", len(nfc_binary)):
+                    flags, _, metadata, compressed_payload, _, backend = self._parse_record(nfc_binary)
+                if flags & self.SPARSE_FLAG and "reference" not in metadata:
+                    # The sparse streams carry their own digests
+                    with span(self.stats, "decompress.sparse", len(compressed_payload)) as stage:
+                        dtype = tensor_dtype(metadata["dtype"], metadata.get("endianness"))
+                        result = sparse_coding.decode_tensor(self, compressed_payload, backend, dtype, metadata["shape"])
+                        stage.bytes_out = result.values.nbytes
+                    total.bytes_out = result.values.nbytes
+                    count(self.stats, "decompress.blocks")
+                    return result
+        dense = self.decompress(nfc_binary, reference)
+        if not isinstance(dense, np.ndarray):
+            raise ValueError("decompress(sparse=True) needs a tensor record, got a bytes record")
+        return sparse_coding.SparseTensor.from_dense(dense)
+
+    def decompress_into(self, nfc_binary, out, reference=None):
+        # Decodes a record straight into a caller-supplied writable buffer (ndarray,
+        # np.memmap, bytearray, mmap.mmap) and returns `out`. Peak memory is the
+        # compressed record plus `out`; on a hash mismatch `out` holds unverified data.
+        if isinstance(out, np.ndarray):
+            if not out.flags.c_contiguous or not out.flags.writeable:
+                raise ValueError("decompress_into needs a C-contiguous, writeable output array")
+            out_bytes = out.reshape(-1).view(np.uint8)
+        else:
+            out_bytes = np.frombuffer(out, dtype=np.uint8)
+            if not out_bytes.flags.writeable:
+                raise ValueError("decompress_into needs a writeable output buffer")
+        self._decode_record(nfc_binary, out_bytes, reference)
+        return out
+
+    def _compress_chunk(self, chunk, reference=None, reference_mode='xor'):
+        # Every chunk is a self-contained record, so NFCPrototype(entropy_coding=True)
+        # entropy-codes stream chunks too
+        nfc_chunk, orig_size, _ = self.compress(chunk, reference=reference,
+                                                reference_mode=reference_mode)
+        return nfc_chunk, orig_size
+
+    def _reference_chunks(self, chunks, reference, reference_mode):
+        # Pairs each stream chunk with the reference bytes at the same offset; chunks
+        # running past the end of the reference are compressed on their own.
+        offset = 0
+        for chunk in chunks:
+            end = offset + len(chunk)
+            yield chunk, reference.at(offset, len(chunk)) if end <= reference.nbytes else None, reference_mode
+            offset = end
+
+    @property
+    def codec_threads(self):
+        # Threads for one codec call: 1 on our worker pools (see backends.on_worker),
+        # else the nthreads passed in (None: the codec's own default)
+        return worker_threads(self._codec_threads)
+
+    def _ordered_map(self, fn, items, workers):
+        # Runs fn over items on a thread pool while keeping at most 2 * workers
+        # results in flight, and yields them in input order. blosc and hashlib
+        # release the GIL on large buffers, so threads scale across cores.
+        max_in_flight = 2 * workers
+        fn = on_worker(fn)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for item in items:
+                pending.append(pool.submit(fn, item))
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def compress_stream(self, in_path, out_path, chunk_size=1024 * 1024 * 64, workers=1, index=True,
+                        reference=None, reference_mode='xor'):
+        # reference=<base file path, buffer or Reference>: each block is delta-encoded
+        # against the reference bytes at the same offset
+        if reference is not None and not isinstance(reference, Reference):
+            with Reference(reference) as mapped:
+                return self.compress_stream(in_path, out_path, chunk_size, workers, index, mapped, reference_mode)
+        if reference is not None:
+            check_mode(reference_mode)
         with open(in_path, 'rb') as fin, open(out_path, 'wb') as fout:
-            while chunk := fin.read(chunk_size):
-                # For streaming, we don't use arithmetic coding as it's stateful across chunks
-                nfc_chunk, _, _ = self.compress(chunk, force_arithmetic=False)
-                fout.write(nfc_chunk)
-
-    def decompress_stream(self, in_path, out_path):
+            chunks = timed_iter(self.stats, "compress.read", iter(lambda: fin.read(chunk_size), b''))
+            compress_chunk = self._compress_chunk
+            if reference is not None:
+                chunks = self._reference_chunks(chunks, reference, reference_mode)
+                compress_chunk = lambda item: self._compress_chunk(*item)
+            if workers > 1:
+                nfc_chunks = self._ordered_map(compress_chunk, chunks, workers)
+            else:
+                nfc_chunks = map(compress_chunk, chunks)
+            # Track (compressed offset, compressed length, uncompressed offset, uncompressed length)
+            # per block for the v3 footer index
+            index_entries = []
+            comp_offset = 0
+            uncomp_offset = 0
+            for nfc_chunk, orig_size in nfc_chunks:
+                with span(self.stats, "compress.write", len(nfc_chunk)):
+                    fout.write(nfc_chunk)
+                index_entries.append((comp_offset, len(nfc_chunk), uncomp_offset, orig_size))
+                comp_offset += len(nfc_chunk)
+                uncomp_offset += orig_size
+            if index:
+                write_block_index(fout, index_entries, comp_offset)
+
+    def _stream_block_size(self, initial_bytes):
+        # Total size of the NFC block whose first 34 bytes are `initial_bytes`:
+        # magic (4) + version (1) + flags (1) + reserved (2) + header_len (8) + meta_len (8) + payload_len (8) + hash_len (2)
+        if len(initial_bytes) < 34:
+            raise ValueError("Incomplete NFC block header in stream")
+
+        # Parse header fields from initial_bytes
+        if initial_bytes[:4] != self.magic:
+            raise ValueError(f"Invalid magic. Expected {self.magic}, got {initial_bytes[:4]} in stream")
+
+        version = initial_bytes[4]
+        if version != self.version:
+            raise ValueError(f"Version mismatch. Expected {self.version}, got {version} in stream")
+        
+        # Extract header lengths
+        # header_len is always 34 for v2, but we read it to be consistent with future versions
+        header_len_parsed = struct.unpack('!Q', initial_bytes[8:16])[0]
+        meta_len = struct.unpack('!Q', initial_bytes[16:24])[0]
+        payload_len = struct.unpack('!Q', initial_bytes[24:32])[0]
+        hash_len = struct.unpack('!H', initial_bytes[32:34])[0]
+
+        # Calculate total size of the current NFC block
+        total_block_size = int(header_len_parsed + meta_len + payload_len + hash_len)
+        if total_block_size < len(initial_bytes):
+            raise ValueError("Calculated total block size is smaller than initial header read. This indicates an invalid header.")
+        return total_block_size
+
+    def _iter_stream_blocks(self, fin):
+        while True:
+            # Read enough to determine the size of the next NFC block
+            initial_bytes = fin.read(34)
+            if not initial_bytes:
+                break # End of file
+            if initial_bytes[:4] == INDEX_MAGIC:
+                # Start of the v3 footer index: nothing but the index and trailer may follow
+                check_index_tail(initial_bytes + fin.read())
+                break
+
+            # Read the rest of the current NFC block
+            # This accounts for the 34 bytes already read in initial_bytes
+            remaining_to_read = self._stream_block_size(initial_bytes) - len(initial_bytes)
+            remaining_block_bytes = fin.read(remaining_to_read)
+            if len(remaining_block_bytes) != remaining_to_read:
+                raise ValueError("Incomplete NFC block in stream")
+
+            yield initial_bytes + remaining_block_bytes
+
+    def decompress_stream(self, in_path, out_path, workers=1, reference=None):
+        # reference: what compress_stream was given (or a resolver), for delta-encoded blocks
+        if isinstance(reference, (str, os.PathLike)):
+            with Reference(reference) as mapped:
+                return self.decompress_stream(in_path, out_path, workers, mapped)
+        decompress = self.decompress if reference is None else lambda block: self.decompress(block, reference)
         with open(in_path, 'rb') as fin, open(out_path, 'wb') as fout:
-            while True:
-                # Read enough to determine the size of the next NFC block
-                # We need magic (4) + version (1) + flags (1) + reserved (2) + header_len (8) + meta_len (8) + payload_len (8) + hash_len (2) = 34 bytes
-                initial_bytes = fin.read(34)
-                if not initial_bytes:
-                    break # End of file
-
-                if len(initial_bytes) < 34:
-                    raise ValueError("Incomplete NFC block header in stream")
-
-                # Parse header fields from initial_bytes
-                if initial_bytes[:4] != self.magic:
-                    raise ValueError(f"Invalid magic. Expected {self.magic}, got {initial_bytes[:4]} in stream")
-
-                version = initial_bytes[4]
-                if version != self.version:
-                    raise ValueError(f"Version mismatch. Expected {self.version}, got {version} in stream")
-                
-                # Extract header lengths
-                # header_len is always 34 for v2, but we read it to be consistent with future versions
-                header_len_parsed = struct.unpack('!Q', initial_bytes[8:16])[0]
-                meta_len = struct.unpack('!Q', initial_bytes[16:24])[0]
-                payload_len = struct.unpack('!Q', initial_bytes[24:32])[0]
-                hash_len = struct.unpack('!H', initial_bytes[32:34])[0]
-
-                # Calculate total size of the current NFC block
-                total_block_size = int(header_len_parsed + meta_len + payload_len + hash_len)
-
-                # Read the rest of the current NFC block
-                # This accounts for the 34 bytes already read in initial_bytes
-                remaining_to_read = total_block_size - len(initial_bytes)
-                if remaining_to_read < 0:
-                    raise ValueError("Calculated total block size is smaller than initial header read. This indicates an invalid header.")
-
-                remaining_block_bytes = fin.read(remaining_to_read)
-                if len(remaining_block_bytes) != remaining_to_read:
+            nfc_blocks = timed_iter(self.stats, "decompress.read", self._iter_stream_blocks(fin))
+            if workers > 1:
+                decompressed_blocks = self._ordered_map(decompress, nfc_blocks, workers)
+            else:
+                decompressed_blocks = map(decompress, nfc_blocks)
+            for decompressed_data in decompressed_blocks:
+                with span(self.stats, "decompress.write", len(decompressed_data)):
+                    fout.write(decompressed_data)
+
+    def read_range(self, path, offset, length):
+        # Random access into a v3 container: one seek for the trailer, one for the
+        # index, then one per block overlapping [offset, offset + length).
+        with open(path, 'rb') as fin:
+            entries = read_block_index(fin)
+            if entries is None:
+                raise ValueError(f"{path} has no block index. Re-compress it with compress_stream(..., index=True) for random access.")
+            parts = []
+            for comp_offset, comp_len, uncomp_offset, uncomp_len in blocks_for_range(entries, offset, length):
+                fin.seek(comp_offset)
+                nfc_block = fin.read(comp_len)
+                if len(nfc_block) != comp_len:
                     raise ValueError("Incomplete NFC block in stream")
+                block = self.decompress(nfc_block)
+                start = max(offset - uncomp_offset, 0)
+                end = min(offset + length - uncomp_offset, uncomp_len)
+                parts.append(block[start:end])
+            return b''.join(parts)
+
+    def open_writer(self, target, chunk_size=1024 * 1024 * 64, workers=1, index=True):
+        # File-like writer producing the compress_stream container; `target` is a
+        # path or a writable binary file object (socket file, pipe, tarfile member, ...)
+        return NFCWriter(target, self, chunk_size=chunk_size, workers=workers, index=index)
+
+    def open_reader(self, source):
+        # File-like, seekable (given a block index) reader over a compress_stream container
+        return NFCReader(source, self)
+
+    async def acompress(self, data, executor=None, **kwargs):
+        # compress() on `executor` (the loop's default when None), so the event loop
+        # keeps running while a large tensor is compressed
+        return await aio.run_in_executor(executor, self.compress, data, **kwargs)
+
+    async def adecompress(self, nfc_binary, executor=None):
+        return await aio.run_in_executor(executor, self.decompress, nfc_binary)
+
+    async def acompress_stream(self, reader, writer, chunk_size=1024 * 1024 * 64, workers=1, executor=None, index=True):
+        # Streams from an async reader to an async writer. Reading chunk N+1,
+        # compressing chunk N and writing chunk N-1 overlap; see aio._pipeline.
+        await aio.compress_stream(self, reader, writer, chunk_size, workers, executor, index)
+
+    async def adecompress_stream(self, reader, writer, workers=1, executor=None):
+        await aio.decompress_stream(self, reader, writer, workers, executor)
+
+    def compress_chunked(self, data, out, chunks=None, use_prediction=False, workers=1):
+        # Stores an ndarray as independently compressed chunks (leading-axis slabs or an
+        # N-d grid) so open_chunked() can decode just the chunks a slice touches.
+        # `out` is a path or a writable binary file object; returns the bytes written.
+        if not isinstance(data, np.ndarray):
+            raise TypeError("compress_chunked expects a numpy.ndarray")
+        if hasattr(out, 'write'):
+            return write_chunked(self, data, out, chunks, use_prediction, workers)
+        with open(out, 'wb') as fout:
+            return write_chunked(self, data, fout, chunks, use_prediction, workers)
+
+    def open_chunked(self, source, workers=1):
+        return ChunkedTensorReader(source, self, workers=workers)
+
+    def compress_safetensors(self, source, out, workers=1, use_prediction=False, reference=None, reference_mode='xor'):
+        # Compresses each tensor of a safetensors file (path or buffer) with its own
+        # dtype into one archive indexed by name. `out` is a path or a writable binary
+        # file object; returns the bytes written. reference=<base safetensors file>
+        # delta-encodes every tensor against the same-named, same-sized base tensor.
+        if hasattr(out, 'write'):
+            return write_archive(self, source, out, workers, use_prediction, reference, reference_mode)
+        with open(out, 'wb') as fout:
+            return write_archive(self, source, fout, workers, use_prediction, reference, reference_mode)
+
+    def open_safetensors(self, source, workers=1, reference=None):
+        return SafetensorsArchive(source, self, workers=workers, reference=reference)
+
+    def compress_dedup(self, in_path, out_path, store, avg_chunk_size=DEFAULT_AVG_CHUNK_SIZE, workers=1):
+        # Content-defined chunks of in_path go to `store` (a ChunkStore or its root
+        # directory) unless already there; out_path receives a manifest of chunk
+        # references. Returns counts of chunks seen and newly stored (see dedup.py).
+        store = store if isinstance(store, ChunkStore) else ChunkStore(store)
+        with open(in_path, 'rb') as fin, open(out_path, 'wb') as fout:
+            return compress_dedup(self, fin, fout, store, avg_chunk_size, workers)
+
+    def decompress_dedup(self, in_path, out_path, store, workers=1):
+        store = store if isinstance(store, ChunkStore) else ChunkStore(store)
+        with open(in_path, 'rb') as fin, open(out_path, 'wb') as fout:
+            decompress_dedup(self, fin, fout, store, workers)
+
+    def compress_many(self, items, workers=1):
+        # Packs a {name: ndarray | bytes-like} mapping into one batch object with a
+        # shared header, one compact metadata table and frames compressed on `workers`
+        # threads (see batch.py). Returns the blob.
+        return compress_many(self, items, workers)
 
-                nfc_block = initial_bytes + remaining_block_bytes
-                
-                decompressed_data = self.decompress(nfc_block)
-                fout.write(decompressed_data)
\ No newline at end of file
+    def decompress_many(self, blob, names=None, workers=1):
+        # {name: value} for `names` (all by default); only frames holding them are decoded
+        return decompress_many(self, blob, names, workers)
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import struct
+import tempfile
+import numpy as np
+
+from .hashing import hash_id, hash_name
+from .stats import count, span, timed_iter
+
+# Deduplicating mode for files that share most of their bytes with earlier ones
+# (successive training checkpoints). Input is cut by a content-defined chunker, so
+# an insertion or a resized header only moves the cut points next to it, and each
+# chunk is stored once in a ChunkStore as an NFC2 record named by the SHA-256 of its
+# uncompressed bytes. The compressed file is a manifest of chunk references:
+#   [MANIFEST_HEADER][MANIFEST_ENTRY]*n
+# Compressing checkpoint N+1 hashes every chunk but only compresses and stores the
+# chunks the store does not already hold.
+MANIFEST_MAGIC = b'NFCM'
+MANIFEST_VERSION = 1
+MANIFEST_HEADER = struct.Struct('!4sBB2xQQ') # magic, version, key hash id, reserved, chunk count, total length
+MANIFEST_ENTRY = struct.Struct('!32sQ')      # chunk key (SHA-256 of the chunk), chunk length
+DEDUP_KEY_ALGO = 'sha256' # chunk keys must be collision resistant, independent of proto.hash_algo
+
+DEFAULT_AVG_CHUNK_SIZE = 1024 * 1024
+CDC_READ_SIZE = 1024 * 256 # hash arrays of this many uint32 stay cache resident
+
+# Gear table: one pseudo-random 32-bit value per byte value, fixed so that cut points
+# (and therefore dedup across files and versions) never change.
+GEAR = np.array([int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], 'big') for i in range(256)],
+                dtype=np.uint32)
+GEAR_WINDOW = 32 # a 32-bit gear hash only depends on the last 32 bytes
+
+
+def gear_hashes(data):
+    # Gear rolling hash at every position: h[i] = sum(GEAR[data[i - k]] << k, k < 32)
+    # mod 2^32. Built by doubling the window (1, 2, 4, ... 32 bytes), so it costs five
+    # vectorized passes instead of a Python loop per byte.
+    h = GEAR[np.frombuffer(data, dtype=np.uint8)]
+    shifted = np.empty_like(h)
+    shift = 1
+    while shift < GEAR_WINDOW:
+        np.left_shift(h[:-shift], np.uint32(shift), out=shifted[shift:])
+        h[shift:] += shifted[shift:]
+        shift *= 2
+    return h
+
+
+def chunk_sizes(avg_size):
+    # (min, max, mask) for an average chunk size. A cut is allowed once a chunk holds
+    # min bytes, at the first position whose top mask bits are all zero, and forced
+    # at max bytes; min + 2^bits is about avg_size.
+    min_size = max(avg_size // 4, GEAR_WINDOW)
+    bits = max(int(round(np.log2(max(avg_size - min_size, 1)))), 1)
+    mask = np.uint32(((1 << bits) - 1) << (32 - bits)) # top bits depend on all 32 window bytes
+    return min_size, avg_size * 4, mask
+
+
+def iter_cdc_chunks(fin, avg_size=DEFAULT_AVG_CHUNK_SIZE, read_size=CDC_READ_SIZE):
+    # Yields content-defined chunks (bytes) of a binary file object
+    min_size, max_size, mask = chunk_sizes(avg_size)
+    pending = bytearray()
+    candidates = np.empty(0, dtype=np.int64) # positions in `pending` a chunk may end after
+    tail = b'' # last GEAR_WINDOW - 1 bytes seen, so hashes continue across reads
+    eof = False
+    while not eof:
+        segment = fin.read(read_size)
+        eof = not segment
+        if segment:
+            context = tail + segment
+            hits = np.flatnonzero((gear_hashes(context)[len(tail):] & mask) == 0)
+            candidates = np.concatenate([candidates, hits + len(pending)])
+            pending += segment
+            tail = context[-(GEAR_WINDOW - 1):]
+        while pending:
+            usable = candidates[candidates + 1 >= min_size]
+            if len(usable) and usable[0] + 1 <= max_size:
+                cut = int(usable[0]) + 1
+            elif len(pending) >= max_size:
+                cut = max_size
+            elif eof:
+                cut = len(pending)
+            else:
+                break # the next cut depends on bytes not read yet
+            yield bytes(pending[:cut])
+            del pending[:cut]
+            candidates = candidates[candidates >= cut] - cut
+
+
+class ChunkStore:
+    """Local content-addressed store of compressed chunks.
+
+    Each chunk is an NFC2 record in ``root/<2 hex>/<64 hex>`` named by the SHA-256 of
+    its uncompressed bytes. Records are written to a temporary file and renamed into
+    place, so concurrent writers and interrupted runs never leave partial chunks.
+    """
+
+    def __init__(self, root):
+        self.root = os.fspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        name = key.hex()
+        return os.path.join(self.root, name[:2], name)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def __len__(self):
+        return sum(1 for _ in self.keys())
+
+    def keys(self):
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and len(entry.name) == 2:
+                for chunk in os.scandir(entry.path):
+                    if len(chunk.name) == 64 and not chunk.name.startswith('.'):
+                        yield bytes.fromhex(chunk.name)
+
+    def put(self, key, record):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(record)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(f"Chunk {key.hex()} is missing from store {self.root}") from None
+
+
+def write_manifest(fout, entries):
+    total = sum(length for _, length in entries)
+    fout.write(MANIFEST_HEADER.pack(MANIFEST_MAGIC, MANIFEST_VERSION, hash_id(DEDUP_KEY_ALGO), len(entries), total))
+    fout.write(b''.join(MANIFEST_ENTRY.pack(key, length) for key, length in entries))
+    return MANIFEST_HEADER.size + len(entries) * MANIFEST_ENTRY.size
+
+
+def read_manifest(fin):
+    # Returns the list of (chunk key, chunk length) entries
+    header = fin.read(MANIFEST_HEADER.size)
+    if len(header) != MANIFEST_HEADER.size:
+        raise ValueError("Manifest is too short to hold a header")
+    magic, version, key_algo, chunk_count, total = MANIFEST_HEADER.unpack(header)
+    if magic != MANIFEST_MAGIC:
+        raise ValueError(f"Invalid manifest magic. Expected {MANIFEST_MAGIC}, got {magic}")
+    if version != MANIFEST_VERSION:
+        raise ValueError(f"Manifest version mismatch. Expected {MANIFEST_VERSION}, got {version}")
+    if hash_name(key_algo) != DEDUP_KEY_ALGO:
+        raise ValueError(f"Unsupported manifest chunk key algorithm '{hash_name(key_algo)}'")
+    body = fin.read(chunk_count * MANIFEST_ENTRY.size)
+    if len(body) != chunk_count * MANIFEST_ENTRY.size or fin.read(1):
+        raise ValueError("Manifest length does not match its chunk count")
+    entries = list(MANIFEST_ENTRY.iter_unpack(body))
+    if sum(length for _, length in entries) != total:
+        raise ValueError("Manifest chunk lengths do not add up to its total length")
+    return entries
+
+
+def compress_dedup(proto, fin, fout, store, avg_chunk_size=DEFAULT_AVG_CHUNK_SIZE, workers=1):
+    # Chunks `fin`, stores chunks `store` does not hold yet and writes the manifest
+    # to `fout`. Returns counts: chunks, new_chunks, bytes_in, bytes_stored.
+    def process(chunk):
+        with span(proto.stats, "dedup.key", len(chunk)):
+            key = hashlib.sha256(chunk).digest()
+        if key in store:
+            return key, len(chunk), None
+        return key, len(chunk), proto._compress_chunk(chunk)[0]
+
+    chunks = timed_iter(proto.stats, "compress.read", iter_cdc_chunks(fin, avg_chunk_size))
+    if workers > 1:
+        results = proto._ordered_map(process, chunks, workers)
+    else:
+        results = map(process, chunks)
+    entries = []
+    summary = {"chunks": 0, "new_chunks": 0, "bytes_in": 0, "bytes_stored": 0}
+    for key, length, record in results:
+        entries.append((key, length))
+        summary["chunks"] += 1
+        summary["bytes_in"] += length
+        # A chunk repeated within this file may have been compressed twice in flight;
+        # only its first occurrence is stored.
+        if record is not None and key not in store:
+            with span(proto.stats, "compress.write", len(record)):
+                store.put(key, record)
+            count(proto.stats, "dedup.new_chunks")
+            summary["new_chunks"] += 1
+            summary["bytes_stored"] += len(record)
+    write_manifest(fout, entries)
+    return summary
+
+
+def decompress_dedup(proto, fin, fout, store, workers=1):
+    entries = read_manifest(fin)
+
+    def restore(entry):
+        key, length = entry
+        with span(proto.stats, "decompress.read", length):
+            record = store.get(key)
+        data = proto.decompress(record)
+        if len(data) != length:
+            raise ValueError(f"Chunk {key.hex()} decodes to {len(data)} bytes, manifest expects {length}")
+        return data
+
+    if workers > 1:
+        chunks = proto._ordered_map(restore, entries, workers)
+    else:
+        chunks = map(restore, entries)
+    for data in chunks:
+        with span(proto.stats, "decompress.write", len(data)):
+            fout.write(data)
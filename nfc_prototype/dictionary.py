@@ -0,0 +1,179 @@
+import json
+import struct
+import threading
+import numpy as np
+
+from .hashing import HASH_ALGORITHMS, digest_blocks, hash_name
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Trained-dictionary mode for many small objects (2-64 KB). A zstd dictionary trained
+# on sample objects is stored once (NFCDictionary.save) and every small record only
+# references it by id, so each record starts from shared context instead of cold.
+# Small records also drop the NFC2 framing overhead: an 18-byte header, compact
+# metadata and a single digest whose size follows from the hash id.
+#
+# Dictionary record:
+#   [DICT_RECORD_HEADER][metadata JSON, empty for bytes][zstd frame][digest]
+DICT_RECORD_MAGIC = b'NFCD'
+DICT_RECORD_VERSION = 1
+DICT_RECORD_HEADER = struct.Struct('!4sBBBxIHI') # magic, version, flags, hash id, reserved, dict id, meta_len, payload_len
+DICTIONARY_MAGIC = b'NFDI'
+DICTIONARY_VERSION = 1
+DICTIONARY_HEADER = struct.Struct('!4sBB2x') # magic, version, zstd level, reserved
+SHUFFLED_FLAG = 0x01 # payload holds the byte planes of a tensor (itemsize > 1)
+DEFAULT_DICT_SIZE = 112 * 1024
+DEFAULT_DICT_LEVEL = 9
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise RuntimeError("Dictionary mode requires the 'zstandard' package, which is not installed.")
+
+
+def _shuffled(data):
+    # Byte planes of a tensor (all first bytes, then all second bytes, ...): the
+    # same transform as blosc's byte shuffle, so dictionaries see aligned lanes.
+    itemsize = data.dtype.itemsize
+    raw = np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+    return np.ascontiguousarray(raw.reshape(-1, itemsize).T)
+
+
+def _unshuffle(planes, itemsize):
+    return np.ascontiguousarray(planes.reshape(itemsize, -1).T).reshape(-1)
+
+
+def _training_bytes(sample):
+    if isinstance(sample, np.ndarray) and sample.dtype.itemsize > 1:
+        return _shuffled(sample).tobytes()
+    if isinstance(sample, np.ndarray):
+        return sample.tobytes()
+    return bytes(sample)
+
+
+class NFCDictionary:
+    """A trained zstd dictionary plus the compression level records use with it.
+
+    ``dict_id`` is zstd's own dictionary id, which small records reference.
+    Compressor/decompressor contexts are cached per thread.
+    """
+
+    def __init__(self, data, level=DEFAULT_DICT_LEVEL):
+        _require_zstandard()
+        self.data = bytes(data)
+        self.level = level
+        self._dict = zstandard.ZstdCompressionDict(self.data)
+        self.dict_id = self._dict.dict_id()
+        self._local = threading.local()
+
+    @classmethod
+    def train(cls, samples, dict_size=DEFAULT_DICT_SIZE, level=DEFAULT_DICT_LEVEL):
+        _require_zstandard()
+        samples = [_training_bytes(sample) for sample in samples]
+        try:
+            trained = zstandard.train_dictionary(dict_size, samples, level=level)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Dictionary training failed ({e}). Provide more or larger samples.") from None
+        return cls(trained.as_bytes(), level)
+
+    def compressor(self):
+        cctx = getattr(self._local, 'cctx', None)
+        if cctx is None:
+            cctx = self._local.cctx = zstandard.ZstdCompressor(
+                level=self.level, dict_data=self._dict, write_checksum=False, write_dict_id=False)
+        return cctx
+
+    def decompressor(self):
+        dctx = getattr(self._local, 'dctx', None)
+        if dctx is None:
+            dctx = self._local.dctx = zstandard.ZstdDecompressor(dict_data=self._dict)
+        return dctx
+
+    def to_bytes(self):
+        return DICTIONARY_HEADER.pack(DICTIONARY_MAGIC, DICTIONARY_VERSION, self.level) + self.data
+
+    @classmethod
+    def from_bytes(cls, blob):
+        blob = bytes(blob)
+        if len(blob) < DICTIONARY_HEADER.size:
+            raise ValueError("Dictionary blob is too short")
+        magic, version, level = DICTIONARY_HEADER.unpack_from(blob)
+        if magic != DICTIONARY_MAGIC:
+            raise ValueError(f"Invalid dictionary magic. Expected {DICTIONARY_MAGIC}, got {magic}")
+        if version != DICTIONARY_VERSION:
+            raise ValueError(f"Dictionary version mismatch. Expected {DICTIONARY_VERSION}, got {version}")
+        return cls(blob[DICTIONARY_HEADER.size:], level)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def is_dictionary_record(nfc_binary):
+    return bytes(nfc_binary[:4]) == DICT_RECORD_MAGIC
+
+
+def compress_record(proto, data, dictionary):
+    view = proto._as_byte_view(data)
+    flags = 0
+    metadata = b''
+    payload = view
+    if isinstance(data, np.ndarray):
+        metadata = json.dumps({"dtype": data.dtype.name, "endianness": data.dtype.byteorder,
+                               "shape": list(data.shape)}, separators=(',', ':')).encode('utf-8')
+        if data.dtype.itemsize > 1:
+            payload = _shuffled(data)
+            flags |= SHUFFLED_FLAG
+    compressed = dictionary.compressor().compress(payload)
+    digest = digest_blocks(proto.hash_algo, view)
+    header = DICT_RECORD_HEADER.pack(DICT_RECORD_MAGIC, DICT_RECORD_VERSION, flags, proto.hash_id,
+                                     dictionary.dict_id, len(metadata), len(compressed))
+    record = b''.join((header, metadata, compressed, digest))
+    return record, view.nbytes, len(record)
+
+
+def decode_record(proto, nfc_binary, out_bytes=None):
+    # Returns (metadata, decoded uint8 array) like NFCPrototype._decode_record
+    nfc_binary = proto._as_byte_view(nfc_binary)
+    if len(nfc_binary) < DICT_RECORD_HEADER.size:
+        raise ValueError("Dictionary record is too short to hold a header")
+    _, version, flags, algo_id, dict_id, meta_len, payload_len = DICT_RECORD_HEADER.unpack_from(nfc_binary)
+    if version != DICT_RECORD_VERSION:
+        raise ValueError(f"Dictionary record version mismatch. Expected {DICT_RECORD_VERSION}, got {version}")
+    algo = hash_name(algo_id)
+    digest_size = HASH_ALGORITHMS[algo][1]
+    offset = DICT_RECORD_HEADER.size
+    if offset + meta_len + payload_len + digest_size != len(nfc_binary):
+        raise ValueError("Dictionary record length does not match its header")
+    dictionary = proto.dictionaries.get(dict_id)
+    if dictionary is None:
+        raise ValueError(f"Record needs dictionary id {dict_id}, which is not registered. Pass it via NFCPrototype(dictionaries=[...]).")
+
+    metadata = {"format_hint": "bytes"}
+    if meta_len:
+        metadata = json.loads(bytes(nfc_binary[offset:offset + meta_len]))
+        metadata["format_hint"] = "numpy_tensor"
+    offset += meta_len
+    payload = nfc_binary[offset:offset + payload_len]
+    original_hash = nfc_binary[offset + payload_len:]
+
+    decoded = dictionary.decompressor().decompress(payload)
+    if flags & SHUFFLED_FLAG:
+        decoded = _unshuffle(np.frombuffer(decoded, dtype=np.uint8), np.dtype(metadata["dtype"]).itemsize)
+    if out_bytes is not None:
+        proto._check_out_size(out_bytes, len(decoded))
+        out_bytes[:] = np.frombuffer(decoded, dtype=np.uint8)
+        decoded = out_bytes
+    elif meta_len and isinstance(decoded, bytes):
+        decoded = np.frombuffer(decoded, dtype=np.uint8).copy() # tensors are returned writeable
+    if digest_blocks(algo, memoryview(decoded).cast('B')) != original_hash:
+        raise ValueError("Corruption detected! Hash mismatch.")
+    return metadata, decoded
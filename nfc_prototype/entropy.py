@@ -0,0 +1,300 @@
+import heapq
+import math
+import struct
+import numpy as np
+
+# Native entropy stage (header flag ARITHMETIC_CODING_FLAG, compression_stack
+# ["huffman"]): canonical Huffman over byte planes, in pure NumPy. The payload is cut
+# into independent blocks, so blocks are coded on separate threads and every stream
+# chunk is a self-contained record:
+#   [ENTROPY_HEADER][BLOCK_LENGTH]*n [block]*n
+# A block of typesize-byte items is split into typesize byte planes (byte k of every
+# item), each with its own code, so sign/exponent bytes and noisy low mantissa bytes
+# do not share statistics. Each plane is one of:
+#   PLANE_RAW:     [mode][plane bytes]               (coding would not shrink it)
+#   PLANE_RUN:     [mode][symbol]                    (a single repeated byte)
+#   PLANE_BITS:    [mode][symbol 0][symbol 1][one bit per byte, np.packbits]
+#   PLANE_HUFFMAN: [mode][code lengths, 4 bits x 256][LANE_BITS]*lanes [bitstream]
+# Huffman planes are coded as `lanes` interleaved streams: lane j holds symbols j,
+# j + lanes, j + 2 * lanes, ... So the decoder advances every lane of every plane of
+# a block by one symbol per vectorized step, instead of one symbol per Python step.
+ENTROPY_VERSION = 1
+ENTROPY_HEADER = struct.Struct('!BBIQ') # version, typesize (planes per block), block size, payload length
+BLOCK_LENGTH = struct.Struct('!I')
+LANE_BITS = np.dtype('>u2') # bit length of each lane's stream
+DEFAULT_ENTROPY_BLOCK_SIZE = 1024 * 1024
+MAX_CODE_LENGTH = 12 # decode tables have 2^12 entries and fit in L1
+LANE_SYMBOLS = 256 # symbols per lane: 2 bytes of lane lengths per 256 symbols
+PLANE_RAW, PLANE_RUN, PLANE_HUFFMAN, PLANE_BITS = 0, 1, 2, 3
+CODE_LENGTHS_BYTES = 128
+
+
+def code_lengths(counts):
+    # Huffman code length per byte value (0 for absent symbols), at most
+    # MAX_CODE_LENGTH bits: counts are halved until the tree is shallow enough.
+    counts = np.asarray(counts, dtype=np.int64)
+    while True:
+        symbols = np.flatnonzero(counts)
+        lengths = np.zeros(256, dtype=np.uint8)
+        heap = [(int(counts[s]), i, [int(s)]) for i, s in enumerate(symbols)]
+        heapq.heapify(heap)
+        tiebreak = len(heap)
+        while len(heap) > 1:
+            count_a, _, group_a = heapq.heappop(heap)
+            count_b, _, group_b = heapq.heappop(heap)
+            lengths[group_a] += 1
+            lengths[group_b] += 1
+            heapq.heappush(heap, (count_a + count_b, tiebreak, group_a + group_b))
+            tiebreak += 1
+        if lengths.max(initial=0) <= MAX_CODE_LENGTH:
+            return lengths
+        counts = np.where(counts > 0, (counts >> 1) | 1, 0)
+
+
+def canonical_codes(lengths):
+    # Canonical code per symbol: shorter codes first, ties by symbol value
+    codes = np.zeros(256, dtype=np.uint32)
+    code, prev_length = 0, 0
+    for symbol in sorted(np.flatnonzero(lengths), key=lambda s: (lengths[s], s)):
+        code <<= int(lengths[symbol]) - prev_length
+        codes[symbol] = code
+        prev_length = int(lengths[symbol])
+        code += 1
+    return codes
+
+
+def decode_table(lengths):
+    # (symbol, length) for every MAX_CODE_LENGTH-bit window starting with a code
+    codes = canonical_codes(lengths)
+    symbols = np.zeros(1 << MAX_CODE_LENGTH, dtype=np.uint8)
+    table_lengths = np.zeros(1 << MAX_CODE_LENGTH, dtype=np.int64)
+    for symbol in np.flatnonzero(lengths):
+        spare = MAX_CODE_LENGTH - int(lengths[symbol])
+        start = int(codes[symbol]) << spare
+        symbols[start:start + (1 << spare)] = symbol
+        table_lengths[start:start + (1 << spare)] = lengths[symbol]
+    return symbols, table_lengths
+
+
+def lane_layout(n):
+    # (lanes, symbols per lane) for a plane of n bytes
+    lanes = max(math.ceil(n / LANE_SYMBOLS), 1)
+    return lanes, math.ceil(n / lanes)
+
+
+def _pack_lengths(lengths):
+    return ((lengths[0::2] << 4) | lengths[1::2]).astype(np.uint8).tobytes()
+
+
+def _unpack_lengths(raw):
+    packed = np.frombuffer(raw, dtype=np.uint8)
+    lengths = np.empty(256, dtype=np.uint8)
+    lengths[0::2] = packed >> 4
+    lengths[1::2] = packed & 0x0F
+    return lengths
+
+
+def encode_plane(plane):
+    # Codes one byte plane (a uint8 array); returns the plane unit as bytes
+    n = plane.size
+    counts = np.bincount(plane, minlength=256)
+    if n and counts.max() == n:
+        return bytes([PLANE_RUN, int(plane[0])])
+    present = np.flatnonzero(counts)
+    if present.size == 2 and n >= 8:
+        # Two symbols cost a bit each under Huffman too; packbits decodes far faster
+        return bytes([PLANE_BITS, *present.tolist()]) + np.packbits(plane == present[1]).tobytes()
+    lengths = code_lengths(counts)
+    lanes, per_lane = lane_layout(n)
+    estimate = (int((counts * lengths).sum()) + 7) // 8 + CODE_LENGTHS_BYTES + lanes * LANE_BITS.itemsize
+    if n == 0 or estimate >= n:
+        return bytes([PLANE_RAW]) + plane.tobytes()
+
+    # Lane-major symbol order: padded.reshape(per_lane, lanes)[:, j] is lane j
+    padded = np.full(lanes * per_lane, plane[0], dtype=np.uint8)
+    padded[:n] = plane
+    sequence = padded.reshape(per_lane, lanes).T.reshape(-1)
+    codes = canonical_codes(lengths).astype(np.uint64)
+    bit_lengths = lengths.astype(np.int64)[sequence]
+    ends = np.cumsum(bit_lengths)
+    starts = ends - bit_lengths
+    total_bits = int(ends[-1])
+    lane_bits = bit_lengths.reshape(lanes, per_lane).sum(axis=1).astype(LANE_BITS)
+
+    # Codes never overlap, so each 32-bit word is the OR of the codes starting in it
+    # plus the spill of the one before: left-align each code in a 64-bit window at
+    # its start word and reduce per word.
+    word = starts >> 5
+    window = codes[sequence] << (64 - bit_lengths - (starts & 31)).astype(np.uint64)
+    first = np.flatnonzero(np.concatenate(([True], word[1:] != word[:-1])))
+    words = np.zeros(total_bits // 32 + 2, dtype=np.uint64)
+    words[word[first]] = np.bitwise_or.reduceat(window >> np.uint64(32), first)
+    words[word[first] + 1] |= np.bitwise_or.reduceat(window & np.uint64(0xFFFFFFFF), first)
+    stream = words.astype('>u4').tobytes()[:(total_bits + 7) // 8]
+    return b''.join([bytes([PLANE_HUFFMAN]), _pack_lengths(lengths), lane_bits.tobytes(), stream])
+
+
+def _parse_planes(block, typesize, n):
+    # Splits a block into its plane units: (mode, symbol | raw view | (lengths, lane bits, stream))
+    planes = []
+    pos = 0
+    lanes, _ = lane_layout(n)
+    for _ in range(typesize):
+        if pos >= len(block):
+            raise ValueError("Entropy block ends before its last plane")
+        mode = block[pos]
+        pos += 1
+        size = {PLANE_RUN: 1, PLANE_RAW: n, PLANE_BITS: 2 + (n + 7) // 8,
+                PLANE_HUFFMAN: CODE_LENGTHS_BYTES + lanes * LANE_BITS.itemsize}.get(mode, 0)
+        if pos + size > len(block):
+            raise ValueError("Entropy block ends inside a plane")
+        if mode == PLANE_RUN:
+            planes.append((mode, block[pos]))
+            pos += 1
+        elif mode == PLANE_RAW:
+            planes.append((mode, block[pos:pos + n]))
+            pos += n
+        elif mode == PLANE_BITS:
+            planes.append((mode, (block[pos], block[pos + 1], block[pos + 2:pos + 2 + (n + 7) // 8])))
+            pos += 2 + (n + 7) // 8
+        elif mode == PLANE_HUFFMAN:
+            lengths = _unpack_lengths(block[pos:pos + CODE_LENGTHS_BYTES])
+            if lengths.max() > MAX_CODE_LENGTH:
+                raise ValueError(f"Entropy code lengths exceed {MAX_CODE_LENGTH} bits")
+            pos += CODE_LENGTHS_BYTES
+            lane_bits = np.frombuffer(block[pos:pos + lanes * LANE_BITS.itemsize], dtype=LANE_BITS).astype(np.int64)
+            pos += lanes * LANE_BITS.itemsize
+            stream_len = (int(lane_bits.sum()) + 7) // 8
+            planes.append((mode, (lengths, lane_bits, block[pos:pos + stream_len])))
+            pos += stream_len
+        else:
+            raise ValueError(f"Unknown entropy plane mode {mode}")
+    if pos != len(block):
+        raise ValueError("Entropy block length does not match its planes")
+    return planes
+
+
+def _decode_huffman_planes(coded, n, out_planes):
+    # Decodes every Huffman plane of a block together: one vectorized step advances
+    # all lanes of all planes by one symbol. out_planes: (planes, n) uint8 view.
+    lanes, per_lane = lane_layout(n)
+    streams, starts, symbol_tables, length_tables = [], [], [], []
+    offset = 0
+    for lengths, lane_bits, stream in coded:
+        symbols, table_lengths = decode_table(lengths)
+        symbol_tables.append(symbols)
+        length_tables.append(table_lengths)
+        lane_starts = np.cumsum(lane_bits) - lane_bits
+        starts.append(lane_starts + offset * 8)
+        streams.append(stream)
+        offset += len(stream)
+    # 32-bit big-endian window at every byte offset; zero padding covers the tail
+    data = np.frombuffer(b''.join(streams) + bytes(4), dtype=np.uint8).astype(np.uint32)
+    windows = (data[:-3] << 24) | (data[1:-2] << 16) | (data[2:-1] << 8) | data[3:]
+    symbol_table = np.concatenate(symbol_tables)
+    length_table = np.concatenate(length_tables)
+    table_base = np.repeat(np.arange(len(coded), dtype=np.uint32) << MAX_CODE_LENGTH, lanes)
+
+    pos = np.concatenate(starts)
+    ends = pos + np.concatenate([lane_bits for _, lane_bits, _ in coded])
+    decoded = np.empty((per_lane, len(coded), lanes), dtype=np.uint8)
+    window = np.empty(pos.size, dtype=np.uint32)
+    index = np.empty(pos.size, dtype=np.uint32)
+    for step in range(per_lane):
+        np.take(windows, pos >> 3, out=window, mode='clip')
+        np.left_shift(window, (pos & 7).astype(np.uint32), out=index)
+        np.right_shift(index, np.uint32(32 - MAX_CODE_LENGTH), out=index)
+        index |= table_base
+        np.take(symbol_table, index, out=decoded[step].reshape(-1))
+        pos += length_table[index]
+    if not np.array_equal(pos, ends):
+        raise ValueError("Entropy-coded lanes do not end where their lengths say")
+    # decoded[step, plane, lane] is symbol step * lanes + lane of the plane
+    out_planes[:] = decoded.transpose(1, 0, 2).reshape(len(coded), -1)[:, :n]
+
+
+def encode_block(block, typesize):
+    # One block (uint8 array, a multiple of typesize bytes) -> bytes
+    items = block.reshape(-1, typesize)
+    return b''.join(encode_plane(np.ascontiguousarray(items[:, k])) for k in range(typesize))
+
+
+def decode_block(block, typesize, out):
+    # Decodes a block into `out` (writable uint8 array of the block's length)
+    n = out.size // typesize
+    planes = _parse_planes(block, typesize, n)
+    items = out.reshape(n, typesize)
+    huffman = [k for k, (mode, _) in enumerate(planes) if mode == PLANE_HUFFMAN]
+    if huffman:
+        decoded = np.empty((len(huffman), n), dtype=np.uint8)
+        _decode_huffman_planes([planes[k][1] for k in huffman], n, decoded)
+        for plane, k in zip(decoded, huffman):
+            items[:, k] = plane
+    for k, (mode, value) in enumerate(planes):
+        if mode == PLANE_RUN:
+            items[:, k] = value
+        elif mode == PLANE_RAW:
+            items[:, k] = np.frombuffer(value, dtype=np.uint8)
+        elif mode == PLANE_BITS:
+            symbol_0, symbol_1, bits = value
+            bits = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), count=n)
+            bits *= symbol_0 ^ symbol_1
+            bits ^= symbol_0
+            items[:, k] = bits
+    return out
+
+
+def encode(proto, payload, typesize=1, block_size=DEFAULT_ENTROPY_BLOCK_SIZE):
+    # Entropy-codes a flat byte view in independent blocks; returns the payload as a list of parts
+    data = np.frombuffer(payload, dtype=np.uint8)
+    if data.size % typesize:
+        typesize = 1
+    block_size -= block_size % typesize
+    blocks = [data[i:i + block_size] for i in range(0, data.size, block_size)]
+    code = lambda block: encode_block(block, typesize)
+    workers = min(proto.nthreads, len(blocks))
+    coded = list(proto._ordered_map(code, blocks, workers) if workers > 1 else map(code, blocks))
+    header = ENTROPY_HEADER.pack(ENTROPY_VERSION, typesize, block_size, data.size)
+    return [header, b''.join(BLOCK_LENGTH.pack(len(block)) for block in coded)] + coded
+
+
+def decoded_size(payload):
+    return ENTROPY_HEADER.unpack_from(payload)[3]
+
+
+def decode(proto, payload, out_bytes=None, nbytes=None):
+    # Decodes an entropy-coded payload into out_bytes (allocated if None). nbytes is
+    # the decoded size the record's metadata expects, when it gives one.
+    if len(payload) < ENTROPY_HEADER.size:
+        raise ValueError("Entropy-coded payload is too short to hold a header")
+    version, typesize, block_size, size = ENTROPY_HEADER.unpack_from(payload)
+    if version != ENTROPY_VERSION:
+        raise ValueError(f"Entropy stage version mismatch. Expected {ENTROPY_VERSION}, got {version}")
+    if not typesize or not block_size or block_size % typesize or size % typesize:
+        raise ValueError("Invalid entropy stage header")
+    if out_bytes is not None:
+        proto._check_out_size(out_bytes, size)
+    elif nbytes is not None and nbytes != size:
+        raise ValueError(f"Entropy stage header declares {size} bytes, but the record decodes to {nbytes} bytes")
+    n_blocks = -(-size // block_size)
+    table_end = ENTROPY_HEADER.size + n_blocks * BLOCK_LENGTH.size
+    if table_end > len(payload):
+        raise ValueError("Entropy block table exceeds the payload length")
+    lengths = [length for length, in BLOCK_LENGTH.iter_unpack(payload[ENTROPY_HEADER.size:table_end])]
+    offsets = np.cumsum([table_end] + lengths).tolist()
+    if offsets[-1] != len(payload):
+        raise ValueError("Entropy block lengths do not match the payload length")
+    if out_bytes is None:
+        out_bytes = np.empty(size, dtype=np.uint8)
+
+    def decode_one(i):
+        decode_block(payload[offsets[i]:offsets[i + 1]], typesize, out_bytes[i * block_size:(i + 1) * block_size])
+
+    workers = min(proto.nthreads, n_blocks)
+    if workers > 1:
+        for _ in proto._ordered_map(decode_one, range(n_blocks), workers):
+            pass
+    else:
+        for i in range(n_blocks):
+            decode_one(i)
+    return out_bytes
@@ -0,0 +1,233 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from .backends import on_worker
+from .container import blocks_for_range, read_block_index, write_block_index
+from .stats import span
+
+# File-like access to the compress_stream container. NFCWriter turns arbitrary-sized
+# write() calls into the same NFC2 blocks + footer index that compress_stream writes
+# (byte-identical for the same chunk_size), so sockets, pipes or tarfile members can
+# be compressed without a temporary file. NFCReader exposes a container as a
+# seekable raw stream, so it can be wrapped in io.BufferedReader or handed to np.load.
+
+
+def _open(target, mode):
+    # Returns (file object, whether we own it)
+    if isinstance(target, (str, os.PathLike)):
+        return open(target, mode), True
+    return target, False
+
+
+class NFCWriter(io.RawIOBase):
+    """Write-only raw stream that compresses into an NFC container.
+
+    Data is buffered into ``chunk_size`` blocks; each full block is compressed
+    (on ``workers`` threads when > 1) and written in order. ``close()`` flushes
+    the last partial block and appends the block index.
+    """
+
+    def __init__(self, target, proto, chunk_size=1024 * 1024 * 64, workers=1, index=True):
+        super().__init__()
+        self.proto = proto
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.index = index
+        self._fout, self._owns_file = _open(target, 'wb')
+        self._buffer = bytearray(chunk_size)
+        self._filled = 0
+        self._pending = deque()
+        self._pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        # (compressed offset, compressed length, uncompressed offset, uncompressed length) per block
+        self._entries = []
+        self._comp_offset = 0
+        self._uncomp_offset = 0
+        self._written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        if self.closed:
+            raise ValueError("write to closed NFCWriter")
+        data = memoryview(b).cast('B')
+        written = 0
+        while written < len(data):
+            n = min(self.chunk_size - self._filled, len(data) - written)
+            self._buffer[self._filled:self._filled + n] = data[written:written + n]
+            self._filled += n
+            written += n
+            if self._filled == self.chunk_size:
+                self._submit_block()
+        self._written += written
+        return written
+
+    def _submit_block(self):
+        if self._pool is None:
+            # Compressed synchronously, so the buffer can be reused without a copy
+            self._write_block(self.proto._compress_chunk(memoryview(self._buffer)[:self._filled]))
+        else:
+            self._pending.append(self._pool.submit(on_worker(self.proto._compress_chunk), bytes(self._buffer[:self._filled])))
+            if len(self._pending) >= 2 * self.workers:
+                self._write_block(self._pending.popleft().result())
+        self._filled = 0
+
+    def _write_block(self, result):
+        nfc_chunk, orig_size = result
+        with span(self.proto.stats, "compress.write", len(nfc_chunk)):
+            self._fout.write(nfc_chunk)
+        self._entries.append((self._comp_offset, len(nfc_chunk), self._uncomp_offset, orig_size))
+        self._comp_offset += len(nfc_chunk)
+        self._uncomp_offset += orig_size
+
+    def tell(self):
+        # Uncompressed bytes written so far
+        return self._written
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._filled:
+                self._submit_block()
+            while self._pending:
+                self._write_block(self._pending.popleft().result())
+            if self.index:
+                write_block_index(self._fout, self._entries, self._comp_offset)
+            self._fout.flush()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+            if self._owns_file:
+                self._fout.close()
+            super().close()
+
+
+class NFCReader(io.RawIOBase):
+    """Read-only raw stream over an NFC container.
+
+    With a seekable source that has a block index (container v3), ``seek`` jumps
+    straight to the containing block, and ``readinto`` decodes whole blocks directly
+    into the caller's buffer. Without one (pipes, pre-v3 streams) blocks are read
+    sequentially and only ``tell``/forward reading are supported.
+    """
+
+    def __init__(self, source, proto):
+        super().__init__()
+        self.proto = proto
+        self._fin, self._owns_file = _open(source, 'rb')
+        self._entries = read_block_index(self._fin) if self._fin.seekable() else None
+        if self._entries is not None:
+            self._size = self._entries[-1][2] + self._entries[-1][3] if self._entries else 0
+        else:
+            if self._fin.seekable():
+                self._fin.seek(0)
+            self._blocks = proto._iter_stream_blocks(self._fin)
+        self._pos = 0
+        # Last decoded block, kept for reads that don't cover a whole block
+        self._cached = None
+        self._cached_start = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._entries is not None
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if self._entries is None:
+            raise io.UnsupportedOperation("NFCReader needs a seekable source with a block index to seek")
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def _read_record(self, comp_offset, comp_len):
+        self._fin.seek(comp_offset)
+        record = self._fin.read(comp_len)
+        if len(record) != comp_len:
+            raise ValueError("Incomplete NFC block in stream")
+        return record
+
+    def _decode(self, record):
+        decoded = self.proto.decompress(record)
+        if isinstance(decoded, np.ndarray):
+            return decoded.reshape(-1).view(np.uint8)
+        return np.frombuffer(decoded, dtype=np.uint8)
+
+    def _next_sequential_block(self):
+        # Sequential mode: decode the next block in the stream (None at the end)
+        record = next(self._blocks, None)
+        if record is None:
+            return None
+        self._cached_start += 0 if self._cached is None else self._cached.nbytes
+        self._cached = self._decode(record)
+        return self._cached
+
+    def readinto(self, b):
+        out = memoryview(b).cast('B')
+        if self._entries is None:
+            return self._readinto_sequential(out)
+        length = min(len(out), self._size - self._pos)
+        filled = 0
+        for comp_offset, comp_len, uncomp_offset, uncomp_len in blocks_for_range(self._entries, self._pos, length):
+            start = self._pos - uncomp_offset
+            n = min(uncomp_len - start, len(out) - filled)
+            if start == 0 and n == uncomp_len:
+                # The whole block fits: decode straight into the caller's buffer
+                self.proto.decompress_into(self._read_record(comp_offset, comp_len), out[filled:filled + n])
+            else:
+                if self._cached is None or self._cached_start != uncomp_offset:
+                    self._cached = self._decode(self._read_record(comp_offset, comp_len))
+                    self._cached_start = uncomp_offset
+                out[filled:filled + n] = self._cached[start:start + n]
+            filled += n
+            self._pos += n
+        return filled
+
+    def _readinto_sequential(self, out):
+        filled = 0
+        while filled < len(out):
+            block = self._cached
+            if block is None or self._pos >= self._cached_start + block.nbytes:
+                block = self._next_sequential_block()
+                if block is None:
+                    break
+            start = self._pos - self._cached_start
+            n = min(block.nbytes - start, len(out) - filled)
+            out[filled:filled + n] = block[start:start + n]
+            filled += n
+            self._pos += n
+        return filled
+
+    def readall(self):
+        if self._entries is None:
+            return super().readall()
+        out = bytearray(max(self._size - self._pos, 0))
+        n = self.readinto(out)
+        del out[n:]
+        return bytes(out)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._owns_file:
+                self._fin.close()
+        finally:
+            self._cached = None
+            super().close()
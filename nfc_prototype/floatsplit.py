@@ -0,0 +1,187 @@
+import struct
+import blosc
+import numpy as np
+
+from . import entropy
+from .blocks import compress_blocks, decompress_blocks, normalize_block_size
+from .tuner import sample_blocks
+
+# Float split transform (header flag SPLIT_FLAG, compression_stack ["float_split"]).
+# Byte shuffle puts the sign bit in the exponent's lane and splits the exponent
+# across lanes, so a weight tensor's few-bit exponents are diluted. The split rotates
+# every value left by one bit (sign to bit 0) and stores its byte planes, most
+# significant first, as separate streams. The top plane is then the exponent field:
+#   bfloat16, float32: exactly the 8 exponent bits
+#   float16:           5 exponent bits + 3 mantissa bits
+#   float64:           8 of 11 exponent bits (the rest lead the second plane)
+# and the lower planes hold the mantissa, with the sign in the last one. Each stream
+# picks its own coder from trials on a sample (SPLIT_CANDIDATES: a backend codec and
+# level, or the Huffman stage), and is stored raw when none beats RAW_RATIO.
+# The payload is self-describing:
+#   [SPLIT_HEADER][STREAM_ENTRY]*itemsize [stream]*itemsize
+SPLIT_VERSION = 1
+SPLIT_HEADER = struct.Struct('!BBBQ') # version, itemsize (= stream count), big-endian, items
+STREAM_ENTRY = struct.Struct('!BBBQ') # mode, codec index, clevel, length
+STREAM_RAW, STREAM_HUFFMAN, STREAM_BACKEND, STREAM_BLOCKED = 0, 1, 2, 3
+SPLIT_DTYPES = ('float16', 'bfloat16', 'float32', 'float64')
+# (codec, clevel, gain needed over the best so far) trials per stream, cheapest
+# first. 'huffman' is the entropy stage; it decodes several times slower than
+# zstd-1, so it has to save more to be picked.
+SPLIT_CANDIDATES = (('zstd', 1, 0.0), ('huffman', 0, 0.10), ('zstd', 5, 0.03))
+SPLIT_CODECS = ('raw', 'huffman', 'blosclz', 'lz4', 'lz4hc', 'snappy', 'zlib', 'zstd')
+RAW_RATIO = 1.05 # streams compressing worse than this are stored raw
+SAMPLE_BYTES = 64 * 1024
+MERGE_ITEMS = 64 * 1024
+
+
+def supports(dtype):
+    return np.dtype(dtype).name in SPLIT_DTYPES
+
+
+def _uint_dtype(itemsize, big_endian):
+    return np.dtype(f"{'>' if big_endian else '<'}u{itemsize}")
+
+
+def split(values):
+    # values: unsigned integer view of the floats -> (itemsize, n) uint8 planes,
+    # most significant plane of the rotated values first
+    itemsize = values.dtype.itemsize
+    values = values.astype(values.dtype.newbyteorder('<'), copy=False)
+    rotated = (values << 1) | (values >> (itemsize * 8 - 1))
+    lanes = rotated.view(np.uint8).reshape(-1, itemsize)
+    planes = np.empty((itemsize, values.size), dtype=np.uint8)
+    for k in range(itemsize):
+        planes[k] = lanes[:, itemsize - 1 - k]
+    return planes
+
+
+def merge(planes, out_values):
+    # Inverse of split (planes: a sequence of itemsize uint8 arrays), written into
+    # out_values. Runs in MERGE_ITEMS chunks so each is interleaved and rotated while
+    # it is still in cache; little-endian outputs are rebuilt in place.
+    itemsize = out_values.dtype.itemsize
+    native = out_values.dtype.byteorder == '<' or (out_values.dtype.byteorder == '=' and np.little_endian)
+    scratch = np.empty(min(out_values.size, MERGE_ITEMS), dtype=out_values.dtype.newbyteorder('<'))
+    sign = np.empty_like(scratch)
+    for start in range(0, out_values.size, MERGE_ITEMS):
+        stop = min(start + MERGE_ITEMS, out_values.size)
+        rotated = out_values[start:stop] if native else scratch[:stop - start]
+        lanes = rotated.view(np.uint8).reshape(-1, itemsize)
+        for k in range(itemsize):
+            lanes[:, itemsize - 1 - k] = planes[k][start:stop]
+        chunk_sign = sign[:stop - start]
+        np.left_shift(rotated, itemsize * 8 - 1, out=chunk_sign)
+        rotated >>= 1
+        rotated |= chunk_sign
+        if not native:
+            out_values[start:stop] = rotated
+
+
+def _encode_stream(proto, backend, stream, codec, clevel):
+    # -> (mode, parts)
+    data = memoryview(stream.reshape(-1).view(np.uint8))
+    typesize = stream.dtype.itemsize
+    if codec == 'huffman':
+        return STREAM_HUFFMAN, entropy.encode(proto, data, typesize, min(proto.block_size, entropy.DEFAULT_ENTROPY_BLOCK_SIZE))
+    args = dict(cname=codec, clevel=clevel, shuffle=blosc.SHUFFLE if typesize > 1 else blosc.NOSHUFFLE, typesize=typesize)
+    if len(data) > proto.block_size:
+        return STREAM_BLOCKED, compress_blocks(proto, data, normalize_block_size(proto.block_size, typesize), backend, **args)
+    return STREAM_BACKEND, [backend.compress(data, nthreads=proto.codec_threads, **args)]
+
+
+def choose_coder(proto, backend, stream, candidates=SPLIT_CANDIDATES):
+    # (codec, clevel) for a stream from trials on sampled slices, or None to store it raw
+    samples = sample_blocks(stream, n_samples=3, sample_bytes=SAMPLE_BYTES)
+    sample = samples[0] if len(samples) == 1 else np.concatenate(samples)
+    if sample.nbytes == 0:
+        return None
+    best, best_size = None, sample.nbytes / RAW_RATIO
+    for codec, clevel, gain in candidates:
+        _, parts = _encode_stream(proto, backend, sample, codec, clevel)
+        size = sum(map(len, parts))
+        if size < best_size * (1 - gain if best is not None else 1):
+            best, best_size = (codec, clevel), size
+    return best
+
+
+def encode(proto, payload, dtype, backend):
+    # Splits a flat byte view of `dtype` floats; returns the payload as a list of parts
+    dtype = np.dtype(dtype)
+    big_endian = dtype.byteorder == '>' or (dtype.byteorder == '=' and not np.little_endian)
+    values = np.frombuffer(payload, dtype=_uint_dtype(dtype.itemsize, big_endian))
+    entries, parts = [], []
+    for stream in split(values):
+        choice = choose_coder(proto, backend, stream)
+        if choice is None:
+            mode, (codec, clevel), stream_parts = STREAM_RAW, ('raw', 0), [memoryview(stream)]
+        else:
+            codec, clevel = choice
+            mode, stream_parts = _encode_stream(proto, backend, stream, codec, clevel)
+        entries.append(STREAM_ENTRY.pack(mode, SPLIT_CODECS.index(codec), clevel, sum(map(len, stream_parts))))
+        parts.extend(stream_parts)
+    return [SPLIT_HEADER.pack(SPLIT_VERSION, dtype.itemsize, big_endian, values.size), *entries, *parts]
+
+
+def stream_coders(payload):
+    # [(mode, codec, clevel, length)] per stream, for inspection
+    itemsize = SPLIT_HEADER.unpack_from(payload)[1]
+    table = payload[SPLIT_HEADER.size:SPLIT_HEADER.size + itemsize * STREAM_ENTRY.size]
+    if len(table) != itemsize * STREAM_ENTRY.size:
+        raise ValueError("Float split stream table exceeds the payload length")
+    coders = []
+    for mode, codec, clevel, length in STREAM_ENTRY.iter_unpack(table):
+        if codec >= len(SPLIT_CODECS):
+            raise ValueError(f"Unknown float split stream codec {codec}")
+        coders.append((mode, SPLIT_CODECS[codec], clevel, length))
+    return coders
+
+
+def decode(proto, payload, backend, out_bytes=None, nbytes=None):
+    # Decodes a split payload into out_bytes (allocated if None). nbytes is the
+    # decoded size the record's metadata expects, when it gives one.
+    if len(payload) < SPLIT_HEADER.size:
+        raise ValueError("Float split payload is too short to hold a header")
+    version, itemsize, big_endian, n = SPLIT_HEADER.unpack_from(payload)
+    if version != SPLIT_VERSION:
+        raise ValueError(f"Float split version mismatch. Expected {SPLIT_VERSION}, got {version}")
+    if itemsize not in (2, 4, 8):
+        raise ValueError("Invalid float split header")
+    if out_bytes is not None:
+        proto._check_out_size(out_bytes, n * itemsize)
+    elif nbytes is not None and nbytes != n * itemsize:
+        raise ValueError(f"Float split header declares {n * itemsize} bytes, but the record decodes to {nbytes} bytes")
+
+    streams = []
+    offset = SPLIT_HEADER.size + itemsize * STREAM_ENTRY.size
+    for mode, _, _, length in stream_coders(payload):
+        stream = payload[offset:offset + length]
+        if len(stream) != length:
+            raise ValueError("Float split stream exceeds payload length")
+        if mode not in (STREAM_RAW, STREAM_HUFFMAN, STREAM_BACKEND, STREAM_BLOCKED):
+            raise ValueError(f"Unknown float split stream mode {mode}")
+        if mode == STREAM_RAW and length != n:
+            raise ValueError(f"Raw float split stream holds {length} bytes, expected {n}")
+        streams.append((mode, stream))
+        offset += length
+    if offset != len(payload):
+        raise ValueError("Float split stream lengths do not match the payload length")
+    if out_bytes is None:
+        out_bytes = np.empty(n * itemsize, dtype=np.uint8)
+
+    planes = []
+    for mode, stream in streams:
+        if mode == STREAM_RAW:
+            planes.append(np.frombuffer(stream, dtype=np.uint8)) # merged straight from the record
+            continue
+        plane = np.empty(n, dtype=np.uint8)
+        if mode == STREAM_HUFFMAN:
+            entropy.decode(proto, stream, plane)
+        elif mode == STREAM_BLOCKED:
+            decompress_blocks(proto, stream, plane, backend)
+        else:
+            proto._check_out_size(plane, backend.decoded_size(stream))
+            if n:
+                backend.decompress_into(stream, plane, proto.codec_threads)
+        planes.append(plane)
+    merge(planes, out_bytes.view(_uint_dtype(itemsize, big_endian)))
+    return out_bytes
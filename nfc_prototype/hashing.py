@@ -0,0 +1,76 @@
+import hashlib
+import math
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import crc32c
+except ImportError:
+    crc32c = None
+
+# Integrity hashes selectable per record. The id is stored in header byte 6, which
+# was reserved (always 0) before v0.5, so older records read back as sha256.
+# name -> (id, digest size, digest function or None if the dependency is missing)
+HASH_ALGORITHMS = {
+    'sha256': (0, 32, lambda data: hashlib.sha256(data).digest()),
+    'blake2b': (1, 32, lambda data: hashlib.blake2b(data, digest_size=32).digest()),
+    'xxh3_64': (2, 8, xxhash.xxh3_64_digest if xxhash else None),
+    'xxh128': (3, 16, xxhash.xxh3_128_digest if xxhash else None),
+    'crc32c': (4, 4, (lambda data: crc32c.crc32c(data).to_bytes(4, 'big')) if crc32c else None),
+    'crc32': (5, 4, lambda data: zlib.crc32(data).to_bytes(4, 'big')),
+}
+HASH_NAMES = {algo_id: name for name, (algo_id, _, _) in HASH_ALGORITHMS.items()}
+_DEPENDENCIES = {'xxh3_64': 'xxhash', 'xxh128': 'xxhash', 'crc32c': 'crc32c'}
+
+DEFAULT_HASH_BLOCK_SIZE = 1024 * 1024 * 4
+MAX_HASH_BYTES = 0xFFFF # hash_len is a 2-byte header field
+
+
+def available_hashes():
+    return [name for name, (_, _, fn) in HASH_ALGORITHMS.items() if fn is not None]
+
+
+def hash_id(name):
+    if name not in HASH_ALGORITHMS:
+        raise ValueError(f"Unknown hash algorithm '{name}'. Expected one of {list(HASH_ALGORITHMS)}")
+    return HASH_ALGORITHMS[name][0]
+
+
+def hash_name(algo_id):
+    if algo_id not in HASH_NAMES:
+        raise ValueError(f"Unknown hash algorithm id {algo_id}")
+    return HASH_NAMES[algo_id]
+
+
+def _digest_fn(name):
+    hash_id(name)
+    fn = HASH_ALGORITHMS[name][2]
+    if fn is None:
+        raise RuntimeError(f"Hash algorithm '{name}' requires the '{_DEPENDENCIES[name]}' package, which is not installed.")
+    return fn
+
+
+def hash_block_size_for(nbytes, name, block_size=DEFAULT_HASH_BLOCK_SIZE):
+    # Grow the block size when needed so the concatenated digests fit in hash_len.
+    max_blocks = MAX_HASH_BYTES // HASH_ALGORITHMS[name][1]
+    return max(block_size, math.ceil(nbytes / max_blocks))
+
+
+def digest_blocks(name, data, block_size=None, workers=1):
+    # Concatenated digests of consecutive block_size slices of `data` (a flat byte
+    # memoryview). block_size=None hashes the whole payload as one block, which is
+    # how records written before per-block checksums were hashed.
+    digest = _digest_fn(name)
+    if not block_size:
+        return digest(data)
+    blocks = [data[i:i + block_size] for i in range(0, len(data), block_size)] or [data]
+    if workers > 1 and len(blocks) > 1:
+        # hashlib, zlib, xxhash and crc32c all release the GIL on large buffers
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return b''.join(pool.map(digest, blocks))
+    return b''.join(map(digest, blocks))
@@ -0,0 +1,242 @@
+import json
+import struct
+from functools import lru_cache
+import numpy as np
+
+from .reference import REFERENCE_MODES
+
+# Binary record metadata (header flag BINARY_METADATA_FLAG). JSON metadata costs about
+# 300 bytes per record and a json.loads + np.dtype parse per block; the binary form
+# is a few bytes, and identical metadata (every block of a stream) is decoded once
+# and then served from a cache:
+#   [version u8][kind u8: 0 bytes, 1 tensor]
+#   tensor: [dtype code u8 (0xFF: varint len + name)][byte order u8][ndim varint][dim varint]*
+#   [hash_block_size varint][stack u8][codec u8, only for blosc/blosc2 stacks]
+#   optional fields until the end, each [tag u8][value]:
+#     predictor:   [predictor code u8 (0xFF: varint len + name)][varint len + params JSON]
+#     block_size:  [varint]
+#     auto_tuned:  [codec u8][clevel u8][shuffle u8][predictor code][sample_ratio f64]
+#     reference:   [id 32 bytes][mode u8][offset varint]
+# decode_metadata returns the same dict the JSON form held, minus the constant
+# fields (schema_version, orig_bytes, created_by, created_at).
+BINARY_METADATA_VERSION = 1
+DTYPE_CODES = ('bool', 'int8', 'int16', 'int32', 'int64', 'uint8', 'uint16', 'uint32', 'uint64',
+               'float16', 'float32', 'float64', 'complex64', 'complex128') # code = index + 1
+BYTE_ORDERS = ('=', '<', '>', '|')
+CODECS = ('blosclz', 'lz4', 'lz4hc', 'snappy', 'zlib', 'zstd')
+STACKS = (('stored',), ('blosc',), ('arithmetic', 'blosc'), ('blosc2',), ('arithmetic', 'blosc2'),
+          ('zstd',), ('arithmetic', 'zstd'), ('lz4',), ('arithmetic', 'lz4'), ('huffman',),
+          ('float_split',), ('sparse', 'blosc'), ('sparse', 'blosc2'), ('sparse', 'zstd'), ('sparse', 'lz4'),
+          ('bitpack', 'blosc'), ('bitpack', 'blosc2'), ('bitpack', 'zstd'), ('bitpack', 'lz4'))
+CODEC_BACKENDS = ('blosc', 'blosc2') # the codec byte completes '<backend>_<codec>'
+PREDICTOR_CODES = (None, 'modular_delta', 'axis_delta', 'lorenzo', 'stride_delta', 'xor', 'delta_encoding')
+NAMED = 0xFF # followed by a varint-prefixed UTF-8 name
+TAG_PREDICTOR = 1
+TAG_BLOCK_SIZE = 2
+TAG_AUTO_TUNED = 3
+TAG_REFERENCE = 4
+SAMPLE_RATIO = struct.Struct('!d')
+
+# Keys encode_metadata understands; anything else keeps the record in JSON
+_CONSTANT_KEYS = {"schema_version", "orig_bytes", "created_by", "created_at"}
+_KNOWN_KEYS = _CONSTANT_KEYS | {"format_hint", "dtype", "endianness", "shape", "hash_block_size", "compression_stack",
+                                "prediction_model", "prediction_params", "block_size", "auto_tuned", "reference"}
+_AUTO_TUNED_KEYS = {"codec", "clevel", "shuffle", "predictor", "sample_ratio"}
+
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(raw, pos):
+    n = shift = 0
+    while True:
+        if pos >= len(raw):
+            raise ValueError("Invalid binary metadata: truncated varint")
+        byte = raw[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return n, pos
+        shift += 7
+
+
+def _code(table, value):
+    # Index of value in table, or NAMED followed by the name
+    if value in table:
+        return bytes([table.index(value)])
+    name = value.encode('utf-8')
+    return bytes([NAMED]) + _varint(len(name)) + name
+
+
+def _read_code(table, raw, pos):
+    code = raw[pos]
+    pos += 1
+    if code != NAMED:
+        if code >= len(table):
+            raise ValueError(f"Unknown code {code} in binary metadata")
+        return table[code], pos
+    length, pos = _read_varint(raw, pos)
+    return raw[pos:pos + length].decode('utf-8'), pos + length
+
+
+def _read_enum(table, raw, pos, field):
+    code = raw[pos]
+    if code >= len(table):
+        raise ValueError(f"Invalid binary metadata: unknown {field} code {code}")
+    return table[code]
+
+
+def _stack(compression_stack):
+    # (stack code, codec) for ["stored"], ["blosc_zstd"], ["arithmetic", "blosc2_lz4"], ["zstd"], ["huffman"], ["float_split"], ...
+    # (None, None) if the stack has no binary code
+    if not compression_stack:
+        return None, None
+    *head, last = compression_stack
+    backend, _, codec = last.partition("_")
+    if backend not in CODEC_BACKENDS:
+        backend, codec = last, ""
+    stack = tuple(head) + (backend,)
+    if stack not in STACKS or (backend in CODEC_BACKENDS) != bool(codec):
+        return None, None
+    return STACKS.index(stack), codec or None
+
+
+def encode_metadata(metadata):
+    # Binary form of a record's metadata dict, or None if it holds anything the
+    # binary form cannot express (the record is then written as JSON).
+    if not _KNOWN_KEYS.issuperset(metadata):
+        return None
+    stack, codec = _stack(metadata.get("compression_stack", []))
+    if stack is None or (codec is not None and codec not in CODECS):
+        return None
+    out = bytearray([BINARY_METADATA_VERSION])
+    if metadata.get("format_hint") == "numpy_tensor":
+        out.append(1)
+        out += _code((None,) + DTYPE_CODES, metadata["dtype"])
+        if metadata["endianness"] not in BYTE_ORDERS:
+            return None
+        out.append(BYTE_ORDERS.index(metadata["endianness"]))
+        out += _varint(len(metadata["shape"]))
+        for dim in metadata["shape"]:
+            out += _varint(dim)
+    elif metadata.get("format_hint") == "bytes":
+        out.append(0)
+    else:
+        return None
+    out += _varint(metadata.get("hash_block_size") or 0)
+    out.append(stack)
+    if codec is not None:
+        out.append(CODECS.index(codec))
+
+    if "prediction_model" in metadata:
+        params = metadata.get("prediction_params")
+        params = json.dumps(params, separators=(',', ':')).encode('utf-8') if params else b''
+        out.append(TAG_PREDICTOR)
+        out += _code(PREDICTOR_CODES, metadata["prediction_model"]) + _varint(len(params)) + params
+    if "block_size" in metadata:
+        out.append(TAG_BLOCK_SIZE)
+        out += _varint(metadata["block_size"])
+    if "auto_tuned" in metadata:
+        tuned = metadata["auto_tuned"]
+        if set(tuned) != _AUTO_TUNED_KEYS or tuned["codec"] not in CODECS:
+            return None
+        out.append(TAG_AUTO_TUNED)
+        out += bytes([CODECS.index(tuned["codec"]), tuned["clevel"], tuned["shuffle"]])
+        out += _code(PREDICTOR_CODES, tuned["predictor"]) + SAMPLE_RATIO.pack(tuned["sample_ratio"])
+    if "reference" in metadata:
+        reference = metadata["reference"]
+        if len(reference["id"]) != 64:
+            return None
+        out.append(TAG_REFERENCE)
+        out += bytes.fromhex(reference["id"]) + bytes([REFERENCE_MODES.index(reference["mode"])])
+        out += _varint(reference.get("offset", 0))
+    return bytes(out)
+
+
+@lru_cache(maxsize=256)
+def decode_metadata(raw):
+    # Cached on the raw bytes: the dict is shared between records and must not be mutated.
+    # Truncated metadata surfaces as ValueError, like every other malformed field.
+    try:
+        return _decode_metadata(raw)
+    except (IndexError, struct.error) as exc:
+        raise ValueError(f"Invalid binary metadata: truncated field ({exc})") from None
+
+
+def _decode_metadata(raw):
+    if not raw or raw[0] != BINARY_METADATA_VERSION:
+        raise ValueError(f"Unsupported binary metadata version {raw[0] if raw else None}")
+    kind = raw[1]
+    pos = 2
+    if kind == 1:
+        dtype, pos = _read_code((None,) + DTYPE_CODES, raw, pos)
+        if dtype is None:
+            raise ValueError("Invalid binary metadata: missing dtype")
+        endianness = _read_enum(BYTE_ORDERS, raw, pos, "byte order")
+        ndim, pos = _read_varint(raw, pos + 1)
+        shape = []
+        for _ in range(ndim):
+            dim, pos = _read_varint(raw, pos)
+            shape.append(dim)
+        metadata = {"dtype": dtype, "endianness": endianness, "shape": shape, "format_hint": "numpy_tensor"}
+    elif kind == 0:
+        metadata = {"format_hint": "bytes"}
+    else:
+        raise ValueError(f"Unknown record kind {kind} in binary metadata")
+    hash_block_size, pos = _read_varint(raw, pos)
+    if hash_block_size:
+        metadata["hash_block_size"] = hash_block_size
+    stack = list(_read_enum(STACKS, raw, pos, "compression stack"))
+    pos += 1
+    if stack[-1] in CODEC_BACKENDS:
+        stack[-1] = f"{stack[-1]}_{_read_enum(CODECS, raw, pos, 'codec')}"
+        pos += 1
+    metadata["compression_stack"] = stack
+
+    while pos < len(raw):
+        tag = raw[pos]
+        pos += 1
+        if tag == TAG_PREDICTOR:
+            metadata["prediction_model"], pos = _read_code(PREDICTOR_CODES, raw, pos)
+            length, pos = _read_varint(raw, pos)
+            if length:
+                metadata["prediction_params"] = json.loads(raw[pos:pos + length])
+            pos += length
+        elif tag == TAG_BLOCK_SIZE:
+            metadata["block_size"], pos = _read_varint(raw, pos)
+        elif tag == TAG_AUTO_TUNED:
+            codec, clevel, shuffle = _read_enum(CODECS, raw, pos, "codec"), raw[pos + 1], raw[pos + 2]
+            predictor, pos = _read_code(PREDICTOR_CODES, raw, pos + 3)
+            sample_ratio, = SAMPLE_RATIO.unpack_from(raw, pos)
+            pos += SAMPLE_RATIO.size
+            metadata["auto_tuned"] = {"codec": codec, "clevel": clevel, "shuffle": shuffle,
+                                      "predictor": predictor, "sample_ratio": sample_ratio}
+        elif tag == TAG_REFERENCE:
+            reference = {"id": raw[pos:pos + 32].hex(), "mode": _read_enum(REFERENCE_MODES, raw, pos + 32, "reference mode")}
+            offset, pos = _read_varint(raw, pos + 33)
+            if offset:
+                reference["offset"] = offset
+            metadata["reference"] = reference
+        else:
+            raise ValueError(f"Unknown field tag {tag} in binary metadata")
+    if pos != len(raw):
+        raise ValueError("Binary metadata field exceeds its length")
+    return metadata
+
+
+@lru_cache(maxsize=256)
+def tensor_dtype(name, endianness=None):
+    # np.dtype for a record's dtype name and byte order, parsed once per combination
+    dtype = np.dtype(name)
+    if endianness and dtype.byteorder != endianness:
+        dtype = dtype.newbyteorder(endianness)
+    return dtype
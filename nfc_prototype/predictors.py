@@ -0,0 +1,171 @@
+import numpy as np
+
+# Lossless predictors. Every predictor works on the raw bits of the tensor reinterpreted
+# as same-width unsigned integers, so residuals never widen the payload and arithmetic
+# wraps modulo 2**bits. That makes decode(encode(x)) bit-exact for every dtype,
+# floats included.
+#
+# Each predictor is a pair of vectorized functions registered under a name:
+#   encode(values, **params) -> residuals (new array, same shape and dtype)
+#   decode(residuals, **params) -> residuals, overwritten in place with the values
+# The name and params are recorded in the record metadata, so decompress dispatches
+# without any configuration.
+SUPPORTED_ITEMSIZES = (1, 2, 4, 8)
+PREDICTORS = {}
+
+
+def register_predictor(name, encode, decode):
+    PREDICTORS[name] = (encode, decode)
+
+
+def supports(dtype):
+    return dtype.itemsize in SUPPORTED_ITEMSIZES and not dtype.hasobject
+
+
+def as_uint(data):
+    # Flat same-width unsigned view of an ndarray (copies only if non-contiguous).
+    return np.ascontiguousarray(data).reshape(-1).view(f'u{data.dtype.itemsize}')
+
+
+def _lag_slices(ndim, axis, lag=1):
+    head = [slice(None)] * ndim
+    tail = [slice(None)] * ndim
+    head[axis] = slice(lag, None)
+    tail[axis] = slice(None, -lag)
+    return tuple(head), tuple(tail)
+
+
+def axis_delta_encode(values, axis=0):
+    residuals = values.copy()
+    if values.shape[axis] > 1:
+        head, tail = _lag_slices(values.ndim, axis)
+        np.subtract(values[head], values[tail], out=residuals[head])
+    return residuals
+
+
+def axis_delta_decode(residuals, axis=0):
+    # In-place prefix sum; unsigned accumulation wraps exactly like the encoder's subtraction.
+    if residuals.size:
+        np.add.accumulate(residuals, axis=axis, out=residuals)
+    return residuals
+
+
+def modular_delta_encode(values):
+    return axis_delta_encode(values.reshape(-1), axis=0)
+
+
+def modular_delta_decode(residuals):
+    return axis_delta_decode(residuals.reshape(-1), axis=0)
+
+
+def lorenzo_encode(values, axes=None):
+    # The N-d Lorenzo predictor (2-D: x[i-1,j] + x[i,j-1] - x[i-1,j-1]) is the
+    # composition of first differences along every axis.
+    residuals = values.copy()
+    for axis in (range(values.ndim) if axes is None else axes):
+        if residuals.shape[axis] > 1:
+            head, tail = _lag_slices(residuals.ndim, axis)
+            # numpy buffers overlapping operands, so this differences the pre-update values
+            np.subtract(residuals[head], residuals[tail], out=residuals[head])
+    return residuals
+
+
+def lorenzo_decode(residuals, axes=None):
+    for axis in (range(residuals.ndim) if axes is None else axes):
+        axis_delta_decode(residuals, axis)
+    return residuals
+
+
+def stride_delta_encode(values, stride=1):
+    # Delta against the value `stride` elements earlier in flat order, e.g. the same
+    # channel of the previous sample for interleaved data.
+    flat = values.reshape(-1)
+    residuals = flat.copy()
+    if flat.size > stride:
+        np.subtract(flat[stride:], flat[:-stride], out=residuals[stride:])
+    return residuals.reshape(values.shape)
+
+
+def stride_delta_decode(residuals, stride=1):
+    flat = residuals.reshape(-1)
+    rows = flat.size // stride
+    # Whole rows of `stride` values decode as one column-wise prefix sum ...
+    if rows:
+        body = flat[:rows * stride].reshape(rows, stride)
+        np.add.accumulate(body, axis=0, out=body)
+    # ... and the ragged tail only depends on the last whole row.
+    tail = flat.size - rows * stride
+    if rows and tail:
+        flat[rows * stride:] += flat[(rows - 1) * stride:(rows - 1) * stride + tail]
+    return residuals
+
+
+def xor_encode(values):
+    # Previous-value XOR: neighbouring floats share sign/exponent/high mantissa bits,
+    # which XOR to zero.
+    flat = values.reshape(-1)
+    residuals = flat.copy()
+    if flat.size > 1:
+        np.bitwise_xor(flat[1:], flat[:-1], out=residuals[1:])
+    return residuals.reshape(values.shape)
+
+
+def xor_decode(residuals):
+    flat = residuals.reshape(-1)
+    if flat.size:
+        np.bitwise_xor.accumulate(flat, out=flat)
+    return residuals
+
+
+register_predictor("modular_delta", modular_delta_encode, modular_delta_decode)
+register_predictor("axis_delta", axis_delta_encode, axis_delta_decode)
+register_predictor("lorenzo", lorenzo_encode, lorenzo_decode)
+register_predictor("stride_delta", stride_delta_encode, stride_delta_decode)
+register_predictor("xor", xor_encode, xor_decode)
+
+
+def _normalize_axis(axis, ndim):
+    axis = int(axis)
+    if not -ndim <= axis < ndim:
+        raise ValueError(f"Axis {axis} is out of bounds for a tensor of rank {ndim}")
+    return axis % ndim
+
+
+def normalize_params(name, shape, params=None):
+    # Validates params against the tensor and returns the JSON-friendly form stored
+    # in metadata (negative axes resolved, defaults filled in).
+    if name not in PREDICTORS:
+        raise ValueError(f"Unknown prediction model '{name}'. Expected one of {list(PREDICTORS)}")
+    params = dict(params or {})
+    ndim = max(len(shape), 1)
+    if name == "axis_delta":
+        params["axis"] = _normalize_axis(params.get("axis", 0), ndim)
+    elif name == "lorenzo":
+        axes = params.get("axes")
+        axes = range(ndim) if axes is None else axes
+        params["axes"] = [_normalize_axis(a, ndim) for a in axes]
+    elif name == "stride_delta":
+        params["stride"] = int(params.get("stride", 1))
+        if params["stride"] < 1:
+            raise ValueError("stride_delta needs stride >= 1")
+    elif params:
+        raise ValueError(f"Prediction model '{name}' takes no parameters, got {params}")
+    return params
+
+
+def predict(name, data, params=None):
+    encode, _ = PREDICTORS[name]
+    params = normalize_params(name, data.shape, params)
+    return encode(as_uint(data).reshape(data.shape or (1,)), **params)
+
+
+def reconstruct(name, payload, itemsize, shape=None, params=None):
+    # `payload` is the writable uint8 buffer holding the residuals; it is overwritten
+    # with the original bytes.
+    if name not in PREDICTORS:
+        raise ValueError(f"Unknown prediction model '{name}'")
+    _, decode = PREDICTORS[name]
+    residuals = payload.view(f'u{itemsize}')
+    if shape is not None:
+        residuals = residuals.reshape(tuple(shape) or (1,))
+    return decode(residuals, **(params or {}))
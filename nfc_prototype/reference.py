@@ -0,0 +1,146 @@
+import mmap
+import os
+from collections.abc import Mapping
+import numpy as np
+
+from .hashing import digest_blocks
+from . import predictors
+
+# Reference-based delta encoding. A fine-tuned tensor differs from its base only
+# slightly, so compress(data, reference=base) stores the bitwise XOR ("xor") or the
+# same-width modular difference ("sub") against the base, and the mostly-zero
+# residual then goes through the usual probe/predict/blosc stack. Records name their
+# reference by the SHA-256 of its bytes:
+#   metadata["reference"] = {"id": <hex>, "mode": "xor" | "sub", "offset": <stream blocks only>}
+# Decoding finds the reference through a resolver (see resolve). The record checksum
+# still covers the original bytes, so a wrong reference fails as a hash mismatch.
+REFERENCE_ALGO = 'sha256'
+REFERENCE_MODES = ('xor', 'sub')
+
+
+def _byte_view(data):
+    if isinstance(data, np.ndarray):
+        return memoryview(np.ascontiguousarray(data).reshape(-1).view(np.uint8))
+    view = memoryview(data)
+    if not view.c_contiguous:
+        view = memoryview(view.tobytes())
+    return view.cast('B') if view.format != 'B' or view.ndim != 1 else view
+
+
+def reference_id(data):
+    return digest_blocks(REFERENCE_ALGO, _byte_view(data)).hex()
+
+
+class Reference:
+    """A base tensor, buffer or file that records are delta-encoded against.
+
+    Paths are memory-mapped. The id (SHA-256 of the bytes) is computed on first use
+    and cached, so one Reference can serve many compress calls.
+    """
+
+    def __init__(self, data, ref_id=None, offset=0):
+        self._mmap = None
+        if isinstance(data, (str, os.PathLike)):
+            with open(data, 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            data = self._mmap if self._mmap is not None else b''
+        self.view = _byte_view(data)
+        self.offset = offset # where this view starts inside the identified reference
+        self._id = ref_id
+
+    @property
+    def id(self):
+        if self._id is None:
+            self._id = reference_id(self.view)
+        return self._id
+
+    @property
+    def nbytes(self):
+        return self.view.nbytes
+
+    def at(self, offset, nbytes):
+        # The slice [offset, offset + nbytes) of this reference, keeping its id
+        return Reference(self.view[offset:offset + nbytes], self.id, self.offset + offset)
+
+    def info(self, mode):
+        info = {"id": self.id, "mode": mode}
+        if self.offset:
+            info["offset"] = self.offset
+        return info
+
+    def close(self):
+        self.view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def as_reference(reference):
+    return reference if isinstance(reference, Reference) else Reference(reference)
+
+
+def check_mode(mode, dtype=None):
+    if mode not in REFERENCE_MODES:
+        raise ValueError(f"Unknown reference mode '{mode}'. Expected one of {list(REFERENCE_MODES)}")
+    if mode == 'sub' and dtype is not None and not predictors.supports(dtype):
+        raise ValueError(f"Reference mode 'sub' needs an itemsize in {predictors.SUPPORTED_ITEMSIZES}, got dtype {dtype}")
+
+
+def _lane_dtype(mode, itemsize):
+    # XOR is bitwise, so any lane width works; subtraction wraps per element
+    return np.dtype(f'u{itemsize}') if mode == 'sub' else np.uint8
+
+
+def encode_residual(values, reference, mode, itemsize=1):
+    # New uint8 array holding values XOR/minus reference (flat byte views of equal size)
+    lanes = _lane_dtype(mode, itemsize)
+    a = np.frombuffer(values, dtype=lanes)
+    b = np.frombuffer(reference, dtype=lanes)
+    residual = np.bitwise_xor(a, b) if mode == 'xor' else np.subtract(a, b)
+    return residual.view(np.uint8)
+
+
+def decode_residual(residual, reference, mode, itemsize=1):
+    # In place over the decoded residual (a writable uint8 array)
+    lanes = _lane_dtype(mode, itemsize)
+    out = residual.view(lanes)
+    b = np.frombuffer(reference, dtype=lanes)
+    if mode == 'xor':
+        np.bitwise_xor(out, b, out=out)
+    else:
+        np.add(out, b, out=out)
+    return residual
+
+
+def resolve(references, info, nbytes):
+    # Returns the reference bytes a record was encoded against. `references` is a
+    # Reference, a mapping id -> buffer, a callable id -> buffer, or a bare buffer
+    # (used as is; the record checksum verifies the result).
+    ref_id = info["id"]
+    if references is None:
+        raise ValueError(f"Record is delta-encoded against reference {ref_id}. Pass reference=... "
+                         "(a Reference, a mapping from id to buffer, or a resolver callable).")
+    if isinstance(references, Reference):
+        if references.id != ref_id:
+            raise ValueError(f"Record needs reference {ref_id}, but the given reference is {references.id}")
+        found = references
+    elif isinstance(references, Mapping):
+        found = references.get(ref_id)
+    elif callable(references):
+        found = references(ref_id)
+    else:
+        found = references
+    if found is None:
+        raise ValueError(f"Reference {ref_id} could not be resolved")
+    view = found.view if isinstance(found, Reference) else _byte_view(found)
+    offset = info.get("offset", 0)
+    if offset + nbytes > view.nbytes:
+        raise ValueError(f"Reference {ref_id} holds {view.nbytes} bytes; the record needs bytes [{offset}, {offset + nbytes})")
+    return view[offset:offset + nbytes]
@@ -0,0 +1,171 @@
+import struct
+import numpy as np
+
+from .blocks import compress_blocks, decompress_blocks, normalize_block_size
+from .hashing import HASH_ALGORITHMS, digest_blocks, hash_name
+from .tuner import sample_blocks
+
+# Sparse tensor encoding (header flag SPARSE_FLAG, compression_stack
+# ["sparse", "<backend>_<codec>"]). Pruned weights and reference residuals are mostly
+# zeros; instead of compressing the dense bytes, only the positions of the nonzero
+# values and the values themselves go through the backend:
+#   [SPARSE_HEADER][digests][positions stream][values stream]
+# Positions are a bitmap (1 bit per value, np.packbits) above BITMAP_DENSITY, else
+# the gaps between consecutive nonzero indices (uint32, or uint64 for > 4G values),
+# so very sparse tensors cost O(nnz) to encode, store and decode. Both streams are
+# blocked backend payloads (see blocks.py). "Zero" is bitwise: -0.0 is kept as a value.
+# The digests cover the raw position and value streams, so decompress(sparse=True)
+# can verify the sparse form without rebuilding the dense tensor.
+SPARSE_VERSION = 1
+SPARSE_HEADER = struct.Struct('!BBBBQQQQ') # version, positions mode, itemsize, hash id, values, nnz, positions length, values length
+POSITIONS_BITMAP, POSITIONS_GAPS = 0, 1
+BITMAP_DENSITY = 1 / 32 # above this a bit per value beats a 4-byte gap per nonzero
+SPARSE_MIN_ZERO = 0.5 # sparse='auto' encodes tensors with at least this zero fraction
+SPARSE_ITEMSIZES = (1, 2, 4, 8)
+
+
+class SparseTensor:
+    """Nonzero values of a tensor and their flat (C-order) indices.
+
+    Returned by ``decompress(record, sparse=True)``. ``todense()`` rebuilds the
+    array; ``coords()`` gives per-axis indices (COO form).
+    """
+
+    def __init__(self, shape, indices, values):
+        self.shape = tuple(shape)
+        self.indices = indices # int64, ascending
+        self.values = values
+
+    @classmethod
+    def from_dense(cls, array):
+        flat = array.reshape(-1)
+        indices = np.flatnonzero(_as_uint(flat) != 0)
+        return cls(array.shape, indices, flat[indices])
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nnz(self):
+        return self.values.size
+
+    @property
+    def density(self):
+        size = int(np.prod(self.shape, dtype=np.int64))
+        return self.nnz / size if size else 0.0
+
+    def coords(self):
+        return np.unravel_index(self.indices, self.shape)
+
+    def todense(self):
+        dense = np.zeros(self.shape, dtype=self.dtype)
+        dense.reshape(-1)[self.indices] = self.values
+        return dense
+
+    def __repr__(self):
+        return f"SparseTensor(shape={self.shape}, dtype={self.dtype}, nnz={self.nnz})"
+
+
+def _as_uint(values):
+    # Same-width unsigned view, so zero tests are bitwise
+    return values.view(np.dtype(f'u{values.dtype.itemsize}'))
+
+
+def supports(dtype):
+    return np.dtype(dtype).itemsize in SPARSE_ITEMSIZES and not np.dtype(dtype).hasobject
+
+
+def zero_fraction(data):
+    # Fraction of all-zero values in a few sampled slices of an ndarray
+    samples = sample_blocks(data)
+    total = sum(sample.size for sample in samples)
+    if not total:
+        return 0.0
+    return sum(sample.size - np.count_nonzero(sample) for sample in samples) / total
+
+
+def _pack(proto, backend, array, codec_args):
+    data = memoryview(array.reshape(-1).view(np.uint8))
+    typesize = array.dtype.itemsize
+    block_size = normalize_block_size(proto.block_size, typesize)
+    return compress_blocks(proto, data, block_size, backend, **dict(codec_args, typesize=typesize))
+
+
+def encode(proto, payload, itemsize, backend, **codec_args):
+    # Sparse form of a flat byte view of itemsize-byte values; returns the payload as a list of parts
+    values = np.frombuffer(payload, dtype=np.dtype(f'u{itemsize}'))
+    nonzero = values != 0
+    nnz = int(np.count_nonzero(nonzero))
+    if nnz > values.size * BITMAP_DENSITY:
+        mode, positions = POSITIONS_BITMAP, np.packbits(nonzero)
+    else:
+        mode = POSITIONS_GAPS
+        indices = np.flatnonzero(nonzero)
+        positions = np.diff(indices, prepend=0).astype(np.uint32 if values.size < 2**32 else np.uint64)
+    packed = values[nonzero]
+    digests = digest_blocks(proto.hash_algo, memoryview(positions.view(np.uint8))) + \
+        digest_blocks(proto.hash_algo, memoryview(packed.view(np.uint8)))
+    positions_parts = _pack(proto, backend, positions, codec_args)
+    values_parts = _pack(proto, backend, packed, codec_args)
+    header = SPARSE_HEADER.pack(SPARSE_VERSION, mode, itemsize, proto.hash_id, values.size, nnz,
+                                sum(map(len, positions_parts)), sum(map(len, values_parts)))
+    return [header, digests, *positions_parts, *values_parts]
+
+
+def decode_sparse(proto, payload, backend):
+    # -> (n values, itemsize, int64 flat indices or None, bool mask or None, uint values)
+    # Exactly one of indices (gap-coded positions) and mask (bitmap) is set.
+    if len(payload) < SPARSE_HEADER.size:
+        raise ValueError("Sparse payload is too short to hold a header")
+    version, mode, itemsize, algo_id, n, nnz, positions_len, values_len = SPARSE_HEADER.unpack_from(payload)
+    if version != SPARSE_VERSION:
+        raise ValueError(f"Sparse encoding version mismatch. Expected {SPARSE_VERSION}, got {version}")
+    hash_algo = hash_name(algo_id)
+    digest_size = HASH_ALGORITHMS[hash_algo][1]
+    start = SPARSE_HEADER.size + 2 * digest_size
+    if start + positions_len + values_len != len(payload):
+        raise ValueError("Sparse stream lengths do not match the payload length")
+    digests = payload[SPARSE_HEADER.size:start]
+    positions = decompress_blocks(proto, payload[start:start + positions_len], codec=backend)
+    values = decompress_blocks(proto, payload[start + positions_len:], codec=backend)
+    if digest_blocks(hash_algo, memoryview(positions)) + digest_blocks(hash_algo, memoryview(values)) != digests:
+        raise ValueError("Corruption detected in sparse streams! Hash mismatch.")
+    values = values.view(np.dtype(f'u{itemsize}'))
+    if values.size != nnz:
+        raise ValueError(f"Sparse payload holds {values.size} values, expected {nnz}")
+    if mode == POSITIONS_BITMAP:
+        if positions.size != (n + 7) // 8:
+            raise ValueError("Sparse bitmap does not match the value count")
+        return n, itemsize, None, np.unpackbits(positions, count=n).view(bool), values
+    if mode == POSITIONS_GAPS:
+        indices = np.cumsum(positions.view(np.uint32 if n < 2**32 else np.uint64), dtype=np.int64)
+        if indices.size != nnz or (nnz and indices[-1] >= n):
+            raise ValueError("Sparse indices do not match the value count")
+        return n, itemsize, indices, None, values
+    raise ValueError(f"Unknown sparse positions mode {mode}")
+
+
+def decode(proto, payload, backend, out_bytes=None):
+    # Dense bytes of a sparse payload, written into out_bytes (allocated if None)
+    n, itemsize, indices, mask, values = decode_sparse(proto, payload, backend)
+    if out_bytes is None:
+        out_bytes = np.zeros(n * itemsize, dtype=np.uint8)
+        dense = out_bytes.view(values.dtype)
+    else:
+        proto._check_out_size(out_bytes, n * itemsize)
+        dense = out_bytes.view(values.dtype)
+        dense[:] = 0
+    if mask is not None:
+        dense[mask] = values
+    else:
+        dense[indices] = values
+    return out_bytes
+
+
+def decode_tensor(proto, payload, backend, dtype, shape):
+    # SparseTensor of a sparse payload, without building the dense array
+    _, _, indices, mask, values = decode_sparse(proto, payload, backend)
+    if indices is None:
+        indices = np.flatnonzero(mask)
+    return SparseTensor(shape, indices, values.view(dtype))
@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+
+# Per-stage instrumentation. NFCPrototype(stats=Stats()) records, for every stage of
+# every compress/decompress/stream call, the wall time and bytes in/out under keys
+# like "compress.hash" or "decompress.blosc", plus event counters such as
+# "compress.blocks". With stats=None every stage goes through one shared no-op span,
+# so the disabled cost is a function call per stage (stages run once per block).
+#
+# Compress stages:   read, to_bytes, hash, reference, probe, tune, predict, bitpack, <backend> | huffman | split | sparse, header, write, total
+# Decompress stages: read, parse, <backend> | stored | huffman | split | sparse | arithmetic, bitpack, reconstruct, reference, hash, write, total
+# where <backend> is the compression backend's name: blosc, blosc2, zstd or lz4.
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass # bytes_out assignments are ignored when stats are off
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('stats', 'stage', 'bytes_in', 'bytes_out', 'start')
+
+    def __init__(self, stats, stage, bytes_in):
+        self.stats = stats
+        self.stage = stage
+        self.bytes_in = bytes_in
+        self.bytes_out = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.stats.record(self.stage, time.perf_counter() - self.start, self.bytes_in, self.bytes_out)
+        return False
+
+
+def span(stats, stage, bytes_in=0):
+    # `with span(self.stats, "compress.blosc", n) as s: ...; s.bytes_out = m`
+    if stats is None:
+        return NULL_SPAN
+    return _Span(stats, stage, bytes_in)
+
+
+def timed_iter(stats, stage, iterable):
+    # Records the time spent producing each item (e.g. file reads) and its size
+    if stats is None:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        stats.record(stage, time.perf_counter() - start, 0, len(item))
+        yield item
+
+
+def count(stats, name, n=1):
+    if stats is not None:
+        stats.count(name, n)
+
+
+class Stats:
+    """Thread-safe per-stage aggregates.
+
+    ``callback(stage, seconds, bytes_in, bytes_out)`` is additionally called for every
+    recorded stage, e.g. to feed a tracing system. Aggregates are available from
+    ``snapshot()`` and can be exported with ``write_json`` or ``to_prometheus``.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stages = {} # stage -> [calls, seconds, bytes_in, bytes_out]
+            self._counters = {}
+
+    def record(self, stage, seconds, bytes_in=0, bytes_out=0):
+        with self._lock:
+            agg = self._stages.get(stage)
+            if agg is None:
+                agg = self._stages[stage] = [0, 0.0, 0, 0]
+            agg[0] += 1
+            agg[1] += seconds
+            agg[2] += bytes_in
+            agg[3] += bytes_out
+        if self.callback is not None:
+            self.callback(stage, seconds, bytes_in, bytes_out)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            stages = {
+                stage: {
+                    "calls": calls,
+                    "seconds": seconds,
+                    "bytes_in": bytes_in,
+                    "bytes_out": bytes_out,
+                    "mb_per_s": max(bytes_in, bytes_out) / 1024**2 / seconds if seconds > 0 else 0.0,
+                }
+                for stage, (calls, seconds, bytes_in, bytes_out) in sorted(self._stages.items())
+            }
+            return {"stages": stages, "counters": dict(sorted(self._counters.items()))}
+
+    def write_json(self, fp):
+        # `fp` is a path or a text file object
+        if not hasattr(fp, 'write'):
+            with open(fp, 'w') as f:
+                return self.write_json(f)
+        json.dump(self.snapshot(), fp, indent=2)
+
+    def to_prometheus(self, prefix='nfc'):
+        # Prometheus text exposition format, one labelled series per stage
+        snap = self.snapshot()
+        lines = []
+        for metric, field, kind in (("stage_calls_total", "calls", "counter"),
+                                    ("stage_seconds_total", "seconds", "counter"),
+                                    ("stage_bytes_in_total", "bytes_in", "counter"),
+                                    ("stage_bytes_out_total", "bytes_out", "counter")):
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for stage, agg in snap["stages"].items():
+                lines.append(f'{prefix}_{metric}{{stage="{stage}"}} {agg[field]}')
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, value in snap["counters"].items():
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def format_table(self):
+        snap = self.snapshot()
+        total = sum(agg["seconds"] for stage, agg in snap["stages"].items() if not stage.endswith(".total")) or 1.0
+        rows = [f"{'stage':<24}{'calls':>8}{'seconds':>10}{'share':>8}{'MB in':>10}{'MB out':>10}{'MB/s':>10}"]
+        for stage, agg in snap["stages"].items():
+            share = "" if stage.endswith(".total") else f"{100 * agg['seconds'] / total:7.1f}%"
+            rows.append(f"{stage:<24}{agg['calls']:>8}{agg['seconds']:>10.3f}{share:>8}"
+                        f"{agg['bytes_in'] / 1024**2:>10.1f}{agg['bytes_out'] / 1024**2:>10.1f}{agg['mb_per_s']:>10.1f}")
+        for name, value in snap["counters"].items():
+            rows.append(f"{name:<24}{value:>8}")
+        return "\n".join(rows)
@@ -0,0 +1,217 @@
+import itertools
+import json
+import math
+import os
+import struct
+import threading
+import numpy as np
+
+# Chunked tensor layout:
+#   [NFC2 chunk record]*n [layout JSON] [CHUNK_ENTRY]*n [TENSOR_TRAILER]
+# Chunks are stored in C order over the chunk grid. Each chunk is an ordinary NFC2
+# record, so it carries its own metadata, prediction settings and hash.
+TENSOR_MAGIC = b'NFCG'
+TENSOR_VERSION = 1
+CHUNK_ENTRY = struct.Struct('!QQ')         # record offset, record length
+TENSOR_TRAILER = struct.Struct('!QQB3x4s') # layout offset, layout length, version, reserved, magic
+DEFAULT_CHUNK_BYTES = 1024 * 1024 * 4
+
+
+def normalize_chunk_shape(shape, dtype, chunks=None):
+    # chunks=None picks ~4 MB slabs along the leading axis, an int is a row count
+    # along the leading axis, and a tuple is an N-d grid (None = whole axis).
+    if len(shape) == 0:
+        return ()
+    if chunks is None:
+        row_bytes = max(int(np.prod(shape[1:], dtype=np.int64)) * np.dtype(dtype).itemsize, 1)
+        chunks = max(DEFAULT_CHUNK_BYTES // row_bytes, 1)
+    if isinstance(chunks, (int, np.integer)):
+        chunks = (int(chunks),) + (None,) * (len(shape) - 1)
+    if len(chunks) != len(shape):
+        raise ValueError(f"Chunk shape {tuple(chunks)} does not match tensor rank {len(shape)}")
+    return tuple(max(int(n if c is None or c <= 0 else min(c, n)), 1) for c, n in zip(chunks, shape))
+
+
+def chunk_grid(shape, chunk_shape):
+    return tuple(math.ceil(n / c) for n, c in zip(shape, chunk_shape))
+
+
+def iter_chunk_slices(shape, chunk_shape):
+    for chunk_id in itertools.product(*(range(g) for g in chunk_grid(shape, chunk_shape))):
+        yield tuple(slice(i * c, min((i + 1) * c, n)) for i, c, n in zip(chunk_id, chunk_shape, shape))
+
+
+def write_chunked(proto, data, fout, chunks=None, use_prediction=False, workers=1):
+    chunk_shape = normalize_chunk_shape(data.shape, data.dtype, chunks)
+    compress_chunk = lambda index: proto.compress(data[index + (Ellipsis,)], use_prediction=use_prediction)[0]
+    slices = iter_chunk_slices(data.shape, chunk_shape)
+    if workers > 1:
+        records = proto._ordered_map(compress_chunk, slices, workers)
+    else:
+        records = map(compress_chunk, slices)
+
+    entries = []
+    offset = 0
+    for record in records:
+        fout.write(record)
+        entries.append((offset, len(record)))
+        offset += len(record)
+
+    layout = {
+        "schema_version": "nfc-0.2",
+        "format_hint": "chunked_tensor",
+        "dtype": data.dtype.name,
+        "endianness": data.dtype.byteorder,
+        "shape": list(data.shape),
+        "chunk_shape": list(chunk_shape),
+    }
+    layout_json = json.dumps(layout).encode('utf-8')
+    fout.write(layout_json)
+    for entry in entries:
+        fout.write(CHUNK_ENTRY.pack(*entry))
+    fout.write(TENSOR_TRAILER.pack(offset, len(layout_json), TENSOR_VERSION, TENSOR_MAGIC))
+    return offset + len(layout_json) + len(entries) * CHUNK_ENTRY.size + TENSOR_TRAILER.size
+
+
+class ChunkedTensorReader:
+    """Lazy view over a chunked tensor.
+
+    ``source`` is a path or any bytes-like buffer (``bytes``, ``mmap.mmap``, ...).
+    Indexing with ints and slices only decompresses the chunks the selection touches.
+    """
+
+    def __init__(self, source, proto, workers=1):
+        self.proto = proto
+        self.workers = workers
+        self._lock = threading.Lock()
+        if isinstance(source, (str, os.PathLike)):
+            self._file = open(source, 'rb')
+            self._buffer = None
+        else:
+            self._file = None
+            self._buffer = memoryview(source)
+
+        tail = self._read_tail(TENSOR_TRAILER.size)
+        layout_offset, layout_len, version, magic = TENSOR_TRAILER.unpack(tail)
+        if magic != TENSOR_MAGIC:
+            raise ValueError(f"Invalid chunked tensor magic. Expected {TENSOR_MAGIC}, got {magic}")
+        if version != TENSOR_VERSION:
+            raise ValueError(f"Chunked tensor version mismatch. Expected {TENSOR_VERSION}, got {version}")
+
+        layout = json.loads(bytes(self._read(layout_offset, layout_len)))
+        self.dtype = np.dtype(layout["dtype"])
+        if layout.get("endianness") and self.dtype.byteorder != layout["endianness"]:
+            self.dtype = self.dtype.newbyteorder(layout["endianness"])
+        self.shape = tuple(layout["shape"])
+        self.chunk_shape = tuple(layout["chunk_shape"])
+        self.grid = chunk_grid(self.shape, self.chunk_shape)
+
+        n_chunks = int(np.prod(self.grid, dtype=np.int64))
+        table = self._read(layout_offset + layout_len, n_chunks * CHUNK_ENTRY.size)
+        if len(table) != n_chunks * CHUNK_ENTRY.size:
+            raise ValueError("Incomplete chunk table in chunked tensor")
+        self._entries = list(CHUNK_ENTRY.iter_unpack(table))
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        if not self.shape:
+            raise TypeError("len() of unsized chunked tensor")
+        return self.shape[0]
+
+    def _size(self):
+        if self._file is not None:
+            return self._file.seek(0, 2)
+        return len(self._buffer)
+
+    def _read(self, offset, length):
+        if self._file is not None:
+            with self._lock:
+                self._file.seek(offset)
+                return self._file.read(length)
+        return self._buffer[offset:offset + length]
+
+    def _read_tail(self, length):
+        size = self._size()
+        if size < length:
+            raise ValueError("Chunked tensor is too small to hold a trailer")
+        return bytes(self._read(size - length, length))
+
+    def _load_chunk(self, chunk_id):
+        flat = 0
+        for i, g in zip(chunk_id, self.grid):
+            flat = flat * g + i
+        offset, length = self._entries[flat]
+        return self.proto.decompress(self._read(offset, length))
+
+    def _normalize_key(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis for k in key):
+            at = key.index(Ellipsis)
+            key = key[:at] + (slice(None),) * (self.ndim - len(key) + 1) + key[at + 1:]
+        if len(key) > self.ndim:
+            raise IndexError(f"Too many indices for tensor of rank {self.ndim}")
+        return key + (slice(None),) * (self.ndim - len(key))
+
+    def __getitem__(self, key):
+        key = self._normalize_key(key)
+        # Per axis: bounding range [lo, hi) and the positions selected inside it
+        lo, hi, picks, keep_axis = [], [], [], []
+        for k, n in zip(key, self.shape):
+            if isinstance(k, slice):
+                selected = range(*k.indices(n))
+                keep_axis.append(True)
+            else:
+                i = int(k)
+                if not -n <= i < n:
+                    raise IndexError(f"Index {i} is out of bounds for axis with size {n}")
+                selected = range(i % n, i % n + 1)
+                keep_axis.append(False)
+            if len(selected) == 0:
+                lo.append(0)
+                hi.append(0)
+            else:
+                lo.append(min(selected[0], selected[-1]))
+                hi.append(max(selected[0], selected[-1]) + 1)
+            picks.append(np.asarray(selected, dtype=np.intp) - lo[-1])
+
+        box = np.empty([b - a for a, b in zip(lo, hi)], dtype=self.dtype)
+        if box.size:
+            chunk_ranges = [range(a // c, (b - 1) // c + 1) for a, b, c in zip(lo, hi, self.chunk_shape)]
+            chunk_ids = list(itertools.product(*chunk_ranges))
+            if self.workers > 1:
+                chunks = self.proto._ordered_map(self._load_chunk, chunk_ids, self.workers)
+            else:
+                chunks = map(self._load_chunk, chunk_ids)
+            for chunk_id, chunk in zip(chunk_ids, chunks):
+                origin = [i * c for i, c in zip(chunk_id, self.chunk_shape)]
+                src, dst = [], []
+                for a, b, o, n in zip(lo, hi, origin, chunk.shape):
+                    start, stop = max(a, o), min(b, o + n)
+                    src.append(slice(start - o, stop - o))
+                    dst.append(slice(start - a, stop - a))
+                box[tuple(dst)] = chunk[tuple(src)]
+
+        # Contiguous ascending slices select the whole bounding box; anything else
+        # (steps, reversed slices) is picked out of it.
+        if not all(len(p) == s and (s == 0 or p[0] == 0) for p, s in zip(picks, box.shape)):
+            box = box[np.ix_(*picks)]
+        return box.reshape([s for s, keep in zip(box.shape, keep_axis) if keep])
+
+    def __array__(self, dtype=None, copy=None):
+        full = self[...]
+        return full.astype(dtype) if dtype is not None else full
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,143 @@
+import time
+import blosc
+import numpy as np
+
+from . import predictors
+
+# Search space for NFCPrototype(codec='auto'). Only shape-free predictors are tried,
+# because trials run on flat samples of the input.
+DEFAULT_CODECS = ('lz4', 'zstd', 'blosclz')
+DEFAULT_CLEVELS = (1, 5, 9)
+DEFAULT_SHUFFLES = (blosc.NOSHUFFLE, blosc.SHUFFLE, blosc.BITSHUFFLE)
+DEFAULT_PREDICTORS = (None, "modular_delta", "xor")
+OBJECTIVES = ('size', 'speed')
+DEFAULT_SAMPLES = 4
+DEFAULT_SAMPLE_BYTES = 256 * 1024
+
+
+def sample_blocks(data, n_samples=DEFAULT_SAMPLES, sample_bytes=DEFAULT_SAMPLE_BYTES):
+    # Evenly spaced contiguous slices of the flattened input. Small inputs are
+    # returned whole.
+    if isinstance(data, np.ndarray) and not predictors.supports(data.dtype):
+        # No same-width uint (complex128, longdouble, records): sample bytes instead,
+        # in whole items so byte lanes stay aligned
+        itemsize = max(data.dtype.itemsize, 1)
+        flat = np.ascontiguousarray(data).reshape(-1).view(np.uint8)
+        step = max(sample_bytes // itemsize, 1) * itemsize
+        if flat.size <= step * n_samples:
+            return [flat]
+        starts = np.linspace(0, flat.size // itemsize - step // itemsize, n_samples).astype(np.int64) * itemsize
+        return [flat[start:start + step] for start in starts]
+    if isinstance(data, np.ndarray):
+        flat = predictors.as_uint(data) if data.size else data.reshape(-1)
+        step = max(sample_bytes // max(data.dtype.itemsize, 1), 1)
+    else:
+        flat = np.frombuffer(data, dtype=np.uint8)
+        step = sample_bytes
+    if flat.size <= step * n_samples:
+        return [flat]
+    starts = np.linspace(0, flat.size - step, n_samples).astype(np.int64)
+    return [flat[start:start + step] for start in starts]
+
+
+def _trial(samples, itemsize, codec, clevel, shuffle, predictor):
+    comp_size = 0
+    start = time.perf_counter()
+    for sample in samples:
+        payload = sample
+        if predictor is not None:
+            payload = predictors.predict(predictor, sample)
+        comp_size += len(blosc.compress(memoryview(payload.reshape(-1).view(np.uint8)), typesize=itemsize,
+                                        cname=codec, clevel=clevel, shuffle=shuffle))
+    return comp_size, time.perf_counter() - start
+
+
+def _best(results, objective, orig_size, min_ratio):
+    # results: list of (settings, comp_size, elapsed)
+    if objective == 'speed':
+        fast_enough = [r for r in results if orig_size / max(r[1], 1) >= min_ratio]
+        if fast_enough:
+            return min(fast_enough, key=lambda r: (r[2], r[1]))
+    return min(results, key=lambda r: (r[1], r[2]))
+
+
+def tune(data, objective='size', min_ratio=1.0, codecs=DEFAULT_CODECS, clevels=DEFAULT_CLEVELS,
+         shuffles=DEFAULT_SHUFFLES, candidate_predictors=DEFAULT_PREDICTORS,
+         n_samples=DEFAULT_SAMPLES, sample_bytes=DEFAULT_SAMPLE_BYTES):
+    # Picks codec/clevel/shuffle/predictor for `data` from trials on sampled blocks.
+    #   objective='size':  smallest output
+    #   objective='speed': highest compress MB/s among settings reaching min_ratio
+    #                      (falls back to smallest output if none does)
+    # Two stages keep the trial count small: predictor x shuffle with a mid-level
+    # codec first, then codec x clevel for the winner.
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown tuning objective '{objective}'. Expected one of {OBJECTIVES}")
+    codecs = [c for c in codecs if c in blosc.compressor_list()]
+    if not codecs:
+        raise ValueError("None of the candidate codecs are available in this blosc build")
+
+    is_numpy = isinstance(data, np.ndarray)
+    itemsize = data.dtype.itemsize if is_numpy else 1
+    if not (is_numpy and predictors.supports(data.dtype)):
+        candidate_predictors = (None,)
+    if itemsize == 1:
+        shuffles = (blosc.NOSHUFFLE, blosc.BITSHUFFLE) if blosc.BITSHUFFLE in shuffles else (blosc.NOSHUFFLE,)
+
+    samples = sample_blocks(data, n_samples, sample_bytes)
+    orig_size = sum(sample.nbytes for sample in samples)
+
+    probe_codec, probe_clevel = codecs[0], clevels[len(clevels) // 2]
+    stage1 = []
+    for predictor in candidate_predictors:
+        for shuffle in shuffles:
+            comp_size, elapsed = _trial(samples, itemsize, probe_codec, probe_clevel, shuffle, predictor)
+            stage1.append(((predictor, shuffle), comp_size, elapsed))
+    predictor, shuffle = _best(stage1, objective, orig_size, min_ratio)[0]
+
+    stage2 = []
+    for codec in codecs:
+        for clevel in clevels:
+            comp_size, elapsed = _trial(samples, itemsize, codec, clevel, shuffle, predictor)
+            stage2.append(((codec, clevel), comp_size, elapsed))
+    (codec, clevel), comp_size, _ = _best(stage2, objective, orig_size, min_ratio)
+
+    return {
+        "codec": codec,
+        "clevel": clevel,
+        "shuffle": shuffle,
+        "predictor": predictor,
+        "sample_ratio": round(orig_size / max(comp_size, 1), 4),
+    }
+
+
+def entropy_ratio(samples, itemsize):
+    # Order-0 entropy per byte lane (byte k of every item), the redundancy that byte
+    # shuffle + an entropy coder can reach. Returns the implied compression ratio.
+    raw = np.concatenate([sample.reshape(-1).view(np.uint8) for sample in samples])
+    lanes = raw[:raw.size - raw.size % itemsize].reshape(-1, itemsize)
+    if lanes.size == 0:
+        return float('inf')
+    bits = 0.0
+    for lane in lanes.T:
+        # bincount widens its input to intp, so count in slices to keep temporaries small
+        p = np.zeros(256, dtype=np.int64)
+        for start in range(0, lane.size, 65536):
+            p += np.bincount(lane[start:start + 65536], minlength=256)
+        p = p[p > 0] / lane.size
+        bits -= float((p * np.log2(p)).sum())
+    return 8 * itemsize / max(bits, 1e-3)
+
+
+def looks_incompressible(data, threshold, n_samples=DEFAULT_SAMPLES, sample_bytes=DEFAULT_SAMPLE_BYTES):
+    # Cheap probe for the stored fast path: byte-lane entropy on sampled blocks,
+    # confirmed with one lz4 clevel=1 pass (entropy alone misses repeated content).
+    is_numpy = isinstance(data, np.ndarray)
+    itemsize = data.dtype.itemsize if is_numpy else 1
+    if (data.nbytes if is_numpy else len(data)) == 0:
+        return False
+    samples = sample_blocks(data, n_samples, sample_bytes)
+    if entropy_ratio(samples, itemsize) >= threshold:
+        return False
+    shuffle = blosc.SHUFFLE if itemsize > 1 else blosc.NOSHUFFLE
+    comp_size, _ = _trial(samples, itemsize, 'lz4', 1, shuffle, None)
+    return sum(sample.nbytes for sample in samples) / max(comp_size, 1) < threshold
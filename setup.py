@@ -9,7 +9,8 @@ setup(
         'blosc>=1.11.1',
     ],
     extras_require={
-        'full': ['neuralcompression>=0.2.0'],
+        'full': ['neuralcompression>=0.2.0', 'xxhash>=3.0.0', 'crc32c>=2.3', 'zstandard>=0.22.0', 'blosc2>=2.5.0',
+                 'lz4>=4.0.0'],
     },
     description='Prototype for lossless AI data compression',
     author='Quintin Reynecke',
@@ -0,0 +1,79 @@
+import asyncio
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+
+class AsyncBytesReader:
+    # Async reader that returns short reads, like a socket
+    def __init__(self, data, max_read=7000):
+        self._buf = io.BytesIO(data)
+        self._max_read = max_read
+
+    async def read(self, n=-1):
+        await asyncio.sleep(0)
+        return self._buf.read(min(n, self._max_read) if n >= 0 else -1)
+
+class AsyncBytesWriter:
+    def __init__(self):
+        self.buf = io.BytesIO()
+
+    async def write(self, data):
+        await asyncio.sleep(0)
+        self.buf.write(data)
+
+def _stream_reader(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+def test_acompress_adecompress():
+    proto = NFCPrototype()
+    data = np.linspace(0, 1, 100000, dtype=np.float32).reshape(100, 1000)
+
+    async def main():
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            nfc_binary, orig_size, comp_size = await proto.acompress(data, executor=pool, use_prediction=True)
+            assert nfc_binary == proto.compress(data, use_prediction=True)[0]
+            return await proto.adecompress(nfc_binary)
+
+    assert np.array_equal(asyncio.run(main()), data)
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_async_stream_matches_sync(tmp_path, workers):
+    proto = NFCPrototype(clevel=1)
+    original = np.arange(300000, dtype=np.int32).tobytes() + os.urandom(50001)
+    src, sync_out = tmp_path / "in.bin", tmp_path / "sync.nfc"
+    src.write_bytes(original)
+    proto.compress_stream(src, sync_out, chunk_size=64 * 1024)
+
+    async def main():
+        compressed = AsyncBytesWriter()
+        await proto.acompress_stream(AsyncBytesReader(original), compressed, chunk_size=64 * 1024, workers=workers)
+        restored = AsyncBytesWriter()
+        await proto.adecompress_stream(_stream_reader(compressed.buf.getvalue()), restored, workers=workers)
+        return compressed.buf.getvalue(), restored.buf.getvalue()
+
+    compressed, restored = asyncio.run(main())
+    assert compressed == sync_out.read_bytes()
+    assert restored == original
+
+def test_async_stream_errors():
+    proto = NFCPrototype()
+    compressed = io.BytesIO()
+    for block in (b'a' * 5000, b'b' * 5000):
+        compressed.write(proto.compress(block)[0])
+
+    async def decompress(data):
+        await proto.adecompress_stream(_stream_reader(data), AsyncBytesWriter(), workers=2)
+
+    asyncio.run(decompress(compressed.getvalue()))
+    with pytest.raises(ValueError):
+        asyncio.run(decompress(compressed.getvalue()[:-3]))
+    corrupted = bytearray(compressed.getvalue())
+    corrupted[-1] ^= 0xFF
+    with pytest.raises(ValueError):
+        asyncio.run(decompress(bytes(corrupted)))
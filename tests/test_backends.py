@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.backends import BACKENDS, available_backends, get_backend
+
+def _tensor():
+    rng = np.random.default_rng(0)
+    return np.cumsum(rng.standard_normal((300, 257)), axis=1).astype(np.float32)
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_roundtrip_per_backend(backend):
+    proto = NFCPrototype(clevel=3, backend=backend, hash_algo='crc32')
+    original = _tensor()
+    for kwargs in ({}, dict(predictor='axis_delta', predictor_params={'axis': 1})):
+        nfc_binary, _, _ = proto.compress(original, **kwargs)
+        assert nfc_binary[7] == BACKENDS[backend].backend_id and nfc_binary[5] & proto.BINARY_METADATA_FLAG
+        assert proto._parse_record(nfc_binary)[2]["compression_stack"][-1] == BACKENDS[backend].stack_name('zstd')
+        # Any reader decodes any backend: the id travels in the header
+        assert np.array_equal(NFCPrototype().decompress(nfc_binary), original)
+        out = np.empty_like(original)
+        assert NFCPrototype().decompress_into(nfc_binary, out) is out and np.array_equal(out, original)
+    text = b"backend registry " * 1000
+    assert NFCPrototype().decompress(proto.compress(text)[0]) == text
+    assert NFCPrototype().decompress(proto.compress(b'')[0]) == b''
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_blocked_stream_and_batch_per_backend(backend, tmp_path):
+    proto = NFCPrototype(clevel=1, backend=backend, nthreads=2, block_size=100_000, hash_algo='crc32')
+    original = _tensor()
+    nfc_binary = proto.compress(original)[0]
+    assert nfc_binary[5] & proto.BLOCKED_FLAG
+    assert np.array_equal(NFCPrototype(nthreads=2).decompress(nfc_binary), original)
+
+    src, packed, restored = tmp_path / "in.bin", tmp_path / "in.nfc", tmp_path / "out.bin"
+    src.write_bytes(original.tobytes() * 3)
+    proto.compress_stream(src, packed, chunk_size=200_000, workers=2)
+    NFCPrototype().decompress_stream(packed, restored, workers=2)
+    assert restored.read_bytes() == src.read_bytes()
+
+    items = {"a": original, "b": original[:10].astype(np.float16), "c": b"x" * 5000}
+    out = NFCPrototype().decompress_many(proto.compress_many(items))
+    assert np.array_equal(out["a"], items["a"]) and np.array_equal(out["b"], items["b"]) and out["c"] == items["c"]
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown compression backend"):
+        NFCPrototype(backend='brotli')
+    with pytest.raises(ValueError, match="Unknown compression backend"):
+        get_backend(200)
+    nfc_binary = bytearray(NFCPrototype().compress(b"abc" * 100)[0])
+    nfc_binary[7] = 200
+    with pytest.raises(ValueError, match="Unknown compression backend"):
+        NFCPrototype().decompress(bytes(nfc_binary))
+
+@pytest.mark.parametrize("backend", [name for name in ('zstd', 'lz4') if name in available_backends()])
+def test_forged_raw_frame_header(backend):
+    codec = BACKENDS[backend]
+    frame = bytearray(codec.compress(_tensor().tobytes(), typesize=4))
+    out = np.empty(_tensor().nbytes, dtype=np.uint8)
+    forged = bytearray(frame)
+    forged[1] = 0 # typesize
+    with pytest.raises(ValueError, match="typesize"):
+        codec.decompress_into(bytes(forged), out)
+    forged = bytearray(frame)
+    forged[2:10] = (2**60).to_bytes(8, 'big') # decoded length
+    with pytest.raises(ValueError, match="expected"):
+        codec.decompress_into(bytes(forged), out)
+    with pytest.raises(ValueError, match="too short"):
+        codec.decoded_size(bytes(frame[:5]))
+
+    proto = NFCPrototype(backend=backend, store_threshold=None)
+    nfc_binary = proto.compress(_tensor())[0]
+    payload, digest = proto._parse_record(nfc_binary)[3:5]
+    start = len(nfc_binary) - len(payload) - len(digest)
+    forged = bytearray(nfc_binary)
+    forged[start + 2:start + 10] = (2**60).to_bytes(8, 'big')
+    with pytest.raises(ValueError, match="record decodes to"):
+        NFCPrototype().decompress(bytes(forged))
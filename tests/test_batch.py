@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype import batch
+
+def _items(n=500):
+    rng = np.random.default_rng(0)
+    items = {f"layers.{i}.weight": (rng.standard_normal(int(rng.integers(1, 3000))) * 0.02).astype(np.float16)
+             for i in range(n)}
+    items["ids"] = np.arange(40_000, dtype='>i8').reshape(200, 200) # big-endian, framed alone
+    items["scalar"] = np.array(7, dtype=np.uint8)
+    items["empty"] = np.zeros((0, 3), dtype=np.float32)
+    items["config"] = b'{"hidden": 4096}' * 10
+    items["noise"] = rng.integers(0, 256, 100_000, dtype=np.uint8) # stored raw
+    return items
+
+def _check(out, items):
+    assert list(out) == list(items)
+    for name, value in items.items():
+        if isinstance(value, bytes):
+            assert out[name] == value
+        else:
+            assert out[name].dtype == value.dtype and out[name].shape == value.shape
+            assert np.array_equal(out[name], value)
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_batch_roundtrip(workers):
+    proto = NFCPrototype(hash_algo='crc32')
+    items = _items()
+    blob = proto.compress_many(items, workers=workers)
+    _check(proto.decompress_many(blob, workers=workers), items)
+    table = batch.read_batch_table(blob)[0]
+    assert len(table["frames"]) < len(items) // 10 # small entries share frames
+    standalone = sum(len(proto.compress(value)[0]) for value in items.values())
+    assert len(blob) < standalone
+
+def test_batch_selective_and_errors():
+    proto = NFCPrototype()
+    items = _items(50)
+    blob = proto.compress_many(items)
+    out = proto.decompress_many(blob, names=["ids", "config"])
+    _check(out, {"ids": items["ids"], "config": items["config"]})
+    with pytest.raises(KeyError):
+        proto.decompress_many(blob, names=["missing"])
+
+    corrupt = bytearray(blob)
+    corrupt[-50_000] ^= 0xFF # inside the stored noise entry
+    assert proto.decompress_many(bytes(corrupt), names=["ids"])["ids"].sum() == items["ids"].sum()
+    with pytest.raises(ValueError, match="Hash mismatch"):
+        proto.decompress_many(bytes(corrupt), names=["noise"])
+    assert proto.decompress_many(proto.compress_many({})) == {}
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype import bitpack
+from nfc_prototype.backends import available_backends
+from nfc_prototype.stats import Stats
+
+def _narrow(dtype, width, n=70_001, seed=0):
+    # Values spanning `width` bits around the middle of the dtype's range
+    rng = np.random.default_rng(seed)
+    info = np.iinfo(dtype)
+    low = info.min // 2 if info.min else 5
+    if width >= np.dtype(dtype).itemsize * 8 - 1:
+        return rng.integers(info.min, info.max, n, dtype=np.dtype(dtype).newbyteorder('='), endpoint=True).astype(dtype)
+    offsets = rng.integers(0, 1 << width, n, dtype=np.int64) if width else np.zeros(n, dtype=np.int64)
+    return (offsets.astype(object) + low).astype(dtype)
+
+@pytest.mark.parametrize("dtype", ['<i1', '<u2', '>i2', '<i4', '>u4', '<i8', '<u8'])
+def test_stage_roundtrip_every_width(dtype):
+    proto = NFCPrototype()
+    for width in range(np.dtype(dtype).itemsize * 8 + 1):
+        original = _narrow(dtype, width)
+        payload = b''.join(bitpack.encode(proto, original.tobytes(), original.dtype, block_values=30_000))
+        assert bitpack.decoded_size(payload) == original.nbytes
+        assert bitpack.decode(proto, payload).tobytes() == original.tobytes(), width
+        if width < np.dtype(dtype).itemsize * 8 - 1:
+            assert max(frame[0] for frame in bitpack.block_frames(payload)) <= width
+
+def test_frame_picks_signed_or_unsigned_range():
+    assert bitpack.frame(np.array([3, 250, 255], dtype=np.uint8)) == (4, 250) # -6..3
+    assert bitpack.frame(np.array([100, 130], dtype=np.uint8)) == (5, 100)
+    # -3..4 as two's complement: signed range 7 beats unsigned range 252
+    assert bitpack.frame(np.array([-3, 4, 0], dtype=np.int8).view(np.uint8)) == (3, 253)
+
+@pytest.mark.parametrize("dtype, low, high", [(np.int32, -8, 8), (np.int16, -128, 128), (np.int64, 0, 50_257),
+                                              (np.uint8, 0, 16), (np.bool_, 0, 2)])
+def test_record_roundtrip(dtype, low, high):
+    original = np.random.default_rng(1).integers(low, high, (300, 500)).astype(dtype)
+    proto = NFCPrototype(bitpack='auto', hash_algo='crc32')
+    nfc_binary = proto.compress(original)[0]
+    assert nfc_binary[5] & proto.BITPACK_FLAG and nfc_binary[5] & proto.BINARY_METADATA_FLAG
+    assert proto._parse_record(nfc_binary)[2]["compression_stack"] == ["bitpack", "blosc_zstd"]
+    restored = NFCPrototype().decompress(nfc_binary)
+    assert restored.dtype == original.dtype and np.array_equal(restored, original)
+    out = np.empty_like(original)
+    assert NFCPrototype().decompress_into(nfc_binary, out) is out and np.array_equal(out, original)
+
+def test_int4_in_int32_packs_to_four_bits():
+    original = np.random.default_rng(2).integers(-8, 8, 1_000_000).astype(np.int32)
+    nfc_binary = NFCPrototype(bitpack=True, clevel=1).compress(original)[0]
+    assert len(nfc_binary) < original.nbytes / 7.5
+    assert len(nfc_binary) < len(NFCPrototype(clevel=1).compress(original)[0]) / 2
+
+def test_composes_with_delta_prediction():
+    original = np.cumsum(np.random.default_rng(3).integers(0, 5, 500_000)).astype(np.int64)
+    stats = Stats()
+    proto = NFCPrototype(bitpack=True, block_size=64 * 1024, nthreads=2, stats=stats, metadata_format='json')
+    nfc_binary = proto.compress(original, predictor='modular_delta')[0]
+    assert nfc_binary[5] & proto.BITPACK_FLAG and nfc_binary[5] & proto.BLOCKED_FLAG
+    metadata, payload = proto._parse_record(nfc_binary)[2:4]
+    assert metadata["prediction_model"] == "modular_delta"
+    packed = proto._backend_decode(nfc_binary[5], payload, proto.backend)
+    # The first residual of each block is its absolute value, the rest are 0..4
+    assert [frame[0] for frame in bitpack.block_frames(packed)][1:] == [3] * (len(bitpack.block_frames(packed)) - 1)
+    assert np.array_equal(NFCPrototype(nthreads=2, stats=stats).decompress(nfc_binary), original)
+    stages = stats.snapshot()["stages"]
+    assert stages["compress.bitpack"]["calls"] == 1 and stages["decompress.bitpack"]["calls"] == 1
+
+def test_auto_skips_wide_and_float_tensors():
+    rng = np.random.default_rng(4)
+    proto = NFCPrototype(bitpack='auto')
+    for data in (rng.integers(-2**31, 2**31, 50_000, dtype=np.int64).astype(np.int32),
+                 rng.standard_normal(50_000).astype(np.float32), b"\x01\x02" * 5_000):
+        nfc_binary = proto.compress(data)[0]
+        assert not nfc_binary[5] & proto.BITPACK_FLAG
+    with pytest.raises(ValueError, match="bitpack mode"):
+        NFCPrototype(bitpack='always')
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_bitpack_per_backend(backend):
+    original = np.random.default_rng(5).integers(0, 1000, (400, 300)).astype(np.int32)
+    nfc_binary = NFCPrototype(bitpack=True, backend=backend).compress(original)[0]
+    assert nfc_binary[5] & 0x40
+    assert np.array_equal(NFCPrototype().decompress(nfc_binary), original)
+
+def test_stream_and_corruption(tmp_path):
+    src, packed, restored = tmp_path / "ids.bin", tmp_path / "ids.nfc", tmp_path / "out.bin"
+    src.write_bytes(np.random.default_rng(6).integers(0, 50_257, 600_000).astype(np.int32).tobytes())
+    NFCPrototype(bitpack='auto').compress_stream(src, packed, chunk_size=1_000_000, workers=2)
+    NFCPrototype().decompress_stream(packed, restored, workers=2)
+    assert restored.read_bytes() == src.read_bytes()
+
+    proto = NFCPrototype()
+    payload = b''.join(bitpack.encode(proto, _narrow('<i4', 10).tobytes(), np.int32))
+    with pytest.raises(ValueError, match="payload length"):
+        bitpack.decode(proto, payload + b'x')
+    corrupt = bytearray(payload)
+    corrupt[bitpack.BITPACK_HEADER.size] = 40 # first block's width
+    with pytest.raises(ValueError, match="exceeds"):
+        bitpack.decode(proto, bytes(corrupt))
+
+def test_forged_value_count_is_rejected_before_allocating():
+    proto = NFCPrototype()
+    payload = bytearray(b''.join(bitpack.encode(proto, _narrow('<i4', 10).tobytes(), np.int32)))
+    version, itemsize, big_endian, block_values, n = bitpack.BITPACK_HEADER.unpack_from(payload)
+    bitpack.BITPACK_HEADER.pack_into(payload, 0, version, itemsize, big_endian, block_values, 2**61)
+    with pytest.raises(ValueError, match="block table"):
+        bitpack.decode(proto, bytes(payload))
+    with pytest.raises(ValueError, match="record decodes to"):
+        bitpack.decode(proto, bytes(payload), nbytes=n * itemsize)
+    bitpack.BITPACK_HEADER.pack_into(payload, 0, version, itemsize, big_endian, 2**32 - 1, 2**40)
+    with pytest.raises(ValueError, match="record decodes to"):
+        bitpack.decode(proto, bytes(payload), nbytes=n * itemsize)
@@ -0,0 +1,45 @@
+import os
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.container import read_block_index
+
+def _make_stream(tmp_path, size, chunk_size, index=True):
+    proto = NFCPrototype(clevel=1)
+    original = bytes(range(256)) * (size // 256) + os.urandom(size % 256)
+    src = tmp_path / "input.bin"
+    src.write_bytes(original)
+    nfc_path = tmp_path / "input.nfc"
+    proto.compress_stream(src, nfc_path, chunk_size=chunk_size, index=index)
+    return proto, original, nfc_path
+
+def test_index_entries(tmp_path):
+    _, original, nfc_path = _make_stream(tmp_path, 1024 * 1024 + 17, 256 * 1024)
+    with open(nfc_path, 'rb') as f:
+        entries = read_block_index(f)
+    assert len(entries) == 5
+    assert entries[0][0] == 0 and entries[0][2] == 0
+    assert sum(e[3] for e in entries) == len(original)
+    for prev, cur in zip(entries, entries[1:]):
+        assert cur[0] == prev[0] + prev[1]
+        assert cur[2] == prev[2] + prev[3]
+
+def test_read_range(tmp_path):
+    proto, original, nfc_path = _make_stream(tmp_path, 1024 * 1024 + 17, 256 * 1024)
+    for offset, length in [(0, 10), (256 * 1024 - 5, 10), (300000, 500000), (len(original) - 3, 100), (len(original) + 5, 10)]:
+        assert proto.read_range(nfc_path, offset, length) == original[offset:offset + length]
+
+def test_indexed_stream_roundtrip(tmp_path):
+    proto, original, nfc_path = _make_stream(tmp_path, 700 * 1024, 256 * 1024)
+    out = tmp_path / "output.bin"
+    proto.decompress_stream(nfc_path, out)
+    assert out.read_bytes() == original
+
+def test_unindexed_stream(tmp_path):
+    proto, original, nfc_path = _make_stream(tmp_path, 700 * 1024, 256 * 1024, index=False)
+    out = tmp_path / "output.bin"
+    proto.decompress_stream(nfc_path, out)
+    assert out.read_bytes() == original
+    try:
+        proto.read_range(nfc_path, 0, 10)
+        assert False, "Should require a block index"
+    except ValueError:
+        pass
@@ -0,0 +1,100 @@
+import tracemalloc
+import blosc
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.blocks import normalize_block_size, split_frames
+
+def _meta(proto, nfc_binary):
+    return proto._parse_record(nfc_binary)[2]
+
+@pytest.mark.parametrize("nthreads", [1, 3])
+def test_blocked_tensor_roundtrip(nthreads):
+    proto = NFCPrototype(clevel=5, nthreads=nthreads, block_size=100_000)
+    data = (np.arange(1_000_003, dtype=np.float32) % 977).reshape(-1, 1)
+    nfc_binary, orig_size, _ = proto.compress(data, use_prediction=True)
+    assert nfc_binary[5] & proto.BLOCKED_FLAG
+    meta = _meta(proto, nfc_binary)
+    assert meta["block_size"] == 100_000
+    payload = proto._parse_record(nfc_binary)[3]
+    assert len(split_frames(payload)) == -(-orig_size // 100_000)
+    assert np.array_equal(proto.decompress(nfc_binary), data)
+    out = np.empty_like(data)
+    proto.decompress_into(nfc_binary, out)
+    assert np.array_equal(out, data)
+
+def test_output_does_not_depend_on_threads():
+    data = np.tile(np.arange(4096, dtype=np.int16), 200)
+    records = [NFCPrototype(nthreads=n, block_size=65536).compress(data)[0] for n in (1, 2, 4)]
+    assert records[0] == records[1] == records[2]
+
+def test_block_size_is_aligned_and_capped():
+    proto = NFCPrototype(block_size=100_001)
+    nfc_binary, _, _ = proto.compress(np.arange(100_000, dtype=np.int64))
+    assert _meta(proto, nfc_binary)["block_size"] == 100_000 # multiple of the 8-byte itemsize
+    assert normalize_block_size(2**40) == blosc.MAX_BUFFERSIZE
+    with pytest.raises(ValueError):
+        normalize_block_size(4, itemsize=8)
+
+def test_blocked_bytes_and_small_inputs():
+    proto = NFCPrototype(block_size=50_000)
+    raw = b"".join(b"record %d\n" % i for i in range(40000))
+    nfc_binary, _, _ = proto.compress(raw)
+    assert nfc_binary[5] & proto.BLOCKED_FLAG
+    assert proto.decompress(nfc_binary) == raw
+    small, _, _ = proto.compress(raw[:1000])
+    assert not small[5] & proto.BLOCKED_FLAG and "block_size" not in _meta(proto, small)
+
+def test_blocked_payload_corruption():
+    proto = NFCPrototype(block_size=65536)
+    nfc_binary, _, _ = proto.compress(np.arange(200_000, dtype=np.int32))
+    meta_len = int.from_bytes(nfc_binary[16:24], 'big')
+    corrupted = bytearray(nfc_binary)
+    corrupted[34 + meta_len + 7] ^= 0xFF # frame count
+    with pytest.raises(ValueError):
+        proto.decompress(bytes(corrupted))
+
+def test_compress_memory_is_bounded_by_blocks():
+    # A single blosc call allocates an input-sized worst-case buffer; blocked
+    # compression only ever holds one per in-flight block.
+    data = np.zeros(32 * 1024 * 1024, dtype=np.uint8)
+    proto = NFCPrototype(block_size=1024 * 1024, hash_algo='crc32')
+    tracemalloc.start()
+    nfc_binary, _, _ = proto.compress(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 4 * 1024 * 1024 + 2 * len(nfc_binary)
+    assert proto.decompress(nfc_binary).tobytes() == data.tobytes()
+
+def test_default_leaves_blosc_threads_alone():
+    previous = blosc.set_nthreads(3)
+    try:
+        data = np.arange(400_000, dtype=np.int32)
+        proto = NFCPrototype(block_size=100_000)
+        assert proto.codec_threads is None and proto.nthreads == 1
+        assert np.array_equal(proto.decompress(proto.compress(data)[0]), data)
+        assert blosc.set_nthreads(3) == 3 # untouched by compress/decompress
+        # Explicit counts apply per call, and the process-wide setting comes back after
+        for nthreads in (2, 4):
+            proto = NFCPrototype(nthreads=nthreads, block_size=100_000)
+            assert np.array_equal(proto.decompress(proto.compress(data)[0]), data)
+            assert blosc.set_nthreads(3) == 3
+    finally:
+        blosc.set_nthreads(previous)
+
+def test_stream_workers_leave_blosc_threads_alone(tmp_path):
+    src, packed, restored = tmp_path / "in.bin", tmp_path / "in.nfc", tmp_path / "out.bin"
+    src.write_bytes(np.arange(1_000_000, dtype=np.int32).tobytes())
+    previous = blosc.set_nthreads(3)
+    try:
+        proto = NFCPrototype()
+        # Each worker's codec calls run with one thread
+        assert proto.codec_threads is None
+        assert list(proto._ordered_map(lambda _: proto.codec_threads, range(4), 2)) == [1] * 4
+        proto.compress_stream(src, packed, chunk_size=500_000, workers=3)
+        assert blosc.set_nthreads(3) == 3
+        proto.decompress_stream(packed, restored, workers=3)
+        assert blosc.set_nthreads(3) == 3
+        assert restored.read_bytes() == src.read_bytes()
+    finally:
+        blosc.set_nthreads(previous)
@@ -0,0 +1,55 @@
+import io
+import numpy as np
+from nfc_prototype.core import NFCPrototype
+
+def _compress(proto, data, **kwargs):
+    buf = io.BytesIO()
+    proto.compress_chunked(data, buf, **kwargs)
+    return buf.getvalue()
+
+def test_leading_axis_slicing(tmp_path):
+    proto = NFCPrototype(clevel=1)
+    data = np.arange(5000 * 16, dtype=np.float32).reshape(5000, 16)
+    path = tmp_path / "table.nfc"
+    proto.compress_chunked(data, path, chunks=512)
+    with proto.open_chunked(path) as reader:
+        assert reader.shape == data.shape and reader.dtype == data.dtype
+        assert reader.chunk_shape == (512, 16)
+        assert np.array_equal(reader[1000:2000, :], data[1000:2000, :])
+        assert np.array_equal(reader[4999], data[4999])
+        assert np.array_equal(reader[-3:], data[-3:])
+        assert np.array_equal(np.asarray(reader), data)
+
+def test_nd_grid_indexing():
+    proto = NFCPrototype(clevel=1)
+    data = np.random.randint(0, 1000, size=(37, 23, 11)).astype(np.int32)
+    reader = proto.open_chunked(_compress(proto, data, chunks=(8, 5, None), use_prediction=True), workers=2)
+    keys = [
+        (slice(3, 30), slice(4, 9), 7),
+        (5, Ellipsis),
+        (slice(None, None, -3), slice(1, 20, 4)),
+        (slice(10, 10),),
+        (Ellipsis, -1),
+    ]
+    for key in keys:
+        assert np.array_equal(reader[key], data[key])
+
+def test_only_touched_chunks_are_decoded():
+    proto = NFCPrototype(clevel=1)
+    data = np.arange(1000 * 8, dtype=np.int64).reshape(1000, 8)
+    reader = proto.open_chunked(_compress(proto, data, chunks=100))
+    calls = []
+    decompress = proto.decompress
+    proto.decompress = lambda blob: calls.append(1) or decompress(blob)
+    assert np.array_equal(reader[150:250], data[150:250])
+    assert len(calls) == 2
+
+def test_index_errors():
+    proto = NFCPrototype(clevel=1)
+    reader = proto.open_chunked(_compress(proto, np.zeros((4, 4), dtype=np.uint8)))
+    for key in [(4,), (0, 0, 0)]:
+        try:
+            reader[key]
+            assert False, "Should raise IndexError"
+        except IndexError:
+            pass
@@ -0,0 +1,52 @@
+import io
+import os
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.dedup import ChunkStore, iter_cdc_chunks
+
+def _checkpoint(seed, n_layers=6, layer_bytes=200_000):
+    rng = np.random.default_rng(0)
+    layers = [rng.standard_normal(layer_bytes // 4).astype(np.float32) for _ in range(n_layers)]
+    layers[seed % n_layers] += np.float32(seed) # one layer changes per step
+    header = ("step=%d;" % seed * (seed + 1)).encode() # variable-length header shifts every offset
+    return header + b''.join(layer.tobytes() for layer in layers)
+
+def test_cdc_cuts_resync_after_insertion():
+    data = os.urandom(3_000_000)
+    edited = data[:1_000_000] + b'inserted bytes' + data[1_000_000:]
+    chunks = list(iter_cdc_chunks(io.BytesIO(data), avg_size=65536, read_size=100_000))
+    edited_chunks = list(iter_cdc_chunks(io.BytesIO(edited), avg_size=65536))
+    assert b''.join(chunks) == data and b''.join(edited_chunks) == edited
+    assert max(map(len, chunks)) <= 4 * 65536
+    shared = set(chunks) & set(edited_chunks)
+    assert len(shared) >= len(chunks) - 3 # only the chunks around the insertion change
+
+def test_dedup_roundtrip_stores_only_new_chunks(tmp_path):
+    proto = NFCPrototype(clevel=1)
+    store = ChunkStore(tmp_path / "store")
+    first = tmp_path / "ckpt1.bin"
+    second = tmp_path / "ckpt2.bin"
+    first.write_bytes(_checkpoint(1))
+    second.write_bytes(_checkpoint(2))
+
+    summary1 = proto.compress_dedup(first, tmp_path / "ckpt1.nfcm", store, avg_chunk_size=32768)
+    assert summary1["new_chunks"] == len(store) > 1
+    summary2 = proto.compress_dedup(second, tmp_path / "ckpt2.nfcm", store, avg_chunk_size=32768, workers=2)
+    assert summary2["bytes_in"] == second.stat().st_size
+    assert summary2["new_chunks"] < summary2["chunks"] // 2
+    assert len(store) == summary1["new_chunks"] + summary2["new_chunks"]
+
+    for name, original in (("ckpt1", first), ("ckpt2", second)):
+        proto.decompress_dedup(tmp_path / f"{name}.nfcm", tmp_path / f"{name}.out", tmp_path / "store", workers=2)
+        assert (tmp_path / f"{name}.out").read_bytes() == original.read_bytes()
+
+def test_dedup_missing_chunk(tmp_path):
+    proto = NFCPrototype(clevel=1)
+    src = tmp_path / "in.bin"
+    src.write_bytes(os.urandom(100_000))
+    proto.compress_dedup(src, tmp_path / "in.nfcm", tmp_path / "store", avg_chunk_size=16384)
+    store = ChunkStore(tmp_path / "store")
+    os.remove(store._path(next(store.keys())))
+    with pytest.raises(KeyError, match="missing from store"):
+        proto.decompress_dedup(tmp_path / "in.nfcm", tmp_path / "out.bin", store)
@@ -0,0 +1,65 @@
+import json
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+
+pytest.importorskip("zstandard")
+from nfc_prototype.dictionary import NFCDictionary, DICT_RECORD_HEADER
+
+def _objects(n=300, seed=0):
+    # Small objects sharing structure: request metadata and token ids with common prefixes
+    rng = np.random.default_rng(seed)
+    prompt = rng.integers(0, 32000, 200).astype(np.int32)
+    objects = []
+    for i in range(n):
+        meta = {"request_id": f"req-{i:08d}", "model": "llama-7b", "temperature": 0.7,
+                "max_tokens": int(rng.integers(16, 512)), "stop": ["</s>", "\n\n"], "user": f"user-{i % 17}"}
+        objects.append(json.dumps(meta).encode('utf-8') * 4)
+        objects.append(np.concatenate([prompt, rng.integers(0, 32000, int(rng.integers(100, 800))).astype(np.int32)]))
+    return objects
+
+def test_dictionary_roundtrip_and_ratio(tmp_path):
+    objects = _objects()
+    proto = NFCPrototype(hash_algo='crc32')
+    dictionary = proto.train_dictionary(objects[:200], dict_size=16 * 1024)
+
+    plain_total = dict_total = 0
+    for obj in objects[200:]:
+        record, orig_size, comp_size = proto.compress(obj, dictionary=dictionary)
+        assert record[:4] == b'NFCD'
+        restored = proto.decompress(record)
+        if isinstance(obj, np.ndarray):
+            assert restored.dtype == obj.dtype and np.array_equal(restored, obj)
+            out = np.empty_like(obj)
+            proto.decompress_into(record, out)
+            assert np.array_equal(out, obj)
+        else:
+            assert restored == obj
+        dict_total += comp_size
+        plain_total += proto.compress(obj)[2]
+    assert dict_total * 1.5 < plain_total
+
+    path = tmp_path / "objects.dict"
+    dictionary.save(path)
+    loaded = NFCDictionary.load(path)
+    assert loaded.dict_id == dictionary.dict_id and loaded.level == dictionary.level
+    reader = NFCPrototype(dictionaries=[loaded])
+    record, _, _ = proto.compress(objects[-1], dictionary=dictionary)
+    assert np.array_equal(reader.decompress(record), objects[-1])
+
+def test_missing_dictionary_and_corruption():
+    objects = _objects(100)
+    proto = NFCPrototype()
+    dictionary = proto.train_dictionary(objects, dict_size=8 * 1024)
+    record, _, _ = proto.compress(objects[3], dictionary=dictionary)
+    with pytest.raises(ValueError, match="dictionary id"):
+        NFCPrototype().decompress(record)
+    corrupted = bytearray(record)
+    corrupted[-1] ^= 0xFF
+    with pytest.raises(ValueError):
+        proto.decompress(bytes(corrupted))
+    assert DICT_RECORD_HEADER.size == 18
+
+def test_training_needs_samples():
+    with pytest.raises(ValueError):
+        NFCDictionary.train([b"x"])
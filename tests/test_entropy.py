@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype import entropy
+from nfc_prototype.stats import Stats
+
+def _samples():
+    rng = np.random.default_rng(0)
+    return {
+        "skewed": rng.geometric(0.2, 300_000).astype(np.uint8).tobytes(),
+        "random": rng.integers(0, 256, 50_000, dtype=np.uint8).tobytes(),
+        "single": b"\x07" * 10_000,
+        "two": b"ab" * 3,
+        "one": b"z",
+        "empty": b"",
+    }
+
+@pytest.mark.parametrize("name", list(_samples()))
+def test_stage_roundtrip(name):
+    data = _samples()[name]
+    proto = NFCPrototype()
+    payload = b''.join(entropy.encode(proto, data, block_size=64 * 1024))
+    assert entropy.decoded_size(payload) == len(data)
+    assert entropy.decode(proto, payload).tobytes() == data
+    if name == "skewed":
+        assert len(payload) < len(data) * 0.5
+    if name == "random":
+        assert len(payload) < len(data) + 100 # incompressible planes are stored raw
+
+def test_code_lengths_are_limited():
+    # Fibonacci counts give the deepest possible Huffman tree
+    counts = np.zeros(256, dtype=np.int64)
+    fib = [1, 1]
+    while len(fib) < 40:
+        fib.append(fib[-1] + fib[-2])
+    counts[:40] = fib
+    lengths = entropy.code_lengths(counts)
+    assert lengths.max() <= entropy.MAX_CODE_LENGTH
+    assert (2.0 ** -lengths[:40].astype(float)).sum() <= 1.0 # still a prefix code
+    data = np.repeat(np.arange(40, dtype=np.uint8), np.minimum(fib, 50_000)).tobytes()
+    assert entropy.decode(NFCPrototype(), b''.join(entropy.encode(NFCPrototype(), data))).tobytes() == data
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64, np.float16, np.int16, np.int64, np.uint8])
+def test_record_roundtrip_per_dtype(dtype):
+    rng = np.random.default_rng(1)
+    original = (rng.standard_normal((200, 300)) * 3).astype(dtype)
+    proto = NFCPrototype(hash_algo='crc32')
+    for kwargs in ({}, dict(predictor='axis_delta', predictor_params={'axis': 1})):
+        nfc_binary, _, _ = proto.compress(original, force_arithmetic=True, **kwargs)
+        assert nfc_binary[5] & proto.ARITHMETIC_CODING_FLAG and nfc_binary[5] & proto.BINARY_METADATA_FLAG
+        assert proto._parse_record(nfc_binary)[2]["compression_stack"] == ["huffman"]
+        assert np.array_equal(NFCPrototype().decompress(nfc_binary), original)
+        out = np.empty_like(original)
+        assert NFCPrototype().decompress_into(nfc_binary, out) is out and np.array_equal(out, original)
+
+def test_parallel_blocks_and_json_metadata():
+    rng = np.random.default_rng(2)
+    original = np.cumsum(rng.standard_normal(200_000)).astype(np.float32)
+    stats = Stats()
+    proto = NFCPrototype(nthreads=3, block_size=64 * 1024, entropy_coding=True, metadata_format='json', stats=stats)
+    nfc_binary = proto.compress(original, predictor='modular_delta')[0]
+    assert not nfc_binary[5] & proto.BINARY_METADATA_FLAG
+    assert np.array_equal(NFCPrototype(nthreads=2, stats=stats).decompress(nfc_binary), original)
+    stages = stats.snapshot()["stages"]
+    assert stages["compress.huffman"]["calls"] == 1 and stages["decompress.huffman"]["calls"] == 1
+
+def test_stream_with_entropy_coding(tmp_path):
+    rng = np.random.default_rng(3)
+    src, packed, restored = tmp_path / "in.bin", tmp_path / "in.nfc", tmp_path / "out.bin"
+    src.write_bytes(rng.geometric(0.1, 600_000).astype(np.uint8).tobytes())
+    proto = NFCPrototype(entropy_coding=True, hash_algo='crc32')
+    proto.compress_stream(src, packed, chunk_size=200_000, workers=2)
+    assert packed.stat().st_size < src.stat().st_size * 0.7
+    NFCPrototype().decompress_stream(packed, restored, workers=2)
+    assert restored.read_bytes() == src.read_bytes()
+
+def test_corrupt_payload():
+    data = np.random.default_rng(4).geometric(0.3, 20_000).astype(np.uint8).tobytes()
+    payload = bytearray(b''.join(entropy.encode(NFCPrototype(), data)))
+    with pytest.raises(ValueError, match="block lengths"):
+        entropy.decode(NFCPrototype(), bytes(payload[:-1]))
+    payload[-40] ^= 0xFF
+    try:
+        assert entropy.decode(NFCPrototype(), bytes(payload)).tobytes() != data
+    except ValueError:
+        pass
+
+def test_two_symbol_plane_is_bit_packed():
+    data = np.where(np.random.default_rng(5).random(10_001) < 0.5, 0x80, 0x03).astype(np.uint8).tobytes()
+    block = entropy.encode_plane(np.frombuffer(data, dtype=np.uint8))
+    assert block[0] == entropy.PLANE_BITS and len(block) == 3 + (10_001 + 7) // 8
+    assert entropy.decode(NFCPrototype(), b''.join(entropy.encode(NFCPrototype(), data))).tobytes() == data
+
+def test_forged_headers_and_fuzzed_payloads_raise_value_error():
+    proto = NFCPrototype()
+    data = np.random.default_rng(6).geometric(0.3, 6_000).astype(np.uint16).tobytes()
+    payload = b''.join(entropy.encode(proto, data, typesize=2, block_size=4096))
+    version, typesize, block_size, nbytes = entropy.ENTROPY_HEADER.unpack_from(payload)
+    for fields, match in (((typesize, 0, nbytes), "header"), ((0, block_size, nbytes), "header"),
+                          ((typesize, block_size, 2**60), "block table")):
+        forged = entropy.ENTROPY_HEADER.pack(version, *fields) + payload[entropy.ENTROPY_HEADER.size:]
+        with pytest.raises(ValueError, match=match):
+            entropy.decode(proto, forged)
+    forged = entropy.ENTROPY_HEADER.pack(version, typesize, 2**32 - 2, 2**40) + payload[entropy.ENTROPY_HEADER.size:]
+    with pytest.raises(ValueError, match="record decodes to"):
+        entropy.decode(proto, forged, nbytes=len(data))
+
+    rng = np.random.default_rng(7)
+    for _ in range(300):
+        fuzzed = bytearray(payload)
+        for position in rng.integers(entropy.ENTROPY_HEADER.size, len(payload), 3):
+            fuzzed[position] = rng.integers(0, 256)
+        try:
+            entropy.decode(proto, bytes(fuzzed), nbytes=len(data))
+        except ValueError:
+            pass
@@ -0,0 +1,120 @@
+import io
+import os
+import tarfile
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+
+class NonSeekable(io.RawIOBase):
+    # Pipe-like wrapper: forward-only, no seek/tell
+    def __init__(self, raw):
+        self._raw = raw
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self._raw.readinto(b)
+
+    def write(self, b):
+        return self._raw.write(b)
+
+    def writable(self):
+        return True
+
+def _payload(size):
+    return np.arange(size // 4, dtype=np.int32).tobytes() + os.urandom(size % 4)
+
+def test_writer_matches_compress_stream(tmp_path):
+    proto = NFCPrototype(clevel=1)
+    original = _payload(1_000_003)
+    src = tmp_path / "in.bin"
+    src.write_bytes(original)
+    proto.compress_stream(src, tmp_path / "ref.nfc", chunk_size=65536)
+
+    for workers in (1, 3):
+        buf = io.BytesIO()
+        with proto.open_writer(NonSeekable(buf), chunk_size=65536, workers=workers) as writer:
+            for start in range(0, len(original), 7777): # arbitrary-sized writes
+                writer.write(original[start:start + 7777])
+            assert writer.tell() == len(original)
+        assert buf.getvalue() == (tmp_path / "ref.nfc").read_bytes()
+
+def test_reader_seek_and_readinto(tmp_path):
+    proto = NFCPrototype(clevel=1)
+    original = _payload(500_000)
+    path = tmp_path / "data.nfc"
+    with proto.open_writer(path, chunk_size=32768) as writer:
+        writer.write(original)
+
+    with proto.open_reader(path) as reader:
+        assert reader.seekable()
+        assert reader.seek(0, io.SEEK_END) == len(original)
+        reader.seek(100_000)
+        buf = bytearray(65536 * 2) # spans whole blocks and partial ones
+        assert reader.readinto(buf) == len(buf)
+        assert bytes(buf) == original[100_000:100_000 + len(buf)]
+        reader.seek(-10, io.SEEK_END)
+        assert reader.read(100) == original[-10:]
+        assert reader.read(100) == b''
+        reader.seek(32768)
+        block = bytearray(32768) # exactly one block, decoded straight into buf
+        assert reader.readinto(block) == 32768 and bytes(block) == original[32768:65536]
+        reader.seek(0)
+        assert reader.read() == original
+
+    buffered = io.BufferedReader(proto.open_reader(path), buffer_size=10_000)
+    assert buffered.read(12345) == original[:12345]
+    buffered.seek(400_000)
+    assert buffered.read() == original[400_000:]
+
+def test_reader_without_index_reads_sequentially():
+    proto = NFCPrototype(clevel=1)
+    original = _payload(200_001)
+    buf = io.BytesIO()
+    with proto.open_writer(buf, chunk_size=30000, index=False) as writer:
+        writer.write(original)
+    reader = proto.open_reader(NonSeekable(io.BytesIO(buf.getvalue())))
+    assert not reader.seekable()
+    with pytest.raises(io.UnsupportedOperation):
+        reader.seek(0)
+    parts = []
+    while True:
+        part = reader.read(4096)
+        if not part:
+            break
+        parts.append(part)
+    assert b''.join(parts) == original
+
+def test_np_load_and_tarfile_member(tmp_path):
+    proto = NFCPrototype()
+    array = np.random.default_rng(0).standard_normal((300, 40))
+    npy = io.BytesIO()
+    np.save(npy, array)
+    nfc = io.BytesIO()
+    with proto.open_writer(nfc, chunk_size=16384) as writer:
+        writer.write(npy.getvalue())
+
+    tar_path = tmp_path / "bundle.tar"
+    with tarfile.open(tar_path, "w") as tar:
+        info = tarfile.TarInfo("array.npy.nfc")
+        info.size = len(nfc.getvalue())
+        tar.addfile(info, io.BytesIO(nfc.getvalue()))
+    with tarfile.open(tar_path) as tar:
+        member = tar.extractfile("array.npy.nfc")
+        with io.BufferedReader(proto.open_reader(member)) as reader:
+            assert np.array_equal(np.load(reader), array)
+
+def test_read_past_end_and_corruption():
+    proto = NFCPrototype()
+    buf = io.BytesIO()
+    with proto.open_writer(buf, chunk_size=10000) as writer:
+        writer.write(bytes(range(256)) * 100)
+    reader = proto.open_reader(io.BytesIO(buf.getvalue()))
+    reader.seek(10**6)
+    assert reader.read(10) == b'' and reader.readinto(bytearray(10)) == 0
+
+    corrupted = bytearray(buf.getvalue())
+    corrupted[len(corrupted) // 2] ^= 0xFF
+    with pytest.raises(ValueError):
+        proto.open_reader(io.BytesIO(bytes(corrupted))).read()
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype import floatsplit
+from nfc_prototype.backends import available_backends
+
+def _weights(dtype, shape=(400, 301), seed=0):
+    return (np.random.default_rng(seed).standard_normal(shape) * 0.02).astype(dtype)
+
+@pytest.mark.parametrize("dtype", ['<f2', '>f2', '<f4', '>f4', '<f8', '>f8'])
+def test_roundtrip_per_dtype(dtype):
+    original = _weights(dtype)
+    proto = NFCPrototype(float_split=True, hash_algo='crc32')
+    nfc_binary = proto.compress(original)[0]
+    assert nfc_binary[5] & proto.SPLIT_FLAG and nfc_binary[5] & proto.BINARY_METADATA_FLAG
+    assert proto._parse_record(nfc_binary)[2]["compression_stack"] == ["float_split"]
+    restored = NFCPrototype().decompress(nfc_binary)
+    assert restored.dtype == original.dtype and restored.tobytes() == original.tobytes()
+    out = np.empty_like(original)
+    assert NFCPrototype().decompress_into(nfc_binary, out) is out and out.tobytes() == original.tobytes()
+
+def test_split_merge_is_bit_exact():
+    special = np.array([0.0, -0.0, np.inf, -np.inf, np.nan, -np.nan, 1e-45, -1e-40, 3.4e38, 1.0], dtype=np.float32)
+    bits = special.view(np.uint32)
+    planes = floatsplit.split(bits)
+    # Top plane of a rotated float32 is its exponent field
+    assert np.array_equal(planes[0], (bits >> 23) & 0xFF)
+    out = np.empty_like(bits)
+    floatsplit.merge(planes, out)
+    assert np.array_equal(out, bits)
+
+def test_streams_pick_their_own_coder():
+    proto = NFCPrototype(float_split=True, metadata_format='json')
+    nfc_binary = proto.compress(_weights(np.float32))[0]
+    coders = floatsplit.stream_coders(proto._parse_record(nfc_binary)[3])
+    assert len(coders) == 4
+    # Exponents compress; random low mantissa planes are stored raw
+    assert coders[0][0] != floatsplit.STREAM_RAW
+    assert [mode for mode, *_ in coders[2:]] == [floatsplit.STREAM_RAW] * 2
+    assert len(nfc_binary) < len(NFCPrototype(clevel=9).compress(_weights(np.float32))[0])
+
+def test_smooth_and_blocked_streams():
+    t = np.linspace(0, 200, 300_000)
+    original = (np.sin(t) * 100 + t).astype(np.float32)
+    proto = NFCPrototype(float_split=True, block_size=100_000, nthreads=2)
+    nfc_binary = proto.compress(original)[0]
+    coders = floatsplit.stream_coders(proto._parse_record(nfc_binary)[3])
+    assert coders[0][0] == floatsplit.STREAM_BLOCKED
+    assert len(nfc_binary) < original.nbytes / 2
+    assert np.array_equal(NFCPrototype(nthreads=2).decompress(nfc_binary), original)
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_split_per_backend(backend):
+    original = _weights(np.float16)
+    nfc_binary = NFCPrototype(float_split=True, backend=backend).compress(original)[0]
+    assert np.array_equal(NFCPrototype().decompress(nfc_binary), original)
+
+def test_split_is_skipped():
+    proto = NFCPrototype(float_split=True)
+    for data, kwargs in ((np.arange(10_000, dtype=np.int32), {}), (b"bytes " * 1000, {}),
+                         (_weights(np.float32), dict(predictor='modular_delta'))):
+        nfc_binary = proto.compress(data, **kwargs)[0]
+        assert not nfc_binary[5] & proto.SPLIT_FLAG
+        restored = NFCPrototype().decompress(nfc_binary)
+        assert restored == data if isinstance(data, bytes) else np.array_equal(restored, data)
+    empty = np.zeros((0, 3), dtype=np.float32)
+    assert NFCPrototype().decompress(proto.compress(empty)[0]).shape == (0, 3)
+
+def test_stream_and_corruption(tmp_path):
+    src, packed, restored = tmp_path / "w.bin", tmp_path / "w.nfc", tmp_path / "out.bin"
+    src.write_bytes(_weights(np.float32, (600, 1000)).tobytes())
+    NFCPrototype(float_split=True).compress_stream(src, packed, chunk_size=1_000_000, workers=2)
+    NFCPrototype().decompress_stream(packed, restored, workers=2)
+    assert restored.read_bytes() == src.read_bytes()
+
+    payload = b''.join(floatsplit.encode(NFCPrototype(), _weights(np.float32).tobytes(), np.float32,
+                                         NFCPrototype().backend))
+    with pytest.raises(ValueError, match="payload length"):
+        floatsplit.decode(NFCPrototype(), payload + b'x', NFCPrototype().backend)
+
+def test_forged_headers_and_fuzzed_payloads_raise_value_error():
+    proto = NFCPrototype()
+    original = _weights('<f4', shape=(50, 100))
+    payload = b''.join(map(bytes, floatsplit.encode(proto, original.tobytes(), original.dtype, proto.backend)))
+    version, itemsize, big_endian, n = floatsplit.SPLIT_HEADER.unpack_from(payload)
+    body = payload[floatsplit.SPLIT_HEADER.size:]
+    for fields, match in (((3, big_endian, n), "header"), ((0, big_endian, n), "header"),
+                          ((8, big_endian, n), "(?i)float split")):
+        with pytest.raises(ValueError, match=match):
+            floatsplit.decode(proto, floatsplit.SPLIT_HEADER.pack(version, *fields) + body, proto.backend)
+    forged = floatsplit.SPLIT_HEADER.pack(version, itemsize, big_endian, 2**60) + body
+    with pytest.raises(ValueError, match="record decodes to"):
+        floatsplit.decode(proto, forged, proto.backend, nbytes=original.nbytes)
+    forged = bytearray(payload)
+    forged[floatsplit.SPLIT_HEADER.size + 1] = 200 # first stream's codec index
+    with pytest.raises(ValueError, match="codec"):
+        floatsplit.decode(proto, bytes(forged), proto.backend)
+
+    rng = np.random.default_rng(8)
+    for _ in range(300):
+        fuzzed = bytearray(payload)
+        for position in rng.integers(0, floatsplit.SPLIT_HEADER.size + itemsize * floatsplit.STREAM_ENTRY.size, 2):
+            fuzzed[position] = rng.integers(0, 256)
+        try:
+            floatsplit.decode(proto, bytes(fuzzed), proto.backend, nbytes=original.nbytes)
+        except ValueError:
+            pass
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.hashing import HASH_ALGORITHMS, available_hashes, digest_blocks
+
+# Records written by v0.4.0 (reserved header bytes = 0, one SHA-256 over the payload)
+LEGACY_BYTES_RECORD = bytes.fromhex(
+    "4e464332020000000000000000000022000000000000003d000000000000001b00207b22666f726d61745f68696e74223a2022"
+    "6279746573222c2022636f6d7072657373696f6e5f737461636b223a205b22626c6f73635f7a737464225d7d020193080b0000"
+    "00080000001b00000068656c6c6f20776f726c64b94d27b9934d3e08a52e52d7da7dabfac484efe37a5380ee9088f7ace2efcde9"
+)
+
+@pytest.mark.parametrize("algo", available_hashes())
+def test_roundtrip_per_algorithm(algo):
+    proto = NFCPrototype(clevel=1, hash_algo=algo)
+    original = np.arange(300000, dtype=np.float32)
+    nfc_binary, _, _ = proto.compress(original)
+    assert nfc_binary[6] == HASH_ALGORITHMS[algo][0]
+    # Any reader decodes any algorithm: the id travels in the header
+    assert np.array_equal(NFCPrototype().decompress(nfc_binary), original)
+
+@pytest.mark.parametrize("algo", available_hashes())
+def test_corruption_per_algorithm(algo):
+    proto = NFCPrototype(clevel=1, hash_algo=algo)
+    nfc_binary, _, _ = proto.compress(np.arange(1000, dtype=np.int16))
+    corrupted = bytearray(nfc_binary)
+    corrupted[-1] ^= 0xFF
+    with pytest.raises(ValueError):
+        proto.decompress(bytes(corrupted))
+
+def test_per_block_checksums_are_parallel_safe():
+    data = memoryview(np.random.randint(0, 255, 10 * 1024 * 1024 + 7, dtype=np.uint8))
+    serial = digest_blocks('sha256', data, 1024 * 1024)
+    assert len(serial) == 11 * 32
+    assert digest_blocks('sha256', data, 1024 * 1024, workers=4) == serial
+
+def test_multithreaded_proto_roundtrip():
+    proto = NFCPrototype(clevel=1, nthreads=4)
+    original = np.arange(3 * 1024 * 1024, dtype=np.int32)
+    nfc_binary, _, _ = proto.compress(original)
+    assert np.array_equal(proto.decompress(nfc_binary), original)
+
+def test_legacy_record_still_decodes():
+    assert NFCPrototype().decompress(LEGACY_BYTES_RECORD) == b"hello world"
+
+def test_unknown_algorithm():
+    with pytest.raises(ValueError):
+        NFCPrototype(hash_algo='md5')
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.metadata import decode_metadata, encode_metadata
+
+CONSTANT_KEYS = ("schema_version", "orig_bytes", "created_by", "created_at")
+
+def _cases():
+    rng = np.random.default_rng(0)
+    ramp = np.cumsum(rng.normal(size=(64, 300)), axis=1).astype('>f4') # non-native byte order
+    return [
+        (b"plain bytes" * 100, {}),
+        (rng.integers(0, 256, 8192, dtype=np.uint8).tobytes(), {}), # stored
+        (ramp, dict(predictor='axis_delta', predictor_params={'axis': 1})),
+        (ramp, dict(predictor='lorenzo')),
+        (np.arange(10_000, dtype=np.int64), dict(use_prediction=True)),
+        (np.zeros((3, 0, 2), dtype=np.complex64), {}),
+        (np.array(True), {}),
+        (np.arange(4096, dtype=np.uint16), dict(reference=np.ones(4096, dtype=np.uint16), reference_mode='sub')),
+    ]
+
+@pytest.mark.parametrize("data, kwargs", _cases(), ids=range(len(_cases())))
+def test_binary_metadata_matches_json(data, kwargs):
+    binary_proto = NFCPrototype()
+    json_proto = NFCPrototype(metadata_format='json')
+    binary = binary_proto.compress(data, **kwargs)[0]
+    legacy = json_proto.compress(data, **kwargs)[0]
+    assert binary[5] & binary_proto.BINARY_METADATA_FLAG and not legacy[5] & binary_proto.BINARY_METADATA_FLAG
+    binary_meta = binary_proto._parse_record(binary)[2]
+    legacy_meta = {k: v for k, v in json_proto._parse_record(legacy)[2].items() if k not in CONSTANT_KEYS}
+    assert binary_meta == legacy_meta
+    assert len(binary) < len(legacy) - 50
+
+    # Either reader decodes both forms
+    resolver = kwargs.get("reference")
+    for record in (binary, legacy):
+        for proto in (binary_proto, json_proto):
+            restored = proto.decompress(record, reference=resolver)
+            if isinstance(data, np.ndarray):
+                assert restored.dtype == data.dtype and np.array_equal(restored, data)
+            else:
+                assert restored == data
+
+def test_auto_tuned_and_blocked_metadata():
+    proto = NFCPrototype(codec='auto', block_size=1 << 16)
+    data = np.cumsum(np.random.default_rng(1).normal(size=100_000)).astype(np.float32)
+    record = proto.compress(data)[0]
+    meta = proto._parse_record(record)[2]
+    assert meta["block_size"] == 1 << 16 and meta["auto_tuned"]["predictor"] == meta.get("prediction_model")
+    assert encode_metadata(meta) == bytes(record[34:34 + len(encode_metadata(meta))])
+    assert np.array_equal(proto.decompress(record), data)
+
+def test_unknown_metadata_falls_back_to_json():
+    assert encode_metadata({"format_hint": "bytes", "compression_stack": ["blosc_zstd"], "custom": 1}) is None
+    with pytest.raises(ValueError, match="binary metadata"):
+        decode_metadata(b'\x09\x00')
+
+def test_corrupt_binary_metadata_raises_value_error():
+    meta = {"format_hint": "numpy_tensor", "dtype": "float32", "endianness": "<", "shape": [300, 20],
+            "compression_stack": ["blosc_zstd"], "reference": {"id": "ab" * 32, "mode": "xor"}}
+    raw = encode_metadata(meta)
+    assert decode_metadata(raw) == meta
+    # dtype code, byte order, then ndim and dims as varints, hash block size, stack, codec
+    for position, field in ((3, "byte order"), (9, "compression stack"), (10, "codec")):
+        corrupt = bytearray(raw)
+        corrupt[position] = 0xFE
+        with pytest.raises(ValueError, match=f"Invalid binary metadata: unknown {field}"):
+            decode_metadata(bytes(corrupt))
+    corrupt = bytearray(raw)
+    corrupt[-2] = 0xFE # reference mode
+    with pytest.raises(ValueError, match="unknown reference mode"):
+        decode_metadata(bytes(corrupt))
+    with pytest.raises(ValueError, match="truncated varint"):
+        decode_metadata(raw[:5])
+    for end in [*range(1, 11), *range(12, len(raw))]: # raw[:11] is a valid record without the reference
+        with pytest.raises(ValueError, match="(?i)binary metadata"):
+            decode_metadata(raw[:end])
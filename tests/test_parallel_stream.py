@@ -0,0 +1,52 @@
+import os
+import numpy as np
+from nfc_prototype.core import NFCPrototype
+
+def _write_input(path, size):
+    data = np.arange(size // 4, dtype=np.float32).tobytes() + os.urandom(size % 4)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return data
+
+def test_parallel_compress_matches_serial(tmp_path):
+    proto = NFCPrototype()
+    src = tmp_path / "input.bin"
+    _write_input(src, 5 * 1024 * 1024 + 3)
+    serial_out = tmp_path / "serial.nfc"
+    parallel_out = tmp_path / "parallel.nfc"
+    proto.compress_stream(src, serial_out, chunk_size=256 * 1024)
+    proto.compress_stream(src, parallel_out, chunk_size=256 * 1024, workers=4)
+    assert serial_out.read_bytes() == parallel_out.read_bytes()
+
+def test_parallel_decompress_roundtrip(tmp_path):
+    proto = NFCPrototype()
+    src = tmp_path / "input.bin"
+    original = _write_input(src, 3 * 1024 * 1024 + 1)
+    nfc_path = tmp_path / "input.nfc"
+    out = tmp_path / "output.bin"
+    proto.compress_stream(src, nfc_path, chunk_size=128 * 1024, workers=3)
+    proto.decompress_stream(nfc_path, out, workers=3)
+    assert out.read_bytes() == original
+
+def test_parallel_decompress_detects_truncation(tmp_path):
+    proto = NFCPrototype()
+    src = tmp_path / "input.bin"
+    _write_input(src, 1024 * 1024)
+    nfc_path = tmp_path / "input.nfc"
+    proto.compress_stream(src, nfc_path, chunk_size=64 * 1024, workers=2)
+    truncated = tmp_path / "truncated.nfc"
+    truncated.write_bytes(nfc_path.read_bytes()[:-100])
+    try:
+        proto.decompress_stream(truncated, tmp_path / "out.bin", workers=2)
+        assert False, "Should fail on truncated stream"
+    except ValueError:
+        pass
+
+if __name__ == "__main__":
+    import tempfile
+    import pathlib
+    with tempfile.TemporaryDirectory() as d:
+        test_parallel_compress_matches_serial(pathlib.Path(d))
+        test_parallel_decompress_roundtrip(pathlib.Path(d))
+        test_parallel_decompress_detects_truncation(pathlib.Path(d))
+    print("All tests passed!")
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype import predictors
+
+# uint8 tensor compressed by v0.4.0 with use_prediction=True (widened int16 residuals)
+LEGACY_DELTA_RECORD = bytes.fromhex(
+    "4e4643320200000000000000000000220000000000000167000000000000002400207b22736368656d615f76657273696f6e"
+    "223a20226e66632d302e32222c20226474797065223a202275696e7438222c2022656e6469616e6e657373223a20227c222c"
+    "20227368617065223a205b31305d2c2022666f726d61745f68696e74223a20226e756d70795f74656e736f72222c20226f72"
+    "69675f6279746573223a2031302c2022637265617465645f6279223a20226e66632d70726f746f7479706520302e322e3022"
+    "2c2022637265617465645f6174223a2022323032352d31322d31375430303a30303a30305a222c202270726564696374696f"
+    "6e5f6d6f64656c223a202264656c74615f656e636f64696e67222c20226f726967696e616c5f6474797065223a202275696e"
+    "7438222c20226f726967696e616c5f7368617065223a205b31305d2c2022726573696475616c735f6474797065223a202269"
+    "6e743136222c2022636f6d7072657373696f6e5f737461636b223a205b22626c6f73635f7a737464225d7d02019302140000"
+    "0014000000240000000a000200fefffbff03000c00eb00fbff06ff0500b2b7cdeaafcad4e8d0476711f6cd8316485f467a21"
+    "28210c466c17ee4bd90cfe"
+)
+
+DTYPES = [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32, np.uint64, np.int64,
+          np.float16, np.float32, np.float64, np.complex64]
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_modular_delta_is_bit_exact(dtype):
+    rng = np.random.default_rng(0)
+    raw = rng.integers(0, 256, size=4000 * np.dtype(dtype).itemsize, dtype=np.uint8)
+    data = raw.view(dtype).reshape(40, -1) # includes NaN/inf bit patterns for floats
+    proto = NFCPrototype(clevel=1)
+    nfc_binary, _, _ = proto.compress(data, use_prediction=True)
+    decompressed = proto.decompress(nfc_binary)
+    assert decompressed.dtype == data.dtype and decompressed.shape == data.shape
+    assert decompressed.tobytes() == data.tobytes()
+
+def test_residuals_keep_input_width():
+    data = np.cumsum(np.ones(10000, dtype=np.float32))
+    residuals = predictors.predict("modular_delta", data)
+    assert residuals.dtype == np.uint32 and residuals.nbytes == data.nbytes
+    extremes = np.array([0, 255, 1, 254, 128], dtype=np.uint8)
+    assert np.array_equal(predictors.reconstruct("modular_delta", predictors.predict("modular_delta", extremes).view(np.uint8), 1), extremes)
+
+def test_prediction_decompress_into():
+    data = np.linspace(-5, 5, 50000, dtype=np.float32).reshape(100, 500)
+    proto = NFCPrototype(clevel=1)
+    nfc_binary, _, _ = proto.compress(data, use_prediction=True)
+    out = np.empty_like(data)
+    proto.decompress_into(nfc_binary, out)
+    assert np.array_equal(out, data)
+
+def test_legacy_delta_encoding_record():
+    expected = np.array([10, 12, 10, 5, 8, 20, 255, 250, 0, 5], dtype=np.uint8)
+    assert np.array_equal(NFCPrototype().decompress(LEGACY_DELTA_RECORD), expected)
+
+PREDICTOR_CONFIGS = [
+    ("modular_delta", None),
+    ("axis_delta", {"axis": 1}),
+    ("axis_delta", {"axis": -3}),
+    ("lorenzo", None),
+    ("lorenzo", {"axes": [0, 2]}),
+    ("stride_delta", {"stride": 7}),
+    ("stride_delta", {"stride": 1000}),
+    ("xor", None),
+]
+
+@pytest.mark.parametrize("name,params", PREDICTOR_CONFIGS)
+@pytest.mark.parametrize("dtype", [np.uint8, np.int16, np.float32, np.float64])
+def test_registry_roundtrip(name, params, dtype):
+    rng = np.random.default_rng(1)
+    data = np.cumsum(rng.normal(size=(6, 13, 17)), axis=1).astype(dtype)
+    proto = NFCPrototype(clevel=1)
+    nfc_binary, _, _ = proto.compress(data, predictor=name, predictor_params=params)
+    # decompress dispatches on the recorded predictor name and params
+    assert NFCPrototype().decompress(nfc_binary).tobytes() == data.tobytes()
+
+def test_lorenzo_matches_2d_formula():
+    x = np.random.default_rng(2).integers(0, 2**16, size=(20, 30), dtype=np.uint16)
+    residuals = predictors.predict("lorenzo", x)
+    expected = x[1:, 1:] - x[:-1, 1:] - x[1:, :-1] + x[:-1, :-1]
+    assert np.array_equal(residuals[1:, 1:], expected)
+
+def test_params_validation():
+    proto = NFCPrototype(clevel=1)
+    data = np.zeros((4, 4), dtype=np.float32)
+    for name, params in [("axis_delta", {"axis": 2}), ("stride_delta", {"stride": 0}), ("xor", {"axis": 0}), ("nope", None)]:
+        with pytest.raises(ValueError):
+            proto.compress(data, predictor=name, predictor_params=params)
@@ -0,0 +1,98 @@
+import json
+import os
+import struct
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.reference import Reference
+
+def _safetensors(tensors):
+    # Minimal safetensors writer for float tensors: header JSON padded to 8 bytes, then raw data
+    header, blobs, offset = {}, [], 0
+    for name, array in tensors.items():
+        raw = np.ascontiguousarray(array).tobytes()
+        code = {np.dtype('float32'): 'F32', np.dtype('float16'): 'F16'}[array.dtype]
+        header[name] = {"dtype": code, "shape": list(array.shape), "data_offsets": [offset, offset + len(raw)]}
+        blobs.append(raw)
+        offset += len(raw)
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+    return struct.pack('<Q', len(header_bytes)) + header_bytes + b''.join(blobs)
+
+def _fine_tune(base, fraction=0.05, seed=1):
+    # Same tensor with a small fraction of weights nudged, like a merged LoRA delta
+    rng = np.random.default_rng(seed)
+    tuned = base.copy()
+    mask = rng.random(base.shape) < fraction
+    tuned[mask] += (rng.standard_normal(mask.sum()) * 1e-3).astype(base.dtype)
+    return tuned
+
+@pytest.mark.parametrize("mode", ["xor", "sub"])
+def test_reference_roundtrip_and_resolvers(mode):
+    proto = NFCPrototype()
+    base = np.random.default_rng(0).standard_normal((256, 256)).astype(np.float32)
+    tuned = _fine_tune(base)
+    record = proto.compress(tuned, reference=base, reference_mode=mode)[0]
+    assert len(record) * 4 < len(proto.compress(tuned)[0])
+
+    ref = Reference(base)
+    for resolver in (base, ref, {ref.id: base}, lambda ref_id: base if ref_id == ref.id else None):
+        restored = proto.decompress(record, reference=resolver)
+        assert restored.dtype == tuned.dtype and np.array_equal(restored.view(np.uint32), tuned.view(np.uint32))
+    assert np.array_equal(NFCPrototype(references=ref).decompress(record), tuned)
+    out = np.empty_like(tuned)
+    proto.decompress_into(record, out, reference=ref)
+    assert np.array_equal(out, tuned)
+
+def test_reference_errors():
+    proto = NFCPrototype()
+    base = np.arange(4096, dtype=np.int32)
+    record = proto.compress(base + 1, reference=base)[0]
+    with pytest.raises(ValueError, match="delta-encoded against reference"):
+        proto.decompress(record)
+    with pytest.raises(ValueError, match="given reference is"):
+        proto.decompress(record, reference=Reference(base * 2))
+    with pytest.raises(ValueError, match="Hash mismatch"):
+        proto.decompress(record, reference=base * 2) # bare buffers are checked by the record hash
+    with pytest.raises(ValueError, match="Reference holds"):
+        proto.compress(base, reference=base[:10])
+    with pytest.raises(ValueError, match="Unknown reference mode"):
+        proto.compress(base, reference=base, reference_mode='add')
+
+def test_stream_reference(tmp_path):
+    proto = NFCPrototype(clevel=1)
+    base = os.urandom(300_000)
+    tuned = bytearray(base)
+    tuned[1000:1010] = b'x' * 10
+    tuned += os.urandom(50_000) # runs past the end of the reference
+    (tmp_path / "base.bin").write_bytes(base)
+    (tmp_path / "tuned.bin").write_bytes(tuned)
+
+    proto.compress_stream(tmp_path / "tuned.bin", tmp_path / "plain.nfc", chunk_size=65536)
+    proto.compress_stream(tmp_path / "tuned.bin", tmp_path / "delta.nfc", chunk_size=65536, workers=2,
+                          reference=tmp_path / "base.bin")
+    assert (tmp_path / "delta.nfc").stat().st_size < (tmp_path / "plain.nfc").stat().st_size // 3
+    proto.decompress_stream(tmp_path / "delta.nfc", tmp_path / "out.bin", reference=tmp_path / "base.bin")
+    assert (tmp_path / "out.bin").read_bytes() == tuned
+    with Reference(tmp_path / "base.bin") as ref:
+        assert NFCPrototype(references=ref).read_range(tmp_path / "delta.nfc", 65000, 1000) == tuned[65000:66000]
+
+def test_safetensors_reference(tmp_path):
+    rng = np.random.default_rng(0)
+    base = {f"layers.{i}.weight": rng.standard_normal((128, 64)).astype(np.float32) for i in range(3)}
+    base["bias"] = np.zeros(16, dtype=np.float16)
+    tuned = {name: _fine_tune(t) for name, t in base.items()}
+    tuned["new_head"] = rng.standard_normal(32).astype(np.float32) # no base tensor
+    (tmp_path / "base.safetensors").write_bytes(_safetensors(base))
+    (tmp_path / "tuned.safetensors").write_bytes(_safetensors(tuned))
+
+    proto = NFCPrototype()
+    plain = proto.compress_safetensors(tmp_path / "tuned.safetensors", tmp_path / "plain.nfc")
+    delta = proto.compress_safetensors(tmp_path / "tuned.safetensors", tmp_path / "delta.nfc", workers=2,
+                                       reference=tmp_path / "base.safetensors")
+    assert delta * 3 < plain
+    with proto.open_safetensors(tmp_path / "delta.nfc", reference=tmp_path / "base.safetensors") as archive:
+        for name, tensor in tuned.items():
+            assert np.array_equal(archive[name], tensor)
+        archive.to_safetensors(tmp_path / "rebuilt.safetensors")
+    assert (tmp_path / "rebuilt.safetensors").read_bytes() == (tmp_path / "tuned.safetensors").read_bytes()
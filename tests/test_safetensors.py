@@ -0,0 +1,93 @@
+import io
+import json
+import struct
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.adapters.safetensors import read_safetensors_header
+
+DTYPE_CODES = {np.dtype('float32'): 'F32', np.dtype('float16'): 'F16', np.dtype('int64'): 'I64',
+               np.dtype('uint8'): 'U8', np.dtype('bool'): 'BOOL'}
+
+def _safetensors(tensors, metadata=None, bf16=()):
+    # Minimal safetensors writer: header JSON padded to 8 bytes, then raw tensor data
+    header, blobs, offset = {}, [], 0
+    if metadata:
+        header["__metadata__"] = metadata
+    for name, array in tensors.items():
+        raw = np.ascontiguousarray(array).tobytes()
+        code = 'BF16' if name in bf16 else DTYPE_CODES[array.dtype]
+        header[name] = {"dtype": code, "shape": list(array.shape), "data_offsets": [offset, offset + len(raw)]}
+        blobs.append(raw)
+        offset += len(raw)
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+    return struct.pack('<Q', len(header_bytes)) + header_bytes + b''.join(blobs)
+
+def _model(n_layers=4):
+    rng = np.random.default_rng(0)
+    tensors = {}
+    for i in range(n_layers):
+        tensors[f"layers.{i}.weight"] = rng.standard_normal((64, 32)).astype(np.float32)
+        tensors[f"layers.{i}.bias"] = np.linspace(0, 1, 64, dtype=np.float16)
+    tensors["embed.bf16"] = rng.integers(0, 2**16, size=(16, 8)).astype(np.uint16)
+    tensors["position_ids"] = np.arange(128, dtype=np.int64)
+    tensors["mask"] = rng.random(33) > 0.5
+    tensors["scalar"] = np.array(3, dtype=np.uint8)
+    tensors["empty"] = np.zeros((0, 4), dtype=np.float32)
+    return tensors
+
+def test_archive_roundtrip(tmp_path):
+    proto = NFCPrototype(clevel=5)
+    tensors = _model()
+    src = tmp_path / "model.safetensors"
+    src.write_bytes(_safetensors(tensors, metadata={"format": "pt"}, bf16={"embed.bf16"}))
+    archive_path = tmp_path / "model.nfc"
+    written = proto.compress_safetensors(src, archive_path, workers=4, use_prediction=True)
+    assert written == archive_path.stat().st_size
+
+    with proto.open_safetensors(archive_path, workers=2) as archive:
+        assert set(archive) == set(tensors) and len(archive) == len(tensors)
+        assert archive.metadata == {"format": "pt"}
+        assert archive.dtype("embed.bf16") == "BF16"
+        for name, expected in tensors.items():
+            tensor = archive[name]
+            assert tensor.shape == expected.shape
+            assert tensor.tobytes() == expected.tobytes()
+        assert archive["layers.1.weight"].dtype == np.float32
+        loaded = archive.load(["mask", "position_ids"])
+        assert list(loaded) == ["mask", "position_ids"]
+        assert np.array_equal(loaded["mask"], tensors["mask"])
+        rebuilt = tmp_path / "rebuilt.safetensors"
+        archive.to_safetensors(rebuilt)
+    assert rebuilt.read_bytes() == src.read_bytes()
+
+def test_lookup_reads_only_requested_tensors():
+    proto = NFCPrototype(clevel=1)
+    tensors = {f"t{i}": np.full((256, 64), i, dtype=np.float32) for i in range(300)}
+    out = io.BytesIO()
+    proto.compress_safetensors(_safetensors(tensors), out)
+    archive = proto.open_safetensors(out.getvalue())
+
+    bytes_read = []
+    read = archive._read
+    archive._read = lambda offset, length: bytes_read.append(length) or read(offset, length)
+    for name in ["t0", "t17", "t150", "t298", "t299"]:
+        assert np.array_equal(archive[name], tensors[name])
+    assert len(bytes_read) == 5
+    assert sum(bytes_read) == sum(archive._entries[name][1] for name in ["t0", "t17", "t150", "t298", "t299"])
+    with pytest.raises(KeyError):
+        archive["missing"]
+
+def test_invalid_inputs():
+    proto = NFCPrototype()
+    with pytest.raises(ValueError):
+        read_safetensors_header(b'\x00' * 4)
+    bad = bytearray(_safetensors({"w": np.zeros(4, dtype=np.float32)}))
+    bad[-8:] = b''  # tensor data shorter than data_offsets claims
+    with pytest.raises(ValueError):
+        proto.compress_safetensors(bytes(bad), io.BytesIO())
+    out = io.BytesIO()
+    proto.compress_safetensors(_safetensors({"w": np.zeros(4, dtype=np.float32)}), out)
+    with pytest.raises(ValueError):
+        proto.open_safetensors(out.getvalue()[:-1])
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype import SparseTensor, sparse
+from nfc_prototype.backends import available_backends
+from nfc_prototype.stats import Stats
+
+def _pruned(density, dtype=np.float32, shape=(500, 400), seed=0):
+    rng = np.random.default_rng(seed)
+    weights = (rng.standard_normal(shape) * 0.02).astype(dtype)
+    weights[rng.random(shape) >= density] = 0
+    return weights
+
+@pytest.mark.parametrize("density, mode", [(0.5, sparse.POSITIONS_BITMAP), (0.1, sparse.POSITIONS_BITMAP),
+                                           (0.01, sparse.POSITIONS_GAPS), (0.0, sparse.POSITIONS_GAPS)])
+def test_roundtrip_per_density(density, mode):
+    original = _pruned(density)
+    proto = NFCPrototype(sparse='auto', hash_algo='crc32')
+    nfc_binary = proto.compress(original)[0]
+    assert nfc_binary[5] & proto.SPARSE_FLAG and nfc_binary[5] & proto.BINARY_METADATA_FLAG
+    metadata, payload = proto._parse_record(nfc_binary)[2:4]
+    assert metadata["compression_stack"] == ["sparse", "blosc_zstd"]
+    assert sparse.SPARSE_HEADER.unpack_from(payload)[1] == mode
+    assert len(nfc_binary) < len(NFCPrototype().compress(original)[0]) or density == 0.0
+    assert np.array_equal(NFCPrototype().decompress(nfc_binary), original)
+    out = np.empty_like(original)
+    assert NFCPrototype().decompress_into(nfc_binary, out) is out and np.array_equal(out, original)
+
+@pytest.mark.parametrize("dtype", ['<f2', '>f4', '<f8', '<i1', '>i2', '<u8'])
+def test_roundtrip_per_dtype(dtype):
+    original = (_pruned(0.2, np.float64) * 1000).astype(dtype)
+    nfc_binary = NFCPrototype(sparse=True).compress(original)[0]
+    restored = NFCPrototype().decompress(nfc_binary)
+    assert restored.dtype == original.dtype and restored.tobytes() == original.tobytes()
+
+def test_auto_skips_dense_and_predicted_tensors():
+    proto = NFCPrototype(sparse='auto')
+    for data, kwargs in ((_pruned(1.0), {}), (_pruned(0.3), dict(predictor='modular_delta')), (b"\0" * 10_000, {})):
+        nfc_binary = proto.compress(data, **kwargs)[0]
+        assert not nfc_binary[5] & proto.SPARSE_FLAG
+    with pytest.raises(ValueError, match="sparse mode"):
+        NFCPrototype(sparse='always')
+
+def test_negative_zero_is_a_value():
+    original = np.array([0.0, -0.0, 0.0, 1.5, 0.0, -0.0], dtype=np.float32)
+    nfc_binary = NFCPrototype(sparse=True).compress(original)[0]
+    assert NFCPrototype().decompress(nfc_binary).tobytes() == original.tobytes()
+    tensor = NFCPrototype().decompress(nfc_binary, sparse=True)
+    assert tensor.indices.tolist() == [1, 3, 5]
+
+def test_decompress_as_sparse_tensor():
+    original = _pruned(0.05, shape=(60, 70, 8))
+    stats = Stats()
+    nfc_binary = NFCPrototype(sparse=True).compress(original)[0]
+    tensor = NFCPrototype(stats=stats).decompress(nfc_binary, sparse=True)
+    assert isinstance(tensor, SparseTensor) and tensor.shape == original.shape and tensor.dtype == original.dtype
+    assert tensor.nnz == np.count_nonzero(original) and tensor.density == pytest.approx(tensor.nnz / original.size)
+    assert np.array_equal(tensor.todense(), original)
+    assert np.array_equal(original[tensor.coords()], tensor.values)
+    stages = stats.snapshot()["stages"]
+    assert stages["decompress.sparse"]["calls"] == 1 and "decompress.reconstruct" not in stages
+    # Dense records are converted after decoding
+    dense_record = NFCPrototype().compress(original)[0]
+    assert np.array_equal(NFCPrototype().decompress(dense_record, sparse=True).indices, tensor.indices)
+    with pytest.raises(ValueError, match="bytes record"):
+        NFCPrototype().decompress(NFCPrototype().compress(b"abc" * 100)[0], sparse=True)
+
+def test_reference_residual_is_sparse():
+    base = _pruned(1.0, seed=1)
+    tuned = base.copy()
+    tuned.reshape(-1)[::97] += 0.001
+    proto = NFCPrototype(sparse='auto')
+    nfc_binary = proto.compress(tuned, reference=base)[0]
+    assert nfc_binary[5] & proto.SPARSE_FLAG
+    assert len(nfc_binary) < tuned.nbytes / 20
+    assert np.array_equal(NFCPrototype().decompress(nfc_binary, reference=base), tuned)
+    assert np.array_equal(NFCPrototype().decompress(nfc_binary, reference=base, sparse=True).todense(), tuned)
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_sparse_per_backend(backend):
+    original = _pruned(0.02, np.float16)
+    nfc_binary = NFCPrototype(sparse=True, backend=backend, block_size=64 * 1024).compress(original)[0]
+    assert np.array_equal(NFCPrototype().decompress(nfc_binary), original)
+    assert np.array_equal(NFCPrototype().decompress(nfc_binary, sparse=True).todense(), original)
+
+def test_stream_and_corruption(tmp_path):
+    src, packed, restored = tmp_path / "w.bin", tmp_path / "w.nfc", tmp_path / "out.bin"
+    src.write_bytes(_pruned(0.1, shape=(600, 1000)).tobytes())
+    NFCPrototype(sparse='auto').compress_stream(src, packed, chunk_size=1_000_000, workers=2)
+    NFCPrototype().decompress_stream(packed, restored, workers=2)
+    assert restored.read_bytes() == src.read_bytes()
+
+    proto = NFCPrototype()
+    payload = bytearray(b''.join(sparse.encode(proto, _pruned(0.1).tobytes(), 4, proto.backend)))
+    with pytest.raises(ValueError, match="payload length"):
+        sparse.decode(proto, bytes(payload) + b'x', proto.backend)
+    payload[sparse.SPARSE_HEADER.size] ^= 0xFF
+    with pytest.raises(ValueError, match="Corruption"):
+        sparse.decode(proto, bytes(payload), proto.backend)
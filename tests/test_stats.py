@@ -0,0 +1,65 @@
+import io
+import json
+import os
+import numpy as np
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.stats import Stats
+
+def test_compress_decompress_stages():
+    stats = Stats()
+    proto = NFCPrototype(stats=stats)
+    data = np.linspace(0, 1, 100000, dtype=np.float32)
+    nfc_binary, orig_size, comp_size = proto.compress(data, use_prediction=True)
+    assert np.array_equal(proto.decompress(nfc_binary), data)
+
+    snap = stats.snapshot()
+    stages = snap["stages"]
+    for stage in ("compress.to_bytes", "compress.hash", "compress.probe", "compress.predict", "compress.blosc",
+                  "compress.header", "compress.total", "decompress.parse", "decompress.blosc",
+                  "decompress.reconstruct", "decompress.hash", "decompress.total"):
+        assert stages[stage]["calls"] == 1, stage
+    assert stages["compress.total"]["bytes_in"] == orig_size
+    assert stages["compress.total"]["bytes_out"] == comp_size
+    assert stages["compress.blosc"]["bytes_out"] == stages["decompress.blosc"]["bytes_in"]
+    assert stages["decompress.total"]["bytes_out"] == orig_size
+    assert snap["counters"] == {"compress.blocks": 1, "decompress.blocks": 1}
+
+    stats.reset()
+    proto.decompress(proto.compress(os.urandom(100000))[0])
+    snap = stats.snapshot()
+    assert snap["counters"]["compress.stored_blocks"] == 1
+    assert "compress.blosc" not in snap["stages"] and "decompress.stored" in snap["stages"]
+
+def test_callback_and_stream_counts(tmp_path):
+    events = []
+    proto = NFCPrototype(stats=lambda *event: events.append(event))
+    src, nfc_path, out = tmp_path / "in.bin", tmp_path / "in.nfc", tmp_path / "out.bin"
+    src.write_bytes(bytes(range(256)) * 4000)
+    proto.compress_stream(src, nfc_path, chunk_size=100000, workers=2)
+    proto.decompress_stream(nfc_path, out, workers=2)
+    assert out.read_bytes() == src.read_bytes()
+
+    snap = proto.stats.snapshot()
+    assert snap["counters"]["compress.blocks"] == snap["counters"]["decompress.blocks"] == 11
+    assert snap["stages"]["compress.read"]["bytes_out"] == src.stat().st_size
+    assert snap["stages"]["decompress.write"]["bytes_in"] == src.stat().st_size
+    assert snap["stages"]["compress.write"]["calls"] == snap["stages"]["decompress.read"]["calls"] == 11
+    assert len(events) == sum(stage["calls"] for stage in snap["stages"].values())
+    assert all(len(event) == 4 and event[1] >= 0 for event in events)
+
+def test_exporters():
+    stats = Stats()
+    proto = NFCPrototype(stats=stats)
+    proto.decompress(proto.compress(b"hello world" * 1000)[0])
+    buf = io.StringIO()
+    stats.write_json(buf)
+    assert json.loads(buf.getvalue()) == json.loads(json.dumps(stats.snapshot()))
+    text = stats.to_prometheus()
+    assert 'nfc_stage_seconds_total{stage="compress.blosc"}' in text
+    assert 'nfc_events_total{event="decompress.blocks"} 1' in text
+    assert "compress.hash" in stats.format_table()
+
+def test_disabled_by_default():
+    proto = NFCPrototype()
+    assert proto.stats is None
+    assert proto.decompress(proto.compress(b"abc" * 10000)[0]) == b"abc" * 10000
@@ -0,0 +1,80 @@
+import os
+import numpy as np
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.tuner import entropy_ratio, looks_incompressible
+
+def _meta(proto, nfc_binary):
+    return proto._parse_record(nfc_binary)[2]
+
+def test_random_bytes_are_stored():
+    proto = NFCPrototype()
+    raw = os.urandom(1024 * 1024)
+    nfc_binary, orig_size, comp_size = proto.compress(raw)
+    assert nfc_binary[5] & proto.STORED_FLAG
+    assert _meta(proto, nfc_binary)["compression_stack"] == ["stored"]
+    assert comp_size < orig_size + 512
+    assert proto.decompress(nfc_binary) == raw
+
+def test_compressible_data_is_not_stored():
+    proto = NFCPrototype()
+    data = np.linspace(0, 1, 500000, dtype=np.float32)
+    nfc_binary, _, _ = proto.compress(data, use_prediction=True)
+    assert not nfc_binary[5] & proto.STORED_FLAG
+    assert _meta(proto, nfc_binary)["prediction_model"] == "modular_delta"
+
+def test_stored_tensor_roundtrip_and_decompress_into():
+    proto = NFCPrototype(codec='auto')
+    data = np.frombuffer(os.urandom(400000), dtype=np.float64).reshape(500, 100)
+    nfc_binary, _, _ = proto.compress(data, use_prediction=True)
+    meta = _meta(proto, nfc_binary)
+    assert nfc_binary[5] & proto.STORED_FLAG and "prediction_model" not in meta and "auto_tuned" not in meta
+    assert proto.decompress(nfc_binary).tobytes() == data.tobytes()
+    out = np.empty_like(data)
+    proto.decompress_into(nfc_binary, out)
+    assert out.tobytes() == data.tobytes()
+
+def test_stored_block_corruption_detected():
+    proto = NFCPrototype()
+    nfc_binary, _, _ = proto.compress(os.urandom(100000))
+    corrupted = bytearray(nfc_binary)
+    corrupted[len(corrupted) // 2] ^= 0xFF
+    try:
+        proto.decompress(bytes(corrupted))
+        assert False, "Should detect corruption"
+    except ValueError:
+        pass
+
+def test_threshold_can_be_disabled():
+    proto = NFCPrototype(store_threshold=None)
+    nfc_binary, _, _ = proto.compress(os.urandom(100000))
+    assert not nfc_binary[5] & proto.STORED_FLAG
+
+def test_probe():
+    assert looks_incompressible(os.urandom(1 << 20), 1.05)
+    # Repeated random content has full byte entropy but is highly compressible
+    repeated = os.urandom(4096) * 256
+    assert entropy_ratio([np.frombuffer(repeated, dtype=np.uint8)], 1) < 1.05
+    assert not looks_incompressible(repeated, 1.05)
+    assert not looks_incompressible(np.zeros(1 << 20, dtype=np.float32), 1.05)
+
+def test_stored_blocks_in_stream(tmp_path):
+    proto = NFCPrototype()
+    raw = os.urandom(300000) + bytes(300000)
+    src, nfc_path, out = tmp_path / "in.bin", tmp_path / "in.nfc", tmp_path / "out.bin"
+    src.write_bytes(raw)
+    proto.compress_stream(src, nfc_path, chunk_size=100000)
+    proto.decompress_stream(nfc_path, out)
+    assert out.read_bytes() == raw
+    assert proto.read_range(nfc_path, 250000, 100000) == raw[250000:350000]
+
+def test_default_path_handles_dtypes_without_uint_view():
+    # The probe samples complex128/longdouble (16-byte items) as bytes
+    rng = np.random.default_rng(3)
+    for data in (np.arange(10_000) * (1 + 2j), np.arange(10_000, dtype=np.longdouble) / 7,
+                 (rng.standard_normal(5_000) + 1j * rng.standard_normal(5_000)).astype(np.complex128)):
+        nfc_binary = NFCPrototype().compress(data)[0]
+        restored = NFCPrototype().decompress(nfc_binary)
+        assert restored.dtype == data.dtype and restored.tobytes() == data.tobytes()
+        out = np.empty_like(data)
+        assert NFCPrototype().decompress_into(nfc_binary, out).tobytes() == data.tobytes()
+    assert looks_incompressible(np.frombuffer(os.urandom(160_000), dtype=np.complex128), 1.05)
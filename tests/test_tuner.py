@@ -0,0 +1,62 @@
+import os
+import blosc
+import numpy as np
+import pytest
+from nfc_prototype.core import NFCPrototype
+from nfc_prototype.tuner import sample_blocks, tune
+
+def test_auto_roundtrip_records_settings():
+    proto = NFCPrototype(codec='auto')
+    data = np.cumsum(np.random.default_rng(0).normal(size=200000)).astype(np.float32)
+    nfc_binary, _, _ = proto.compress(data)
+    # A plain reader decodes it: nothing about the tuned settings is needed
+    assert np.array_equal(NFCPrototype().decompress(nfc_binary), data)
+    meta = proto._parse_record(nfc_binary)[2]
+    assert meta["auto_tuned"]["codec"] in blosc.compressor_list()
+    assert meta.get("prediction_model") == meta["auto_tuned"]["predictor"]
+
+def test_size_objective_prefers_prediction_on_ramps():
+    data = np.arange(1 << 20, dtype=np.int64) * 3
+    settings = tune(data, objective='size')
+    assert settings["predictor"] is not None
+    assert settings["sample_ratio"] > 50
+
+def test_speed_objective_respects_ratio_floor():
+    data = np.tile(np.arange(1000, dtype=np.int32), 500)
+    fast = tune(data, objective='speed', min_ratio=2.0)
+    assert fast["sample_ratio"] >= 2.0
+    # An unreachable floor falls back to the smallest output
+    assert tune(os.urandom(1 << 20), objective='speed', min_ratio=100.0)["codec"]
+
+def test_auto_bytes_and_streaming(tmp_path):
+    proto = NFCPrototype(codec='auto', objective='speed')
+    raw = b"abc" * 300000 + os.urandom(100000)
+    assert proto.decompress(proto.compress(raw)[0]) == raw
+    src, nfc_path, out = tmp_path / "in.bin", tmp_path / "in.nfc", tmp_path / "out.bin"
+    src.write_bytes(raw)
+    proto.compress_stream(src, nfc_path, chunk_size=256 * 1024)
+    proto.decompress_stream(nfc_path, out)
+    assert out.read_bytes() == raw
+
+def test_sampling_is_bounded():
+    data = np.zeros(10_000_000, dtype=np.float32)
+    samples = sample_blocks(data, n_samples=4, sample_bytes=64 * 1024)
+    assert len(samples) == 4 and all(s.nbytes == 64 * 1024 for s in samples)
+
+def test_unknown_objective():
+    with pytest.raises(ValueError):
+        tune(np.zeros(10), objective='fastest')
+
+def test_auto_on_dtypes_without_uint_view():
+    # complex128, longdouble and 12-byte records have no same-width uint: byte samples, no predictors
+    records = np.zeros(20_000, dtype=[('a', '<i4'), ('b', '<f4'), ('c', '<u4')])
+    records['a'] = np.arange(20_000)
+    for data in (np.arange(100_000) * (1 + 2j), np.linspace(0, 1, 100_000, dtype=np.longdouble), records):
+        samples = sample_blocks(data, n_samples=4, sample_bytes=64 * 1024)
+        assert all(sample.dtype == np.uint8 and sample.size % data.dtype.itemsize == 0 for sample in samples)
+        assert tune(data)["predictor"] is None
+        if data.dtype.names:
+            continue # records keep only their dtype name, so they don't decode
+        nfc_binary = NFCPrototype(codec='auto').compress(data)[0]
+        restored = NFCPrototype().decompress(nfc_binary)
+        assert restored.dtype == data.dtype and restored.tobytes() == data.tobytes()
@@ -0,0 +1,78 @@
+import mmap
+import tracemalloc
+import numpy as np
+from nfc_prototype.core import NFCPrototype
+
+def test_buffer_inputs_roundtrip():
+    proto = NFCPrototype(clevel=1)
+    raw = np.arange(4096, dtype=np.int32).tobytes()
+    mm = mmap.mmap(-1, len(raw))
+    mm.write(raw)
+    for source in [bytearray(raw), memoryview(raw), memoryview(np.arange(4096, dtype=np.int32)), mm]:
+        nfc_binary, orig_size, _ = proto.compress(source)
+        assert orig_size == len(raw)
+        assert proto.decompress(nfc_binary) == raw
+    mm.close()
+
+def test_memmap_input(tmp_path):
+    proto = NFCPrototype(clevel=1)
+    path = tmp_path / "tensor.bin"
+    original = np.linspace(0, 1, 100000, dtype=np.float32).reshape(100, 1000)
+    original.tofile(path)
+    mapped = np.memmap(path, dtype=np.float32, mode='r', shape=(100, 1000))
+    nfc_binary, _, _ = proto.compress(mapped)
+    assert np.array_equal(proto.decompress(nfc_binary), original)
+    # Non-contiguous views still work (they are copied once)
+    nfc_binary, _, _ = proto.compress(mapped[:, ::2])
+    assert np.array_equal(proto.decompress(nfc_binary), original[:, ::2])
+
+def test_compress_does_not_copy_input():
+    proto = NFCPrototype(clevel=1)
+    data = np.arange(8 * 1024 * 1024, dtype=np.int32)
+    tracemalloc.start()
+    proto.compress(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # blosc reserves one worst-case output buffer; the input itself must not be copied
+    assert peak < data.nbytes * 3 // 2
+
+def test_decompress_into_targets(tmp_path):
+    proto = NFCPrototype(clevel=1)
+    original = np.arange(50000, dtype=np.float64).reshape(500, 100)
+    nfc_binary, _, _ = proto.compress(original)
+
+    out = np.empty_like(original)
+    assert proto.decompress_into(nfc_binary, out) is out
+    assert np.array_equal(out, original)
+
+    mapped = np.memmap(tmp_path / "out.bin", dtype=np.float64, mode='w+', shape=original.shape)
+    proto.decompress_into(memoryview(nfc_binary), mapped)
+    assert np.array_equal(mapped, original)
+
+    mm = mmap.mmap(-1, original.nbytes)
+    proto.decompress_into(bytearray(nfc_binary), mm)
+    assert mm[:] == original.tobytes()
+    mm.close()
+
+def test_decompress_into_prediction_and_errors():
+    proto = NFCPrototype(clevel=1)
+    original = np.array([10, 12, 10, 5, 8, 20, 255, 250, 0, 5], dtype=np.uint8)
+    nfc_binary, _, _ = proto.compress(original, use_prediction=True)
+    out = np.empty_like(original)
+    proto.decompress_into(nfc_binary, out)
+    assert np.array_equal(out, original)
+
+    try:
+        proto.decompress_into(nfc_binary, np.empty(5, dtype=np.uint8))
+        assert False, "Should reject a wrongly sized buffer"
+    except ValueError:
+        pass
+
+    nfc_binary, _, _ = proto.compress(np.arange(100, dtype=np.int16))
+    corrupted = bytearray(nfc_binary)
+    corrupted[-10] ^= 0xFF
+    try:
+        proto.decompress_into(corrupted, np.empty(100, dtype=np.int16))
+        assert False, "Should detect corruption"
+    except ValueError:
+        pass
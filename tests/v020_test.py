@@ -25,7 +25,8 @@ proto = NFCPrototype()
 # Basic Metadata Round-trip Test
 print("   - Basic Metadata Round-trip Test")
 test_data = b"hello world"
-nfc_binary, _, _ = proto.compress(test_data)
+# JSON metadata is opt-in since v0.5 (binary metadata is the default); this parses the JSON form
+nfc_binary, _, _ = NFCPrototype(metadata_format='json').compress(test_data)
 
 # Replicate decompress logic for metadata extraction within the test
 try: